@@ -1,5 +1,11 @@
 from impl import *
 
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
 import pandas as pd
 
 class BasicQueryEngine:
@@ -18,10 +24,12 @@ class BasicQueryEngine:
         addJournalHandler(handler): Adds a journal query handler to the list.
         addCategoryHandler(handler): Adds a category query handler to the list.
         getEntityById(id): Retrieves a journal or category entity by its ID.
+        getEntitiesByIds(ids): Retrieves the entities of many IDs at once (one batched query for each handler).
         getAllJournals(): Retrieves all journal entities.
         getJournalsWithTitle(partialTitle): Retrieves journals with a title that contains the specified partial title.
         getJournalsPublishedBy(partialName): Retrieves journals published by a publisher with a name that contains the specified partial name.
         getJournalsWithLicense(licenses): Retrieves journals with a specific license.
+        getJournalsWithLanguage(languages): Retrieves journals that accept at least one of the specified languages.
         getJournalsWithAPC(): Retrieves journals with an Article Processing Charge (APC).
         getJournalsWithDOAJSeal(): Retrieves journals with a DOAJ seal.
         getAllCategories(): Retrieves all category entities.
@@ -29,6 +37,20 @@ class BasicQueryEngine:
         getCategoriesWithQuartile(quartiles): Retrieves categories with a specific quartile.
         getCategoriesAssignedToAreas(area_ids): Retrieves categories assigned to specific areas.
         getAreasAssignedToCategories(category_ids): Retrieves areas assigned to specific categories.
+        explodeIdentifiers(identifiers): Splits identifier strings into one identifier per row.
+        canonicalIdentifiers(identifiers): Vectorized canonical form of a Series of identifiers.
+        hasMatchingIdentifier(identifiers, valid_identifiers): Vectorized check of the identifiers of many rows.
+        joinOnIdentifiers(left, right, how): Hash join of two DataFrames (e.g. graph and relational results) on their identifiers.
+        buildJournals(df): Builds the Journal objects from a DataFrame of journals (used by all the methods that return journals).
+        splitColumn(values, separator): Splits a column of strings into lists of values.
+        booleanColumn(values): Converts a column of boolean values into real booleans.
+        getCategoriesAndAreas(identifier_lists): Bulk lookup of the categories and areas of many journals.
+        journalKey(identifiers): Canonical key of a journal (set of its normalized identifiers).
+        mergeJournalFrames(dfs): Merges the journals of many handlers, one row for each journal key.
+        handlersForIdentifier(handlers, id): Returns the handlers that may have an identifier (Bloom filters).
+        getLinkedIdentities(identifiers): Union-find of the journals of some identifiers, looked up in all the stores.
+        canonicalKeys(identifiers, index): Splits identifier strings into canonical identifiers (or journal keys of an IdentityIndex).
+        hashJoinKeys(left_keys, right_keys, pairs): Hash join of two Series of keys.
 
     """
     def __init__(self):
@@ -160,6 +182,398 @@ class BasicQueryEngine:
         return areas
 
        
+    def explodeIdentifiers(self, identifiers: pd.Series) -> pd.Series:
+        """
+        Splits a Series of identifier strings (e.g. "1234-5678; 8765-4321") into a Series
+        with one identifier per row. The index of the original row is kept, so that each
+        identifier can be traced back to the row it comes from.
+
+        Args:
+            identifiers (pd.Series): Series of identifier strings separated by ';'
+
+        Returns:
+            pd.Series: Series of single, stripped identifiers
+        """
+        values = identifiers.fillna("").astype(str)
+        if isinstance(values.array, pd.arrays.ArrowStringArray):
+            # strings stored by pyarrow (the default of pandas when it is installed): they are split and
+            # stripped by the Arrow kernels, without building a Python list for each row
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            lists = pc.split_pattern(pa.array(values), ";")
+            parts = pd.array(pc.utf8_trim_whitespace(pc.list_flatten(lists)), dtype=values.dtype)
+            exploded = pd.Series(parts, index=identifiers.index[pc.list_parent_indices(lists).to_numpy()])
+        else:
+            exploded = values.str.split(';').explode().str.strip()
+        return exploded[exploded != ""]
+
+
+    def canonicalIdentifiers(self, identifiers: pd.Series) -> pd.Series:
+        """
+        Vectorized version of IdentityIndex.canonicalIssn: returns the canonical form of every identifier
+        of a Series (one identifier per row, e.g. the result of explodeIdentifiers), with the same index.
+        The check digits of all the ISSNs are verified at once on a numpy matrix of their digits.
+        """
+        upper = identifiers.astype(str).str.strip().str.upper()
+        compact = upper.str.replace("-", "", regex=False).str.replace(" ", "", regex=False)
+        is_issn = compact.str.fullmatch(r"[0-9]{7}[0-9X]").to_numpy(dtype=bool)
+        if not is_issn.any():
+            return upper
+
+        # one row of 8 digits for each candidate ISSN ("X" becomes 40, never equal to a remainder)
+        digits = np.frombuffer("".join(compact[is_issn].tolist()).encode("ascii"), dtype=np.uint8).reshape(-1, 8).astype(int) - ord("0")
+        # check digit: weighted sum of the first 7 digits (weights 8..2), modulo 11; 10 is written X
+        remainder = (11 - (digits[:, :7] @ np.arange(8, 1, -1)) % 11) % 11
+        valid = np.zeros(len(compact), dtype=bool)
+        valid[np.flatnonzero(is_issn)] = np.where(remainder == 10, digits[:, 7] == ord("X") - ord("0"), digits[:, 7] == remainder)
+
+        return compact.str.slice_replace(4, 4, "-").where(valid, upper)
+
+
+    def getLinkedIdentities(self, identifiers) -> IdentityIndex:
+        """
+        Returns an IdentityIndex with only the journals of the given identifiers: each handler looks up
+        the canonical identifiers of the journals that have them (see QueryHandler.getCanonicalGroupsOf,
+        written by the upload handlers), and the lookup is repeated with the identifiers found this way,
+        until no new one is found, so that also the journals linked through a third store are linked.
+        The identifiers of the other journals are never read.
+        """
+        index = IdentityIndex()
+        seen = set()
+        pending = {IdentityIndex.canonicalIssn(identifier) for identifier in identifiers}
+        while pending:
+            seen.update(pending)
+            found = set()
+            for handler in self.journalQuery + self.categoryQuery:
+                for group in handler.getCanonicalGroupsOf(pending):
+                    index.addJournal(group)
+                    found.update(group)
+            pending = found - seen
+        return index
+
+
+    def canonicalKeys(self, identifiers: pd.Series, index: IdentityIndex = None) -> pd.Series:
+        """
+        Like explodeIdentifiers, but each identifier is replaced by its canonical form (see
+        IdentityIndex.canonicalIssn), so that the rows of different stores can be matched with hash
+        lookups even if they write the identifiers differently. With an IdentityIndex, each
+        identifier is replaced by the key of its journal instead, so that also the rows that list
+        different identifiers of the same journal are matched.
+
+        Returns:
+            pd.Series: Series of keys, with the index of the original rows
+        """
+        exploded = self.explodeIdentifiers(identifiers)
+        if index is None:
+            return self.canonicalIdentifiers(exploded)
+        keys = {identifier: index.getKey(identifier) for identifier in set(exploded.tolist())} # each distinct identifier is resolved once
+        return exploded.map(keys)
+
+
+    def journalKey(self, identifiers) -> frozenset:
+        """
+        Returns the canonical key of a journal: the set of its identifiers in canonical form (see
+        IdentityIndex.canonicalIssn), so that e.g. "1234-567x; 8765-4321" and "87654321;1234-567X" have the same key.
+
+        Args:
+            identifiers: An identifier string separated by ';' or a list of identifiers
+        """
+        if isinstance(identifiers, str):
+            identifiers = identifiers.split(";")
+        elif not isinstance(identifiers, (list, tuple, set, frozenset)):
+            return frozenset() # missing value
+        return frozenset(IdentityIndex.canonicalIssn(identifier) for identifier in identifiers if isinstance(identifier, str) and identifier.strip())
+
+
+    def mergeJournalFrames(self, dfs: list[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Merges the DataFrames of journals returned by several handlers into one DataFrame with one
+        row for each journal. The frames are read one after the other, and each row is kept only
+        if the canonical key of its identifiers (see journalKey) is not in the hash set of the keys
+        already seen: only the identifier column is hashed, so no column (not even the list ones)
+        has to be converted.
+
+        Conflicts: when more handlers (or more rows) have the same journal, the first row wins,
+        in the order the handlers were added; its other values are kept even if the later rows
+        have different ones (e.g. an older copy of the data in a replicated handler).
+
+        Returns:
+            pd.DataFrame: The merged journals (empty DataFrame if there are none)
+        """
+        seen = set()
+        keys_of_strings = {} # identifier string -> key: the replicated handlers return the same strings
+        kept = []
+        for df in dfs:
+            if df is None or df.empty:
+                continue
+            if "identifier" not in df.columns:
+                kept.append(df)
+                continue
+
+            mask = []
+            for identifier in df["identifier"].tolist(): # tolist converts all the values at once (faster than iterating the column)
+                key = keys_of_strings.get(identifier) if isinstance(identifier, str) else None
+                if key is None:
+                    key = self.journalKey(identifier)
+                    if isinstance(identifier, str):
+                        keys_of_strings[identifier] = key
+                mask.append(key not in seen)
+                seen.add(key)
+            kept.append(df[mask])
+
+        if not kept:
+            return pd.DataFrame()
+        return pd.concat(kept).reset_index(drop=True)
+
+
+    def hasMatchingIdentifier(self, identifiers: pd.Series, valid_identifiers) -> pd.Series:
+        """
+        Vectorized version of FullQueryEngine.rowHasMatchingIdentifier: checks, for every row at once, if at
+        least one of its identifiers is among the valid identifiers.
+
+        Args:
+            identifiers (pd.Series): Series of identifier strings separated by ';'
+            valid_identifiers: Collection (set, list, Index) of valid identifiers
+
+        Returns:
+            pd.Series: Boolean Series aligned with the input, usable as a mask
+        """
+        exploded = self.canonicalKeys(identifiers)
+        valid = list({IdentityIndex.canonicalIssn(identifier) for identifier in valid_identifiers})
+        if isinstance(exploded.array, pd.arrays.ArrowStringArray):
+            # hash lookup of the Arrow kernel (isin on Arrow strings goes through much slower conversions)
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            strings = pa.array(exploded)
+            is_valid = pc.is_in(strings, value_set=pa.array(valid, type=strings.type)).to_numpy(zero_copy_only=False)
+        else:
+            is_valid = exploded.isin(valid).to_numpy()
+        matching_rows = exploded.index[is_valid]  # index of the rows with at least one match
+        return pd.Series(identifiers.index.isin(matching_rows), index=identifiers.index)
+
+
+    def joinOnIdentifiers(self, left: pd.DataFrame, right: pd.DataFrame, how: str = "inner", on: str = "identifier") -> pd.DataFrame:
+        """
+        Joins two DataFrames coming from different stores (e.g. the graph database and the
+        relational database) on their journal identifiers. The identifier strings of both sides
+        (e.g. "1234-5678; 8765-4321") are normalized into one key per identifier (its canonical
+        form, see canonicalKeys), a hash index is built on the smaller side and the larger side is
+        probed against it: two rows are joined if they share at least one key. The rows left without
+        a match on both sides are then matched on the keys of their journals in an IdentityIndex of
+        only their identifiers (see getLinkedIdentities), for the journals that the two sides know by
+        different identifiers.
+
+        Args:
+            left (pd.DataFrame): Left DataFrame, with an identifier column
+            right (pd.DataFrame): Right DataFrame, with an identifier column
+            how (str): "inner" keeps only the matching rows, "left" keeps also the left rows without a match
+            on (str): Name of the identifier column of both DataFrames
+
+        Returns:
+            pd.DataFrame: One merged DataFrame with the columns of both sides. The identifier column
+                          is the left one; the other right columns with the same name get the "_right" suffix.
+        """
+        left = left.reset_index(drop=True)
+        right = right.reset_index(drop=True)
+
+        left_keys = self.canonicalKeys(left[on]) if on in left.columns else pd.Series(dtype=object)
+        right_keys = self.canonicalKeys(right[on]) if on in right.columns else pd.Series(dtype=object)
+
+        pairs = {} # (left position, right position) -> None: a dict keeps the probe order and drops repeated pairs
+        self.hashJoinKeys(left_keys, right_keys, pairs)
+
+        # rows without a match on both sides: they can still be the same journal, if a store lists their
+        # identifiers together. Only the identifiers of the smaller side are looked up in the stores: the
+        # journals found for them include all the identifiers the other side could match
+        unmatched_left = left_keys[~left_keys.index.isin({pair[0] for pair in pairs})]
+        unmatched_right = right_keys[~right_keys.index.isin({pair[1] for pair in pairs})]
+        if len(unmatched_left) and len(unmatched_right):
+            left_set, right_set = set(unmatched_left.tolist()), set(unmatched_right.tolist())
+            index = self.getLinkedIdentities(left_set if len(left_set) <= len(right_set) else right_set)
+            resolve = lambda keys: keys.map({key: index.getKey(key) for key in set(keys.tolist())})
+            self.hashJoinKeys(resolve(unmatched_left), resolve(unmatched_right), pairs)
+
+        left_positions = [pair[0] for pair in pairs]
+        right_positions = [pair[1] for pair in pairs]
+
+        if how == "left": # left rows without any match are kept, with empty values on the right side
+            matched = set(left_positions)
+            for position in range(len(left)):
+                if position not in matched:
+                    left_positions.append(position)
+                    right_positions.append(-1)
+        elif how != "inner":
+            raise ValueError(f"Unsupported join type: {how}")
+
+        right_columns = right.drop(columns=[on], errors="ignore")
+        right_columns = right_columns.rename(columns={col: f"{col}_right" for col in right_columns.columns if col in left.columns})
+
+        joined_right = right_columns.reindex([p if p >= 0 else None for p in right_positions]) if len(right_columns.columns) else pd.DataFrame(index=range(len(right_positions)))
+        joined = pd.concat([
+            left.iloc[left_positions].reset_index(drop=True),
+            joined_right.reset_index(drop=True)
+        ], axis=1)
+
+        return joined
+
+
+    def hashJoinKeys(self, left_keys: pd.Series, right_keys: pd.Series, pairs: dict):
+        # adds to pairs the (left position, right position) of the rows with a key in common: the hash
+        # index is built on the smaller side, the larger side is the one that probes it
+        right_is_build = len(right_keys) <= len(left_keys)
+        build_keys, probe_keys = (right_keys, left_keys) if right_is_build else (left_keys, right_keys)
+
+        hash_index = {}
+        for key, position in zip(build_keys.values, build_keys.index):
+            hash_index.setdefault(key, []).append(position)
+
+        for key, position in zip(probe_keys.values, probe_keys.index):
+            for match in hash_index.get(key, ()):
+                pairs[(position, match) if right_is_build else (match, position)] = None
+
+
+    def buildJournals(self, df: pd.DataFrame) -> list[Journal]:
+        """
+        Builds the Journal objects from a DataFrame of journals (e.g. the result of a query
+        handler or of joinOnIdentifiers), one Journal for each distinct set of identifiers.
+        All the methods that return journals go through this one.
+
+        The columns are prepared once for all the rows (identifiers and languages split into lists
+        with vectorized string operations, seal and APC converted to real booleans), then the
+        objects are built in a single pass over the column values. The categories and areas come
+        from the 'category', 'quartile' and 'area' list columns when the DataFrame already has them
+        (e.g. getJournalsDataFrame), otherwise from one bulk lookup in each category query handler
+        (see getCategoriesAndAreas) instead of one lookup for each journal.
+
+        Returns:
+            list[Journal]: List of Journal objects
+        """
+        if df.empty or "identifier" not in df.columns:
+            return []
+
+        df = df[df["identifier"].notna()]
+        identifier_lists = self.splitColumn(df["identifier"], ";")
+        language_lists = self.splitColumn(df["languages"], ",") if "languages" in df.columns else [[]] * len(df)
+        seals = self.booleanColumn(df["seal"])
+        apcs = self.booleanColumn(df["apc"])
+        publishers = [None if pd.isna(value) else value for value in df["publisher"]] if "publisher" in df.columns else [None] * len(df)
+
+        # categories and areas: already in the DataFrame or read in bulk
+        if all(col in df.columns for col in ("category", "quartile", "area")):
+            as_list = lambda value: value if isinstance(value, list) else []
+            relations = [(list(zip(as_list(c), as_list(q))), as_list(a)) for c, q, a in zip(df["category"], df["quartile"], df["area"])]
+        else:
+            relations = self.getCategoriesAndAreas(identifier_lists)
+
+        journals_list = []
+        seen = set()
+
+        for ids, title, languages, seal, licence, apc, publisher, (category_pairs, area_names) in zip(
+                identifier_lists, df["title"], language_lists, seals, df["license"], apcs, publishers, relations):
+            if not ids:
+                continue
+
+            # Avoid duplicates: the same journal can come from more than one handler or more than one match
+            journal_key = self.journalKey(ids)
+            if journal_key in seen:
+                continue
+            seen.add(journal_key)
+
+            categories = []
+            seen_categories = set()
+            for category_name, quartile in category_pairs:
+                if (category_name, quartile) not in seen_categories:
+                    seen_categories.add((category_name, quartile))
+                    categories.append(Category([ids[-1]], category=category_name, quartile=quartile))
+
+            journals_list.append(Journal(
+                identifiers=ids, # list of strings --> ["1234-6789","3456-6789"]
+                title=title,
+                languages=languages,
+                seal=seal,
+                licence=licence,
+                apc=apc,
+                publisher=publisher,
+                categories=categories,
+                areas=[Area([area_name]) for area_name in dict.fromkeys(area_names) if area_name]
+            ))
+
+        return journals_list
+
+
+    def splitColumn(self, values: pd.Series, separator: str) -> list[list[str]]:
+        """
+        Splits a column of strings (e.g. "1234-5678; 8765-4321" or "English, French") into lists of
+        stripped, non-empty values, with vectorized string operations.
+        """
+        split = values.fillna("").astype(str).str.strip().str.split(rf"\s*{separator}\s*", regex=True)
+        return [[value for value in values_list if value] for values_list in split]
+
+
+    def booleanColumn(self, values: pd.Series) -> list[bool]:
+        """
+        Converts a column of booleans coming from a store (True, "true", "True", ...) into real booleans.
+        """
+        if values.dtype == bool:
+            return values.tolist()
+        return values.map(lambda value: value is True or value is np.True_ or str(value).strip().lower() == "true").tolist()
+
+
+    def getCategoriesAndAreas(self, identifier_lists: list[list[str]]) -> list[tuple]:
+        """
+        Finds the categories and areas of many journals with one getJournalSummaries call for each
+        category query handler, instead of getCategoryById/getAreaById for each journal.
+
+        Args:
+            identifier_lists (list[list[str]]): The identifiers of each journal
+
+        Returns:
+            list[tuple]: For each journal, ([(category, quartile), ...], [area, ...])
+        """
+        # the journals are matched on the canonical forms of their identifiers (see IdentityIndex.canonicalIssn);
+        # a relational journal that also has other identifiers is found by any of them
+        journal_keys = [{IdentityIndex.canonicalIssn(identifier) for identifier in ids} for ids in identifier_lists]
+        all_identifiers = {identifier for keys in journal_keys for identifier in keys}
+        relations = [([], []) for _ in identifier_lists]
+        if not all_identifiers:
+            return relations
+
+        for handler in self.categoryQuery:
+            summaries = handler.getJournalSummaries(all_identifiers)
+            if summaries.empty:
+                continue
+
+            # journal key -> rows of the summaries
+            summaries = summaries.reset_index(drop=True)
+            exploded = self.canonicalKeys(summaries["identifier"])
+            rows_by_key = {}
+            for row, key in zip(exploded.index, exploded.values):
+                rows_by_key.setdefault(key, set()).add(row)
+            categories, quartiles, areas = summaries["category"].tolist(), summaries["quartile"].tolist(), summaries["area"].tolist()
+
+            for (category_pairs, area_names), keys in zip(relations, journal_keys):
+                rows = set().union(*(rows_by_key.get(key, ()) for key in keys))
+                for row in sorted(rows):
+                    category_pairs.extend(zip(categories[row], quartiles[row]))
+                    area_names.extend(areas[row])
+
+        return relations
+
+
+    def handlersForIdentifier(self, handlers, id) -> list:
+        """
+        Routes an identifier: returns only the handlers whose identifier filter (a Bloom filter,
+        see QueryHandler.getIdentifierFilter) says that they may have it, so that the queries that
+        are sure to find nothing are not sent. A handler without a filter is always kept.
+        """
+        routed = []
+        for handler in handlers:
+            if hasattr(handler, "mayContainIdentifier") and not handler.mayContainIdentifier(id):
+                continue
+            routed.append(handler)
+        return routed
+
+
     def getEntityById(self, id):
         
         """" 
@@ -174,8 +588,8 @@ class BasicQueryEngine:
         
         all_dfs = []
 
-        # First attempt: search in journalQuery
-        for handler in self.journalQuery:
+        # First attempt: search in journalQuery (only the handlers that may have the id, see handlersForIdentifier)
+        for handler in self.handlersForIdentifier(self.journalQuery, id):
             df = handler.getById(id)
             if df is not None and not df.empty:
                 all_dfs.append(df.fillna(""))
@@ -184,41 +598,17 @@ class BasicQueryEngine:
 
         if all_dfs: #if something was found:
             
-            merged_df = pd.concat(all_dfs).reset_index(drop=True)
+            # one row for each journal (no conversion of the list columns is needed, see mergeJournalFrames);
+            # the first row, i.e. the first handler that knows the journal, is the one used
+            merged_df = self.mergeJournalFrames(all_dfs)
+            journals = self.buildJournals(merged_df.iloc[:1])
 
-            for col in merged_df.columns:
-                if merged_df[col].apply(lambda x: isinstance(x, list)).any():
-                    merged_df[col] = merged_df[col].apply(str)
-
-            merged_df = merged_df.drop_duplicates()
-            # Take only the first row to build the Journal
-            row = merged_df.iloc[0]
-
-            # Use get with default "" to avoid NoneType error
-            id_str = row.get('identifier', "")
-            lang_str = row.get('languages', "")
-            
-            journal = Journal (  
-                identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], #creates a list of strings --> ["1234-6789","3456-6789"]
-                title= row['title'],
-                languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], #creates a list of strings
-                seal=row['seal'],
-                licence=row['license'],
-                apc=row['apc'],
-                publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # pd.notna checks if the obtained value is not NaN 
-                                                                                                # If the value exists and is not NaN, assigns it to 'publisher', otherwise None. 
-
-                categories=self.getCategoryById(id_str),
-                areas=self.getAreaById(id_str)  
-
-            )
-
-            return journal
+            return journals[0] if journals else None
         
         else: 
             all_dfs = [] #if the query in journalQuery was not successful:
 
-            for handler in self.categoryQuery: #search in categoryQuery
+            for handler in self.handlersForIdentifier(self.categoryQuery, id): #search in categoryQuery
                 df = handler.getById(id)
                 if df is not None and not df.empty:
                     all_dfs.append(df.fillna(""))
@@ -226,13 +616,7 @@ class BasicQueryEngine:
             if not all_dfs:  
                 return None
 
-            merged_df = pd.concat(all_dfs).reset_index(drop=True)
-
-            for col in merged_df.columns: #since there are columns that contain lists, transform the lists into strings
-                if merged_df[col].apply(lambda x: isinstance(x, list)).any():
-                    merged_df[col] = merged_df[col].apply(str)
-
-            merged_df = merged_df.drop_duplicates()
+            merged_df = self.mergeJournalFrames(all_dfs) # the list columns (category, quartile, area) are kept as lists
 
             if merged_df.empty:
                 return None  
@@ -241,7 +625,7 @@ class BasicQueryEngine:
                 row = merged_df.iloc[0]  
                 
                 category = Category(
-                    identifiers=row["identifier"],
+                    identifiers=[item.strip() for item in row["identifier"].split(';') if item.strip()], # a list, as for the journals
                     category=row["category"],
                     quartile=row["quartile"]
                 )
@@ -251,6 +635,75 @@ class BasicQueryEngine:
                 )
 
                 return category, area #returns the objects Category and Area
+
+
+    def getEntitiesByIds(self, ids, batchSize: int = 1000) -> dict:
+        """
+        Bulk version of getEntityById: resolves many identifiers with one batched query for each
+        handler (split in batches of batchSize identifiers, so that the queries do not get too long)
+        instead of one query for each identifier.
+        The identifiers are grouped for each handler with handlersForIdentifier, so each handler only
+        receives the identifiers that it may have. As in getEntityById:
+        a) the identifiers are searched first in journalQuery (getJournalsWithFilters with identifiers),
+           and the Journal objects are built all together with buildJournals;
+        b) the identifiers not found there are searched in categoryQuery (getJournalSummaries),
+           and for each of them the objects Category and Area are built.
+
+        Args:
+            ids: The identifiers (ISSN/EISSN) to resolve
+            batchSize (int): Maximum number of identifiers in a single query
+
+        Returns:
+            dict: identifier -> Journal, (Category, Area) or None if it is not found
+        """
+        ids = [id for id in dict.fromkeys(ids) if id] # without duplicates, in the same order
+        if not ids:
+            return {}
+
+        # the results are matched on the canonical forms of the identifiers (see IdentityIndex.canonicalIssn),
+        # so that e.g. "03178471" finds the journal stored as "0317-8471"; they are returned under the original strings
+        canonical = {id: IdentityIndex.canonicalIssn(id) for id in ids}
+        entities = dict.fromkeys(canonical.values())
+
+        # a) journals: one (batched) query for each handler, with only the identifiers routed to it
+        all_dfs = []
+        for handler in self.journalQuery:
+            routed = [id for id in ids if handler in self.handlersForIdentifier([handler], id)]
+            for start in range(0, len(routed), batchSize):
+                df = handler.getJournalsWithFilters(identifiers=set(routed[start:start + batchSize]))
+                if df is not None and not df.empty:
+                    all_dfs.append(df.fillna(""))
+
+        if all_dfs:
+            # one row for each journal (the first handler that knows it wins, see mergeJournalFrames)
+            for journal in self.buildJournals(self.mergeJournalFrames(all_dfs)):
+                for identifier in journal.getIds():
+                    identifier = IdentityIndex.canonicalIssn(identifier)
+                    if identifier in entities and entities[identifier] is None:
+                        entities[identifier] = journal
+
+        # b) categories and areas of the identifiers that are not in the graph databases
+        for handler in self.categoryQuery:
+            missing = [id for id in ids if entities[canonical[id]] is None and handler in self.handlersForIdentifier([handler], id)]
+            for start in range(0, len(missing), batchSize):
+                summaries = handler.getJournalSummaries(set(missing[start:start + batchSize]))
+                if summaries is None or summaries.empty:
+                    continue
+
+                summaries = summaries.reset_index(drop=True)
+                exploded = self.explodeIdentifiers(summaries["identifier"])
+                for row, identifier in zip(exploded.index, exploded.values):
+                    identifier = IdentityIndex.canonicalIssn(identifier)
+                    if identifier in entities and entities[identifier] is None:
+                        category = Category(
+                            identifiers=[item.strip() for item in summaries.at[row, "identifier"].split(';') if item.strip()],
+                            category=summaries.at[row, "category"],
+                            quartile=summaries.at[row, "quartile"]
+                        )
+                        area = Area(identifiers=summaries.at[row, "area"])
+                        entities[identifier] = (category, area)
+
+        return {id: entities[canonical[id]] for id in ids}
  
             
 
@@ -274,30 +727,8 @@ class BasicQueryEngine:
         if not all_dfs:
             return []
         else:
-            merged_df = pd.concat(all_dfs).reset_index(drop=True).drop_duplicates()
-            
-            allJournalsList = []
-            for _, row in merged_df.iterrows():
-                # Extract 'identifier' and 'languages' str values from DataFrame row, defaulting to empty string if not found
-                id_str = row.get('identifier', "")
-                lang_str = row.get('languages', "")
-                
-                journal = Journal (  
-                    identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], #creates a list of strings --> ["1234-6789","3456-6789"]
-                    title= row['title'],
-                    languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], #creates a list of strings
-                    seal=row['seal'],
-                    licence=row['license'],
-                    apc=row['apc'],
-                    publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # pd.notna checks if the obtained value is not NaN 
-                                                                                                  # If the value exists and is not NaN, assigns it to 'publisher', otherwise None. 
-        
-                    categories=self.getCategoryById(id_str),
-                    areas=self.getAreaById(id_str)  
-                )
-                allJournalsList.append(journal)
-
-            return allJournalsList
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
         
     
     def getJournalsWithTitle(self, partialTitle):
@@ -317,29 +748,8 @@ class BasicQueryEngine:
         if not all_dfs:
             return []
         else:
-            merged_df = pd.concat(all_dfs).reset_index(drop=True).drop_duplicates()
-            
-            journalsWithTitleList = []
-            for _, row in merged_df.iterrows():
-                # Extract 'identifier' and 'languages' str values from DataFrame row, defaulting to empty string if not found
-                id_str = row.get('identifier', "")
-                lang_str = row.get('languages', "")
-                
-                journal = Journal (  
-                    identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], #creates a list of strings identifiers --> ["1234-6789","3456-6789"]
-                    title= row['title'],
-                    languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], #creates a list of strings
-                    seal=row['seal'],
-                    licence=row['license'],
-                    apc=row['apc'],
-                    publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # If the value exists and is not NaN, assigns it to 'publisher', otherwise None.
-        
-                    categories=self.getCategoryById(id_str),
-                    areas=self.getAreaById(id_str)  
-                )
-                journalsWithTitleList.append(journal)
-
-            return journalsWithTitleList
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
         
 
     def getJournalsPublishedBy(self, partialName):
@@ -361,29 +771,8 @@ class BasicQueryEngine:
         if not all_dfs:
             return []
         else:
-            merged_df = pd.concat(all_dfs).reset_index(drop=True).drop_duplicates()
-            
-            journalsPublishedByList = []
-            for _, row in merged_df.iterrows():
-                # Extract 'identifier' and 'languages' str values from DataFrame row, defaulting to empty string if not found
-                id_str = row.get('identifier', "")
-                lang_str = row.get('languages', "")
-
-                journal = Journal (  
-                    identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], # creates a list of strings identifiers --> ["1234-6789","3456-6789"]
-                    title= row['title'],
-                    languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], # creates a list of strings 'languages'
-                    seal=row['seal'],
-                    licence=row['license'],
-                    apc=row['apc'],
-                    publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # If the value exists and is not NaN, assigns it to 'publisher', otherwise None.
-        
-                    categories=self.getCategoryById(id_str),
-                    areas=self.getAreaById(id_str)  
-                )
-                journalsPublishedByList.append(journal)
-
-            return journalsPublishedByList
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
         
         
     def getJournalsWithLicense(self,license):
@@ -403,29 +792,29 @@ class BasicQueryEngine:
         if not all_dfs:
             return []
         else: 
-            merged_df = pd.concat(all_dfs).reset_index(drop=True).drop_duplicates()
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
 
-            journalsWithLicenseList = []
-            for _, row in merged_df.iterrows():
-                # Extract 'identifier' and 'languages' str values from DataFrame row, defaulting to empty string if not found
-                id_str = row.get('identifier', "")
-                lang_str = row.get('languages', "")
                 
-                journal = Journal (  
-                    identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], #creates a list of strings identifiers --> ["1234-6789","3456-6789"]
-                    title= row['title'],
-                    languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], #creates a list of strings 'languages'
-                    seal=row['seal'],
-                    licence=row['license'],
-                    apc=row['apc'],
-                    publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # If the value exists and is not NaN, assigns it to 'publisher', otherwise None.
-        
-                    categories=self.getCategoryById(id_str),
-                    areas=self.getAreaById(id_str) 
-                )
-                journalsWithLicenseList.append(journal)
+    def getJournalsWithLanguage(self, languages):
+        """
+        Retrieves journals that accept at least one of the specified languages.
+        
+        Returns:
+            list[Journal]: A list of Journal entities with the specified languages.
+        """
+        all_dfs= []
+        for handler in self.journalQuery:
+            df = handler.getJournalsWithLanguage(languages)
+            if not df.empty:
+                df = df.fillna("") #empty string
+                all_dfs.append(df)
 
-            return journalsWithLicenseList
+        if not all_dfs:
+            return []
+        else:
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
     
 
     def getJournalsWithAPC(self):
@@ -445,29 +834,8 @@ class BasicQueryEngine:
         if not all_dfs:
             return []
         else: 
-            merged_df = pd.concat(all_dfs).reset_index(drop=True).drop_duplicates()
-            
-            journalsWithAPC_list = []
-            for _, row in merged_df.iterrows():
-                # Extract 'identifier' and 'languages' str values from DataFrame row, defaulting to empty string if not found
-                id_str = row.get('identifier', "")
-                lang_str = row.get('languages', "")
-  
-                journal = Journal (  
-                    identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], #creates a list of strings identifiers --> ["1234-6789","3456-6789"]
-                    title= row['title'],
-                    languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], #creates a list of strings 'languages'
-                    seal=row['seal'],
-                    licence=row['license'],
-                    apc=row['apc'],
-                    publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # If the value exists and is not NaN, assigns it to 'publisher', otherwise None.
-        
-                    categories=self.getCategoryById(id_str),
-                    areas=self.getAreaById(id_str) 
-                )
-                journalsWithAPC_list.append(journal)
-
-            return journalsWithAPC_list
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
         
 
     def getJournalsWithDOAJSeal(self):
@@ -487,29 +855,8 @@ class BasicQueryEngine:
         if not all_dfs:
             return []
         else:
-            merged_df = pd.concat(all_dfs).reset_index(drop=True).drop_duplicates()
-            
-            journalsWithSealList = []
-            for _, row in merged_df.iterrows():
-                # Extract 'identifier' and 'languages' str values from DataFrame row, defaulting to empty string if not found
-                id_str = row.get('identifier', "")
-                lang_str = row.get('languages', "")
-                
-                journal = Journal (  
-                    identifiers=[id.strip() for id in id_str.split(';')] if id_str else [], #creates a list of strings identifiers --> ["1234-6789","3456-6789"]
-                    title= row['title'],
-                    languages=[lang.strip() for lang in lang_str.split(',')] if lang_str else [], #creates a list of strings 'languages'
-                    seal=row['seal'],
-                    licence=row['license'],
-                    apc=row['apc'],
-                    publisher = row.get("publisher") if pd.notna(row.get("publisher")) else None, # If the value exists and is not NaN, assigns it to 'publisher', otherwise None.
-        
-                    categories=self.getCategoryById(id_str),
-                    areas=self.getAreaById(id_str) 
-                )
-                journalsWithSealList.append(journal)
-
-            return journalsWithSealList
+            merged_df = self.mergeJournalFrames(all_dfs)
+            return self.buildJournals(merged_df)
         
         
     def getAllCategories(self):
@@ -715,9 +1062,59 @@ class FullQueryEngine(BasicQueryEngine):
         getJournalsInCategoriesWithQuartile(category_ids, quartiles): Retrieves journals in specific categories with quartiles.
         getJournalsInAreasWithLicense(areas_ids, licenses): Retrieves journals in specific areas with licenses.
         getDiamondJournalsInAreasAndCategoriesWithQuartile(areas_ids, category_ids, quartiles): Retrieves diamond journals in areas and categories with quartiles.
+        getJournalsFromStores(journal_dfs, category_dfs): Joins graph and relational results and builds the matching journals.
+        query(): Returns a composable JournalQuery on this engine.
+        getJournalCounts(by, ...): Counts the journals satisfying the conditions for each value of an attribute.
+        getFacetedJournals(query, page, pageSize, facets): Returns a page of journals and the facet counts of all the matching journals.
+        getFacetCounts(df, facet): Counts the journals of a DataFrame for each value of a facet.
+        countJournalValues(dfs, by): Counts the distinct journals of the (value, journal) rows of more handlers.
+        getJournalsDataFrame(): Returns all the journals of both stores in one DataFrame.
+        buildBitmapIndex(): Builds the in-memory bitmap index of the journals.
+        getJournalsWithBitmapIndex(...): Returns the journals satisfying the conditions, evaluated on the bitmap index.
+        getDatasetVersion(): Returns the versions of the datasets of all the query handlers.
+        saveSnapshot(path): Writes the journals and the bitmap index, with their dataset version, to a file.
+        loadSnapshot(path): Loads (memory-mapped) a snapshot written by saveSnapshot.
+        warmStart(path): Loads the snapshot if it is up to date with the stores, otherwise rebuilds it.
+        exportJournals(path, format, partitionBy, batchSize): Writes the journals of both stores to a Parquet or Arrow dataset.
     """
+    SNAPSHOT_MAGIC = b"FLAMESS2" # FLAMESS1 snapshots (pickled) are not read: warmStart rebuilds them
+
     def __init__(self):
         super().__init__()
+        self.bitmapIndex = None
+        self.snapshotVersion = None # dataset version of the last snapshot saved or loaded
+
+    def getJournalsFromStores(self, journal_dfs: list[pd.DataFrame], category_dfs: list[pd.DataFrame] = None) -> list[Journal]:
+        """
+        Cross-store query shared by the methods of this class: the journals returned by the journal
+        query handlers (graph database) are joined with joinOnIdentifiers to the journals returned by
+        the category query handlers (relational database), and the Journal objects are built only
+        for the rows of the join.
+
+        Args:
+            journal_dfs (list[pd.DataFrame]): DataFrames returned by the journal query handlers
+            category_dfs (list[pd.DataFrame]): DataFrames with an 'identifier' column returned by the
+                                               category query handlers. If None, the journals of the
+                                               graph database are not filtered.
+
+        Returns:
+            list[Journal]: Matching journals
+        """
+        journal_dfs = [df.fillna("") for df in journal_dfs if not df.empty]
+        if not journal_dfs:
+            return []
+
+        merged_df = self.mergeJournalFrames(journal_dfs)
+
+        if category_dfs is not None:
+            category_dfs = [df for df in category_dfs if not df.empty]
+            if not category_dfs:
+                return []
+
+            merged_df = self.joinOnIdentifiers(merged_df, pd.concat(category_dfs))
+
+        return self.buildJournals(merged_df)
+
 
     def getJournalsInCategoriesWithQuartile(self, categories: set[str], quartiles: set[str]) -> list[Journal]:
         """
@@ -730,32 +1127,13 @@ class FullQueryEngine(BasicQueryEngine):
         Returns:
             list[Journal]: Matching journals from DOAJ
         """
-        # Get all DOAJ journals
-        doaj_journals = self.getAllJournals()
+        journal_dfs = [handler.getAllJournals() for handler in self.journalQuery]
         
-        # Filter journals that have at least one matching category with the specified quartile
-        result = []
-        for journal in doaj_journals:
-            journal_categories = journal.getCategories()
-            
-            # Check if the journal has at least one category that meets the criteria
-            has_matching_category = False
-            for cat in journal_categories:
-                cat_name = cat.category
-                cat_quartile = cat.quartile
-                
-                # Check if the category and quartile match the filters
-                category_matches = (not categories) or (cat_name in categories)
-                quartile_matches = (not quartiles) or (cat_quartile in quartiles)
-                
-                if category_matches and quartile_matches:
-                    has_matching_category = True
-                    break  # One matching category is enough
+        # Journals that have at least one category with the specified name and quartile
+        # (with both sets empty: at least one category of any name and quartile)
+        category_dfs = [handler.getJournalsInAreasAndCategoriesWithQuartile(set(), categories, quartiles, requireCategory=True) for handler in self.categoryQuery]
             
-            if has_matching_category:
-                result.append(journal)
-        
-        return result
+        return self.getJournalsFromStores(journal_dfs, category_dfs)
     
 
 
@@ -772,66 +1150,13 @@ class FullQueryEngine(BasicQueryEngine):
         Returns:
             list[Journal]: List of matching Journal objects
         """
+        # Retrieve journals with the specified licenses (otherwise no license filtering)
+        journal_dfs = [handler.getJournalsWithLicense(licenses) if licenses else handler.getAllJournals() for handler in self.journalQuery]
 
-        # Collects all journal identifiers for the specified areas (areas_ids)
-        area_identifiers = set()
-
-        for handler in self.categoryQuery:
-            df = handler.getJournalsByArea(areas_ids)
-            if not df.empty:
-                for id_string in df['identifier']:
-                    ids = {id.strip() for id in id_string.split(';')}  # Split the string --> list --> set
-                area_identifiers.update(ids)  # update the set with another set
-
-        # Retrieve journals with the specified licenses
-        all_license_dfs = []
-        for handler in self.journalQuery:
-            df = handler.getJournalsWithLicense(licenses) if licenses else handler.getAllJournals() # otherwise no license filtering
-            if not df.empty:
-                all_license_dfs.append(df)
-
-        if not all_license_dfs:
-            return []
-
-        merged_license_df = pd.concat(all_license_dfs).drop_duplicates().reset_index(drop=True)
-
-        # Filter by area only if areas are specified
-        if areas_ids and area_identifiers:
-            filtered_df = merged_license_df[
-                merged_license_df['identifier'].apply(self.rowHasMatchingIdentifier, args=(area_identifiers,)) # The comma creates a single-item tuple for 'args', which expects a tuple
-            ]
-        else:
-            filtered_df = merged_license_df # otherwise no area filtering
-
+        # Journals of the specified areas (otherwise no area filtering)
+        category_dfs = [handler.getJournalsByArea(areas_ids) for handler in self.categoryQuery] if areas_ids else None
 
-        # We apply the rowHasMatchingIdentifier function to each row's 'identifier' string.
-        # The function returns True if at least one of the identifiers in the string matches an identifier from the valid_identifiers set.
-        # The function returns True or False for each row, producing a boolean Series. We keep only the rows where the boolean value is True.
-
-
-        # Build the Journal objects from the filtered DataFrame
-        journals_list = []
-        for _, row in filtered_df.iterrows():
-            if not row.get('identifier'):
-                continue
-
-            categories = self.getCategoryById(row['identifier'])
-            areas = self.getAreaById(row['identifier'])
-
-            journal = Journal(
-                identifiers=[id.strip() for id in row['identifier'].split(';')],
-                title=row['title'].strip(),
-                languages=[lang.strip() for lang in row.get('languages', "").split(',')] if row.get('languages') else [],
-                seal=bool(row['seal']),
-                licence=row['license'].strip(),
-                apc=bool(row['apc']),
-                publisher=row['publisher'].strip() if pd.notna(row['publisher']) else None,
-                categories=categories,
-                areas=areas
-            )
-            journals_list.append(journal)
-
-        return journals_list
+        return self.getJournalsFromStores(journal_dfs, category_dfs)
 
 
     def rowHasMatchingIdentifier(self, row_identifiers: str, valid_identifiers: set[str]):
@@ -869,51 +1194,824 @@ class FullQueryEngine(BasicQueryEngine):
         Returns:
             list[Journal]: Matching diamond journals
         """
-        # Get all journals
-        all_journals = self.getAllJournals()
+        # Diamond journals (no APC and with DOAJ Seal) are filtered directly by the triplestore,
+        # areas, categories and quartiles by the relational database: the two sides are joined
+        # before any Journal object is built
+        journal_dfs = [handler.getDiamondJournals() for handler in self.journalQuery]
         
-        # Filter diamond journals: no APC and with DOAJ Seal
-        diamond_journals = [
-            j for j in all_journals 
-            if not j.hasAPC() and j.hasDOAJSeal()  # keep only those ones that don't have an APC and have the DOAJ Seal (diamond open access)
-        ]
+        category_dfs = None
+        if areas or categories or quartiles:
+            category_dfs = [handler.getJournalsInAreasAndCategoriesWithQuartile(areas, categories, quartiles) for handler in self.categoryQuery]
         
-        # Filter by areas and categories with associated quartiles
-        result = []
-        seen = set()
+        return self.getJournalsFromStores(journal_dfs, category_dfs)
         
-        for journal in diamond_journals:
-            # Check areas (if not empty)
-            if areas:
-                journal_areas = {area.getIds()[0] for area in journal.getAreas()} # get area IDs for the journal
-                if not journal_areas.intersection(areas): # if no journal's area matches the filter areas skip it
-                    continue
             
-            # Check categories and quartiles 
-            if categories or quartiles:
-                category_quartile_match = False
+    def query(self):
+        """
+        Returns a new JournalQuery bound to this engine, to compose the conditions that the
+        fixed methods do not offer, e.g.:
+            engine.query().area({"Medicine"}).quartile({"Q1"}).license({"CC BY"}).apc(False).getJournals()
+        """
+        return JournalQuery(self)
                 
-                # Verify each category of the journal
-                for cat in journal.getCategories():
-                    # If no specific categories are provided, consider any category
-                    category_ok = not categories or cat.category in categories
+    def getJournalsDataFrame(self) -> pd.DataFrame:
+        """
+        Returns all the journals of the graph database in one DataFrame, with the columns of the
+        journal query handlers plus the 'category', 'quartile' and 'area' lists of the category
+        query handlers (empty lists for the journals that are not in the relational database).
+        """
+        journal_dfs = [df.fillna("") for df in (handler.getAllJournals() for handler in self.journalQuery) if not df.empty]
+        if not journal_dfs:
+            return pd.DataFrame()
                     
-                    # If no specific quartiles are provided, consider any quartile
-                    quartile_ok = not quartiles or cat.quartile in quartiles
+        merged_df = self.mergeJournalFrames(journal_dfs)
                     
-                    # If both conditions are met for this category
-                    if category_ok and quartile_ok:
-                        category_quartile_match = True
-                        break
+        summary_dfs = [df for df in (handler.getJournalSummaries() for handler in self.categoryQuery) if not df.empty]
+        if summary_dfs:
+            summaries = pd.concat(summary_dfs).drop(columns=['internal_id'])
+            merged_df = self.mergeSummaryRows(self.joinOnIdentifiers(merged_df, summaries, how="left"))
                 
-                if not category_quartile_match: # after checking all categories, if none matches the category/quartile filter, the journal is skipped
-                    continue
+        for col in ["category", "quartile", "area"]:
+            merged_df[col] = [value if isinstance(value, list) else [] for value in merged_df.get(col, pd.Series([None] * len(merged_df)))]
             
-            # Avoid duplicates
-            journal_key = tuple(sorted(journal.getIds()))
-            if journal_key not in seen:
-                seen.add(journal_key)
-                result.append(journal)
+        return merged_df
         
+
+    def mergeSummaryRows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        After a join with the journal summaries, a journal can match more than one row of the
+        relational database (e.g. one for each of its ISSNs, or one for each category handler):
+        its rows are merged into one, concatenating their 'category', 'quartile' and 'area' lists.
+        """
+        if not df["identifier"].duplicated().any():
+            return df
+        return df.groupby("identifier", sort=False, as_index=False).agg(
+            {col: ("first" if col not in ("category", "quartile", "area") else (lambda values: [v for value in values if isinstance(value, list) for v in value]))
+             for col in df.columns if col != "identifier"})
+
+
+    def getJournalCounts(self, by: str, seal=None, apc=None, licenses=None, languages=None, quartiles=None, areas=None, categories=None) -> pd.DataFrame:
+        """
+        Returns how many journals satisfying the conditions have each value of an attribute,
+        e.g. getJournalCounts("area", quartiles={"Q1"}) for the number of Q1 journals per area, or
+        getJournalCounts("license", seal=True, apc=False) for the diamond journals per license.
+        The counts are computed by the stores (see JournalQuery.getCounts), no entity is built.
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'by' column and a 'count' column
+        """
+        query = self.query()
+        if seal is not None:
+            query.seal(seal)
+        if apc is not None:
+            query.apc(apc)
+        for name, values in [("license", licenses), ("language", languages), ("quartile", quartiles), ("area", areas), ("category", categories)]:
+            if values:
+                query.addValues(name, values)
+        return query.getCounts(by)
+
+
+    def getFacetedJournals(self, query=None, page: int = 0, pageSize: int = 20, facets=("area", "quartile", "license", "apc", "seal")) -> dict:
+        """
+        Faceted search: returns one page of the journals satisfying the conditions of the query,
+        together with the facet counts of all of them. The candidate journals are found once (with
+        the plan of the JournalQuery), their categories and areas are read with one bulk lookup,
+        and the facets are all counted on that same candidate set.
+
+        Args:
+            query (JournalQuery): The conditions, e.g. engine.query().seal(True).area({"Medicine"}) (None = all journals)
+            page (int): Number of the page, starting from 0
+            pageSize (int): Number of journals in a page
+            facets: Facets to count, among "area", "category", "quartile", "license", "language", "apc" and "seal"
+
+        Returns:
+            dict: {"journals": list[Journal] of the page (ordered by title),
+                   "total": number of matching journals,
+                   "facets": dict facet -> DataFrame with the facet column and a 'count' column}
+        """
+        if query is None:
+            query = self.query()
+
+        candidates = query.getDataFrame()
+        if candidates.empty:
+            return {"journals": [], "total": 0, "facets": {facet: pd.DataFrame(columns=[facet, "count"]) for facet in facets}}
+
+        # only the columns of the graph database are kept, the relational ones are read in bulk for the candidates
+        graph_columns = [col for col in candidates.columns if not col.endswith("_right") and col not in ("internal_id", "category", "quartile", "area")]
+        candidates = candidates[graph_columns].drop_duplicates(subset=["identifier"]).reset_index(drop=True)
+
+        if any(facet in ("area", "category", "quartile") for facet in facets):
+            identifiers = set(self.explodeIdentifiers(candidates["identifier"]))
+            summary_dfs = [df for df in (handler.getJournalSummaries(identifiers) for handler in self.categoryQuery) if not df.empty]
+            if summary_dfs:
+                summaries = pd.concat(summary_dfs).drop(columns=["internal_id"])
+                # the lists of all the matching rows are kept, so that no category or area is lost in the facets
+                candidates = self.mergeSummaryRows(self.joinOnIdentifiers(candidates, summaries, how="left")).reset_index(drop=True)
+
+        facet_counts = {facet: self.getFacetCounts(candidates, facet) for facet in facets}
+
+        candidates = candidates.sort_values("title", kind="stable")
+        page_df = candidates.iloc[page * pageSize:(page + 1) * pageSize]
+
+        return {"journals": self.buildJournals(page_df), "total": len(candidates), "facets": facet_counts}
+
+
+    def getFacetCounts(self, df: pd.DataFrame, facet: str) -> pd.DataFrame:
+        """
+        Counts the journals of a DataFrame (one row for each journal) for each value of a facet.
+        A journal is counted once for each of its distinct values.
+        """
+        if facet in ("area", "category", "quartile"):
+            values = df[facet] if facet in df.columns else pd.Series([[]] * len(df))
+            values = values.map(lambda value: list(set(value)) if isinstance(value, list) else [])
+        elif facet == "license":
+            values = df["license"].astype(str).str.upper().str.split(",").map(lambda value: list({v.strip() for v in value if v.strip()}))
+        elif facet == "language":
+            values = df["languages"].astype(str).str.split(",").map(lambda value: list({v.strip() for v in value if v.strip()}))
+        else: # "apc" and "seal"
+            values = df[facet].map(lambda value: value is True or str(value).strip().lower() == "true")
+
+        counts = values.explode().dropna().value_counts().rename_axis(facet).reset_index(name="count")
+        return counts.sort_values(["count", facet], ascending=[False, True]).reset_index(drop=True)
+
+
+    def countJournalValues(self, dfs: list[pd.DataFrame], by: str) -> pd.DataFrame:
+        """
+        Counts the journals for each value of an attribute from the (value, identifier) rows that
+        more handlers return (see getJournalValues). The identifiers of all the rows are linked in an
+        IdentityIndex, so that a journal is counted once for each of its distinct values even when
+        more handlers have it, or list it with different identifiers.
+        """
+        values = pd.concat(dfs, ignore_index=True)
+        index = IdentityIndex(values["identifier"].dropna().drop_duplicates().tolist())
+        keys = {identifier: index.getKey(str(identifier).split(";")[0]) for identifier in set(values["identifier"].tolist())} # each distinct string is resolved once
+        pairs = pd.DataFrame({by: values[by], "key": values["identifier"].map(keys)}).drop_duplicates()
+
+        counts = pairs.groupby(by).size().reset_index(name="count")
+        return counts.sort_values(["count", by], ascending=[False, True]).reset_index(drop=True)
+
+
+    def buildBitmapIndex(self):
+        """
+        Builds (or rebuilds) the in-memory bitmap index of the journals, from both the stores.
+        It must be rebuilt after new data is uploaded.
+        """
+        self.bitmapIndex = JournalBitmapIndex(self.getJournalsDataFrame())
+        return True
+
+
+    def getJournalsWithBitmapIndex(self, seal=None, apc=None, licenses=None, languages=None, quartiles=None, areas=None, categories=None) -> list[Journal]:
+        """
+        Returns the journals satisfying all the specified conditions, evaluated on the bitmap index
+        (built on the first call, see buildBitmapIndex). Only the surviving journals are built.
+
+        Args:
+            seal (bool): DOAJ Seal (None = any)
+            apc (bool): APC (None = any)
+            licenses (set[str]): at least one of the licenses
+            languages (set[str]): at least one of the languages
+            quartiles (set[str]): at least one category with one of the quartiles
+            areas (set[str]): at least one of the areas
+            categories (set[str]): at least one of the categories (with one of the quartiles, if specified)
+
+        Returns:
+            list[Journal]: Matching journals
+        """
+        if self.bitmapIndex is None:
+            self.buildBitmapIndex()
+
+        mask = self.bitmapIndex.select(seal=seal, apc=apc, licenses=licenses, languages=languages,
+                                       quartiles=quartiles, areas=areas, categories=categories)
+        return self.buildJournals(self.bitmapIndex.getDataFrame(mask))
+
+
+    def getDatasetVersion(self) -> list:
+        """
+        Returns the versions of the datasets of all the query handlers, as a list of
+        [dbPathOrUrl, version] pairs (journal handlers first). It changes whenever new data is
+        uploaded to any of the stores.
+        """
+        return [[handler.getDbPathOrUrl(), handler.getDatasetVersion()] for handler in self.journalQuery + self.categoryQuery]
+
+
+    def saveSnapshot(self, path: str) -> bool:
+        """
+        Writes the fully hydrated state of the engine (the journals of both stores and the bitmap
+        index, built if needed) to a file, together with the dataset version it was built from.
+        Only data is written, never Python objects: the journals and the list of the bitmaps as
+        JSON, then the bitmaps as raw bytes (one byte per journal, all of the same length), so that
+        loadSnapshot can map them from the file without copying.
+
+        Layout: magic, length + JSON of the version, length + JSON of the journals and of the
+        bitmaps (attribute, value), bitmaps.
+
+        Returns:
+            bool: True if the snapshot was written, False otherwise
+        """
+        if self.bitmapIndex is None:
+            self.buildBitmapIndex()
+        version = self.getDatasetVersion()
+
+        def plain(value):
+            # NumPy scalars (e.g. the True/False of seal and APC) and tuples as JSON values
+            if isinstance(value, tuple):
+                return [plain(v) for v in value]
+            return value.item() if isinstance(value, np.generic) else value
+
+        bitmaps = [(attribute, value, bitmap) for attribute, values in self.bitmapIndex.bitmaps.items() for value, bitmap in values.items()]
+        header = {
+            "journals": json.loads(self.bitmapIndex.df.to_json(orient="split", index=False)),
+            "size": self.bitmapIndex.size,
+            "bitmaps": [[attribute, plain(value)] for attribute, value, _ in bitmaps],
+        }
+        version_json = json.dumps(version).encode("utf-8")
+        header_json = json.dumps(header).encode("utf-8")
+
+        try:
+            # written to a temporary file and then renamed, so a reader never sees half a snapshot
+            with open(path + ".tmp", "wb") as file:
+                file.write(self.SNAPSHOT_MAGIC)
+                file.write(struct.pack("<Q", len(version_json)))
+                file.write(version_json)
+                file.write(struct.pack("<Q", len(header_json)))
+                file.write(header_json)
+                for _, _, bitmap in bitmaps:
+                    file.write(np.ascontiguousarray(bitmap, dtype=bool).tobytes())
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Error writing the snapshot {path}: {e}")
+            return False
+
+        self.snapshotVersion = version
+        return True
+
+
+    def readSnapshotVersion(self, path: str):
+        """
+        Returns the dataset version stored in a snapshot (only its header is read), or None if the
+        file does not exist or is not a snapshot.
+        """
+        try:
+            with open(path, "rb") as file:
+                if file.read(len(self.SNAPSHOT_MAGIC)) != self.SNAPSHOT_MAGIC:
+                    return None
+                (length,) = struct.unpack("<Q", file.read(8))
+                return json.loads(file.read(length).decode("utf-8"))
+        except (OSError, ValueError, struct.error):
+            return None
+
+
+    def loadSnapshot(self, path: str):
+        """
+        Loads a snapshot written by saveSnapshot, without rebuilding anything: the file is
+        memory-mapped and the bitmaps are read-only NumPy arrays over the mapped bytes, so only the
+        pages that the queries touch are read from disk.
+
+        Returns:
+            The dataset version of the snapshot, or None if it could not be loaded
+        """
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            print(f"Error reading the snapshot {path}: {e}")
+            return None
+
+        try:
+            view = memoryview(mapped)
+            if bytes(view[:len(self.SNAPSHOT_MAGIC)]) != self.SNAPSHOT_MAGIC:
+                print(f"Error reading the snapshot {path}: not a snapshot")
+                return None
+            offset = len(self.SNAPSHOT_MAGIC)
+            (length,) = struct.unpack_from("<Q", mapped, offset)
+            version = json.loads(bytes(view[offset + 8:offset + 8 + length]).decode("utf-8"))
+            offset += 8 + length
+
+            (length,) = struct.unpack_from("<Q", mapped, offset)
+            header = json.loads(bytes(view[offset + 8:offset + 8 + length]).decode("utf-8"))
+            offset += 8 + length
+
+            size = header["size"]
+            if offset + len(header["bitmaps"]) * size > len(mapped):
+                raise ValueError("truncated file")
+            journals = header["journals"]
+            state = {"journals": pd.DataFrame(journals["data"], columns=journals["columns"]), "bitmaps": {}}
+            for number, (attribute, value) in enumerate(header["bitmaps"]):
+                if isinstance(value, list): # the (category, quartile) pairs
+                    value = tuple(value)
+                bitmap = np.frombuffer(mapped, dtype=bool, count=size, offset=offset + number * size)
+                state["bitmaps"].setdefault(attribute, {})[value] = bitmap
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            print(f"Error reading the snapshot {path}: {e}")
+            return None
+
+        self.bitmapIndex = JournalBitmapIndex(state["journals"], bitmaps=state["bitmaps"])
+        self.snapshotVersion = version
+        return version
+
+
+    def warmStart(self, path: str) -> bool:
+        """
+        Starts the engine from a snapshot: if the snapshot in path was built from the same dataset
+        version that the stores report now, it is loaded (see loadSnapshot); otherwise the state is
+        rebuilt from the stores and the snapshot is rewritten.
+
+        Returns:
+            bool: True if the snapshot was up to date and loaded, False if it was rebuilt
+        """
+        version = self.getDatasetVersion()
+        if self.readSnapshotVersion(path) == version and self.loadSnapshot(path) == version:
+            return True
+
+        self.buildBitmapIndex()
+        self.saveSnapshot(path)
+        return False
+
+
+    def exportJournals(self, path: str, format: str = "parquet", partitionBy: str = None, batchSize: int = 5000) -> int:
+        """
+        Exports the journals of both stores (the same data of getJournalsDataFrame) to a columnar
+        dataset in the folder path, without building any Journal object. The journals are read in
+        batches of batchSize from the journal query handlers (getJournalsPage), each batch is joined
+        with the categories, quartiles and areas of its journals (getJournalSummaries) and written
+        as one file, so the whole dataset is never in memory.
+
+        Columns: journal, title, identifiers, languages, publisher, license (strings or lists of
+        strings), seal and apc (booleans), categories, quartiles and areas (lists of strings, the
+        quartile in position i is the one of the category in position i).
+
+        Args:
+            path (str): Folder of the dataset (better a new one: the files of an older export are not removed)
+            format (str): "parquet" or "arrow" (Arrow IPC files)
+            partitionBy (str): None, "area" or "quartile": one sub-folder (area=.../) for each value;
+                               a journal is written in the partition of each of its values
+            batchSize (int): Number of journals read from the graph database at a time
+
+        Returns:
+            int: Number of journals exported, or -1 if the export was not possible
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+        except ImportError:
+            print("pyarrow is needed to export the journals: pip install pyarrow")
+            return -1
+
+        if format not in ("parquet", "arrow") or partitionBy not in (None, "area", "quartile"):
+            print(f"Unsupported export: format={format}, partitionBy={partitionBy}")
+            return -1
+
+        schema = pa.schema([
+            ("journal", pa.string()), ("title", pa.string()), ("identifiers", pa.list_(pa.string())),
+            ("languages", pa.list_(pa.string())), ("publisher", pa.string()), ("license", pa.string()),
+            ("seal", pa.bool_()), ("apc", pa.bool_()), ("categories", pa.list_(pa.string())),
+            ("quartiles", pa.list_(pa.string())), ("areas", pa.list_(pa.string()))])
+        if partitionBy:
+            schema = schema.append(pa.field(partitionBy, pa.string()))
+
+        def as_bool(value):
+            return value is True or str(value).strip().lower() == "true"
+
+        def as_list(value, separator):
+            return [v.strip() for v in str(value).split(separator) if v.strip()]
+
+        seen = set() # keys of the journals already exported (the same journal can be in more than one handler, see journalKey)
+        exported = 0
+        batch_number = 0
+
+        for handler in self.journalQuery:
+            offset = 0
+            while True:
+                df = handler.getJournalsPage(offset, batchSize)
+                offset += batchSize
+                if df.empty:
+                    break
+                df = df.fillna("")
+                keys = [self.journalKey(identifier) for identifier in df["identifier"]]
+                mask = []
+                for key in keys:
+                    mask.append(key not in seen)
+                    seen.add(key)
+                df = df[mask]
+
+                # categories, quartiles and areas of the journals of this batch only
+                identifiers = set(self.explodeIdentifiers(df["identifier"]))
+                summary_dfs = [summary for summary in (h.getJournalSummaries(identifiers) for h in self.categoryQuery) if not summary.empty]
+                if summary_dfs:
+                    summaries = pd.concat(summary_dfs).drop(columns=["internal_id"])
+                    df = self.joinOnIdentifiers(df, summaries, how="left").drop_duplicates(subset=["identifier"])
+
+                columns = {
+                    "journal": df["journal"].astype(str).tolist(),
+                    "title": df["title"].astype(str).tolist(),
+                    "identifiers": [as_list(value, ";") for value in df["identifier"]],
+                    "languages": [as_list(value, ",") for value in df["languages"]],
+                    "publisher": df["publisher"].astype(str).tolist(),
+                    "license": df["license"].astype(str).tolist(),
+                    "seal": [as_bool(value) for value in df["seal"]],
+                    "apc": [as_bool(value) for value in df["apc"]],
+                }
+                for column, name in [("category", "categories"), ("quartile", "quartiles"), ("area", "areas")]:
+                    values = df[column] if column in df.columns else [None] * len(df)
+                    columns[name] = [value if isinstance(value, list) else [] for value in values]
+
+                table = pa.table(columns, schema=schema.remove(schema.get_field_index(partitionBy)) if partitionBy else schema)
+                exported += table.num_rows
+
+                if partitionBy:
+                    # one row for each (journal, distinct value); the journals without values go to the null partition
+                    list_column = "areas" if partitionBy == "area" else "quartiles"
+                    rows, values = [], []
+                    for row, journal_values in enumerate(columns[list_column]):
+                        for value in (sorted(set(journal_values)) or [None]):
+                            rows.append(row)
+                            values.append(value)
+                    table = table.take(pa.array(rows, type=pa.int64())).append_column(partitionBy, pa.array(values, type=pa.string()))
+
+                ds.write_dataset(table, path, format="parquet" if format == "parquet" else "ipc",
+                                 partitioning=[partitionBy] if partitionBy else None, partitioning_flavor="hive" if partitionBy else None,
+                                 basename_template=f"part-{batch_number}-{{i}}." + ("parquet" if format == "parquet" else "arrow"),
+                                 existing_data_behavior="overwrite_or_ignore")
+                batch_number += 1
+
+        return exported
+
+
+
+class JournalBitmapIndex:
+    """
+    JournalBitmapIndex is an in-memory index of the low-cardinality attributes of the journals
+    (seal, APC, licenses, languages, quartiles, areas, categories). Each journal gets a dense
+    ordinal (its row in the DataFrame) and each value of each attribute a NumPy boolean array
+    with True in the positions of the journals having it, so that the conditions are answered
+    with vectorized OR (values of the same attribute) and AND (different attributes).
+
+    Attributes:
+        df (pd.DataFrame): The indexed journals, as returned by FullQueryEngine.getJournalsDataFrame
+        bitmaps (dict): attribute -> value -> boolean array
+    """
+    def __init__(self, df: pd.DataFrame, bitmaps: dict = None):
+        self.df = df.reset_index(drop=True)
+        self.size = len(self.df)
+        self.bitmaps = {}
+
+        if bitmaps is not None: # already built, e.g. loaded from a snapshot
+            self.bitmaps = bitmaps
+            return
+        if self.df.empty:
+            return
+
+        def as_bool(value):
+            return value is True or str(value).strip().lower() == "true"
+
+        self.addColumn("seal", self.df["seal"].map(as_bool))
+        self.addColumn("apc", self.df["apc"].map(as_bool))
+        self.addColumn("license", self.df["license"].astype(str).str.upper().str.split(","))
+        self.addColumn("language", self.df["languages"].astype(str).str.split(","))
+        self.addColumn("quartile", self.df["quartile"])
+        self.addColumn("area", self.df["area"])
+        self.addColumn("category", self.df["category"])
+        # pairs, for the categories that must have a specific quartile
+        self.addColumn("category_quartile", pd.Series([list(zip(c, q)) for c, q in zip(self.df["category"], self.df["quartile"])]))
+
+
+    def addColumn(self, attribute, values: pd.Series):
+        """
+        Creates the bitmaps of an attribute from a Series aligned with the journals (single values or lists)
+        """
+        exploded = values.explode()
+        exploded = exploded[exploded.notna()]
+        if exploded.map(lambda value: isinstance(value, str)).any():
+            exploded = exploded.map(lambda value: value.strip() if isinstance(value, str) else value)
+            exploded = exploded[exploded != ""]
+
+        self.bitmaps[attribute] = {}
+        for value, positions in exploded.groupby(exploded, sort=False).groups.items():
+            bitmap = np.zeros(self.size, dtype=bool)
+            bitmap[np.asarray(positions)] = True
+            self.bitmaps[attribute][value] = bitmap
+
+
+    def bitmap(self, attribute, values) -> np.ndarray:
+        """
+        Returns the OR of the bitmaps of the values of an attribute
+        """
+        result = np.zeros(self.size, dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps.get(attribute, {}).get(value)
+            if bitmap is not None:
+                result |= bitmap
         return result
     
+
+    def select(self, seal=None, apc=None, licenses=None, languages=None, quartiles=None, areas=None, categories=None) -> np.ndarray:
+        """
+        Returns the boolean mask of the journals satisfying all the conditions (None or empty = no condition)
+        """
+        mask = np.ones(self.size, dtype=bool)
+
+        if seal is not None:
+            mask &= self.bitmap("seal", [bool(seal)])
+        if apc is not None:
+            mask &= self.bitmap("apc", [bool(apc)])
+        if licenses:
+            mask &= self.bitmap("license", {license.strip().upper() for license in licenses})
+        if languages:
+            mask &= self.bitmap("language", languages)
+        if areas:
+            mask &= self.bitmap("area", areas)
+        if categories and quartiles: # the same category must have one of the quartiles
+            mask &= self.bitmap("category_quartile", [(c, q) for c in categories for q in quartiles])
+        elif categories:
+            mask &= self.bitmap("category", categories)
+        elif quartiles:
+            mask &= self.bitmap("quartile", quartiles)
+
+        return mask
+
+
+    def getDataFrame(self, mask: np.ndarray) -> pd.DataFrame:
+        """
+        Returns the rows of the journals selected by the mask
+        """
+        if self.df.empty:
+            return self.df
+        return self.df[mask]
+
+
+
+class JournalQuery:
+    """
+    JournalQuery is a composable query over the journals of a FullQueryEngine. Each condition is
+    compiled to the store that owns it: title, publisher, licenses, languages, APC and DOAJ Seal to
+    the graph database, areas, categories and quartiles to the relational database.
+
+    A small heuristic planner decides which side runs first: the side with the lowest estimated
+    selectivity is executed first and the ISSNs it returns are passed to the other side as a
+    VALUES (SPARQL) or IN (SQL) filter. The two results are then joined on the identifiers.
+    The selectivities are fixed guesses (see SELECTIVITY), not statistics read from the stores:
+    counting the matching journals in the graph database would cost about as much as the query.
+
+    Methods:
+        title(partialTitle), publisher(partialName), license(licenses), language(languages),
+        apc(value), seal(value): Conditions on the graph database.
+        area(areas), category(categories), quartile(quartiles): Conditions on the relational database.
+        plan(): Returns the chosen plan as a list of steps.
+        explain(): Returns a description of the chosen plan and of the expected round-trips.
+        getDataFrame(): Runs the query and returns the joined DataFrame.
+        getJournals(): Runs the query and returns the Journal objects.
+        getCounts(by): Counts the matching journals for each value of an attribute.
+    """
+
+    # Guessed fraction of the journals that satisfies each condition (for each value, where more values are allowed):
+    # fixed constants of the heuristic, chosen for the DOAJ/Scimago data, not counts from the stores
+    SELECTIVITY = {
+        "title": 0.01,
+        "publisher": 0.01,
+        "license": 0.3,
+        "language": 0.2,
+        "apc": 0.5,
+        "seal": 0.1,
+        "area": 0.15,
+        "category": 0.01,
+        "quartile": 0.25,
+    }
+
+    GRAPH_CONDITIONS = ("title", "publisher", "license", "language", "apc", "seal")
+    RELATIONAL_CONDITIONS = ("area", "category", "quartile")
+
+    # Above this number of ISSNs the second side is not restricted, and the join is done only locally
+    MAX_PUSHDOWN_IDENTIFIERS = 500
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.conditions = {}
+
+
+    def addValues(self, name, values):
+        if isinstance(values, str):
+            values = {values}
+        self.conditions[name] = set(self.conditions.get(name, set())) | set(values)
+        return self
+
+    def title(self, partialTitle: str):
+        self.conditions["title"] = partialTitle
+        return self
+
+    def publisher(self, partialName: str):
+        self.conditions["publisher"] = partialName
+        return self
+
+    def license(self, licenses):
+        return self.addValues("license", licenses)
+
+    def language(self, languages):
+        return self.addValues("language", languages)
+
+    def apc(self, value: bool = True):
+        self.conditions["apc"] = bool(value)
+        return self
+
+    def seal(self, value: bool = True):
+        self.conditions["seal"] = bool(value)
+        return self
+
+    def area(self, areas):
+        return self.addValues("area", areas)
+
+    def category(self, categories):
+        return self.addValues("category", categories)
+
+    def quartile(self, quartiles):
+        return self.addValues("quartile", quartiles)
+
+
+    def estimateSelectivity(self, names) -> float:
+        """
+        Estimated fraction of the journals that satisfies all the conditions in names (product of
+        the SELECTIVITY constants, as if the conditions were independent)
+        """
+        selectivity = 1.0
+        for name in names:
+            value = self.conditions[name]
+            count = len(value) if isinstance(value, set) else 1
+            selectivity *= min(1.0, self.SELECTIVITY[name] * count)
+        return selectivity
+
+
+    def plan(self) -> list[dict]:
+        """
+        Returns the chosen plan: a list of steps, one for each store that has to be queried,
+        in execution order. Each step is a dict with the store ("graph" or "relational"), its
+        conditions, its estimated selectivity and whether it receives the ISSNs of the previous step.
+        """
+        graph = [name for name in self.GRAPH_CONDITIONS if name in self.conditions]
+        relational = [name for name in self.RELATIONAL_CONDITIONS if name in self.conditions]
+
+        graph_step = {"store": "graph", "conditions": graph, "selectivity": self.estimateSelectivity(graph), "restricted": False}
+        relational_step = {"store": "relational", "conditions": relational, "selectivity": self.estimateSelectivity(relational), "restricted": False}
+
+        if not relational: # the graph database is always needed, to build the journals
+            return [graph_step]
+
+        # the most selective side runs first and restricts the other one
+        steps = [relational_step, graph_step] if relational_step["selectivity"] <= graph_step["selectivity"] else [graph_step, relational_step]
+        steps[1]["restricted"] = True
+        return steps
+
+
+    def explain(self) -> str:
+        """
+        Returns a readable description of the chosen plan and of the expected round-trips.
+        """
+        handlers = {"graph": len(self.engine.journalQuery), "relational": len(self.engine.categoryQuery)}
+        lines = ["Plan:"]
+        round_trips = 0
+        steps = self.plan()
+
+        for number, step in enumerate(steps, start=1):
+            conditions = ", ".join(step["conditions"]) if step["conditions"] else "no conditions"
+            line = f"  {number}. {step['store']}: {conditions} (estimated selectivity {step['selectivity']:.4f})"
+            if step["restricted"]:
+                line += f", restricted to the ISSNs of step {number - 1} if they are at most {self.MAX_PUSHDOWN_IDENTIFIERS}"
+            lines.append(line + f" -> {handlers[step['store']]} query(ies)")
+            round_trips += handlers[step["store"]]
+
+        if len(steps) > 1:
+            lines.append(f"  {len(steps) + 1}. join on identifiers, skipped if step 1 returns no journal")
+        lines.append(f"Expected round-trips: {round_trips}")
+        return "\n".join(lines)
+
+
+    def runStep(self, step, identifiers=None) -> list[pd.DataFrame]:
+        """
+        Runs one step of the plan on all the handlers of its store
+        """
+        dfs = []
+        if step["store"] == "graph":
+            for handler in self.engine.journalQuery:
+                dfs.append(handler.getJournalsWithFilters(
+                    partialTitle=self.conditions.get("title"),
+                    partialName=self.conditions.get("publisher"),
+                    licenses=self.conditions.get("license"),
+                    languages=self.conditions.get("language"),
+                    apc=self.conditions.get("apc"),
+                    seal=self.conditions.get("seal"),
+                    identifiers=identifiers
+                ))
+        else:
+            for handler in self.engine.categoryQuery:
+                dfs.append(handler.getJournalsInAreasAndCategoriesWithQuartile(
+                    self.conditions.get("area", set()),
+                    self.conditions.get("category", set()),
+                    self.conditions.get("quartile", set()),
+                    identifiers=identifiers
+                ))
+        return [df for df in dfs if not df.empty]
+
+
+    def getDataFrame(self) -> pd.DataFrame:
+        """
+        Runs the plan and returns the journals of the graph database that satisfy all the
+        conditions, joined with the identifiers of the relational database (if queried).
+        """
+        results = {}
+        identifiers = None
+
+        for step in self.plan():
+            dfs = self.runStep(step, identifiers if step["restricted"] else None)
+            if not dfs:
+                return pd.DataFrame()
+
+            results[step["store"]] = self.engine.mergeJournalFrames(dfs)
+
+            # the ISSNs of this step are passed to the next one, if they are not too many
+            found = self.engine.explodeIdentifiers(results[step["store"]]["identifier"]).unique()
+            identifiers = set(found) if len(found) <= self.MAX_PUSHDOWN_IDENTIFIERS else None
+
+        merged_df = results["graph"].fillna("")
+        if "relational" in results:
+            merged_df = self.engine.joinOnIdentifiers(merged_df, results["relational"])
+        return merged_df
+
+
+    def getJournals(self) -> list[Journal]:
+        """
+        Runs the plan and returns the list of matching Journal objects
+        """
+        return self.engine.buildJournals(self.getDataFrame())
+
+
+    def getCounts(self, by: str) -> pd.DataFrame:
+        """
+        Counts the journals satisfying the conditions for each value of an attribute, without
+        building any entity. The counts are computed by the store that owns the attribute (SQL
+        GROUP BY or SPARQL COUNT); when the engine has more handlers of that store, they return the
+        (value, journal) pairs instead, and each journal is counted once (see countJournalValues).
+        If there are conditions on the other store, they are resolved
+        first as a set of ISSNs that restricts the counted journals. Above MAX_PUSHDOWN_IDENTIFIERS
+        ISSNs the graph database is not restricted: its journals are read and counted locally.
+
+        Args:
+            by (str): "license", "language", "apc", "seal" (graph) or "area", "category", "quartile" (relational)
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'by' column and a 'count' column, sorted by count
+        """
+        graph_by = ("license", "language", "apc", "seal")
+        owner = "graph" if by in graph_by else "relational"
+        other = "relational" if owner == "graph" else "graph"
+
+        identifiers = None
+        other_conditions = self.RELATIONAL_CONDITIONS if other == "relational" else self.GRAPH_CONDITIONS
+        if any(name in self.conditions for name in other_conditions):
+            dfs = self.runStep({"store": other})
+            if not dfs:
+                return pd.DataFrame(columns=[by, "count"])
+            identifiers = set(self.engine.explodeIdentifiers(pd.concat(dfs)["identifier"]))
+
+        if owner == "graph" and identifiers is not None and len(identifiers) > self.MAX_PUSHDOWN_IDENTIFIERS:
+            # too many ISSNs for the SPARQL query: the journals of the graph conditions are joined
+            # locally with the ISSNs, and their values are counted here (the relational database
+            # receives the ISSNs as one JSON parameter, so it is always restricted)
+            dfs = self.runStep({"store": "graph"})
+            if not dfs:
+                return pd.DataFrame(columns=[by, "count"])
+            journals = self.engine.mergeJournalFrames(dfs)
+            journals = journals[self.engine.hasMatchingIdentifier(journals["identifier"], identifiers)]
+            return self.engine.getFacetCounts(journals, by)
+
+        handlers = self.engine.journalQuery if owner == "graph" else self.engine.categoryQuery
+        # with one handler the store counts the journals; with more handlers the same journal can be in
+        # more of them (e.g. replicated databases), so each one returns its (value, journal) pairs and
+        # the engine counts the distinct journals
+        method = "getJournalCounts" if len(handlers) == 1 else "getJournalValues"
+
+        dfs = []
+        for handler in handlers:
+            if owner == "graph":
+                dfs.append(getattr(handler, method)(
+                    by,
+                    partialTitle=self.conditions.get("title"),
+                    partialName=self.conditions.get("publisher"),
+                    licenses=self.conditions.get("license"),
+                    languages=self.conditions.get("language"),
+                    apc=self.conditions.get("apc"),
+                    seal=self.conditions.get("seal"),
+                    identifiers=identifiers
+                ))
+            else:
+                dfs.append(getattr(handler, method)(
+                    by,
+                    self.conditions.get("area", set()),
+                    self.conditions.get("category", set()),
+                    self.conditions.get("quartile", set()),
+                    identifiers=identifiers
+                ))
+
+        dfs = [df for df in dfs if not df.empty]
+        if not dfs:
+            return pd.DataFrame(columns=[by, "count"])
+        if method == "getJournalValues":
+            return self.engine.countJournalValues(dfs, by)
+        return dfs[0]
@@ -17,7 +17,7 @@ class Journal(IdentifiableEntity):
     def __init__(self, identifiers, title, languages, seal: bool, licence, apc: bool, publisher=None, categories=None, areas=None):
         super().__init__(identifiers) 
         self.title = title
-        self.languages = languages   
+        self.languages = sorted(languages)  # sorted once here, instead of at every getLanguages call
         self.publisher = publisher
         self.seal = seal
         self.licence = licence
@@ -31,7 +31,7 @@ class Journal(IdentifiableEntity):
         return self.title
 
     def getLanguages(self):
-        return sorted(self.languages)  # Returns a sorted list
+        return list(self.languages)  # Returns a sorted list (a copy, so that the journal cannot be modified through it)
 
     def getPublisher(self):
         return self.publisher
@@ -108,12 +108,67 @@ class UploadHandler(Handler):
 
 import sqlite3
 import json
+import os
+from urllib.request import pathname2url
 
 
 class CategoryUploadHandler(UploadHandler):
-    
+
+    # Distinct (category, area) pairs of the same journals; a category of a journal without areas
+    # gets a NULL area and an area of a journal without categories gets a NULL category, so that
+    # the table also lists all the categories and areas that are assigned to some journal.
+    CATEGORY_AREA_QUERY = '''
+        SELECT C.category, A.area
+        FROM HasCategory HC
+        JOIN Category C ON HC.category_id = C.category_id
+        LEFT JOIN HasArea HA ON HC.journal_id = HA.journal_id
+        LEFT JOIN Area A ON HA.area_id = A.area_id
+        UNION
+        SELECT C.category, A.area
+        FROM HasArea HA
+        JOIN Area A ON HA.area_id = A.area_id
+        LEFT JOIN HasCategory HC ON HA.journal_id = HC.journal_id
+        LEFT JOIN Category C ON HC.category_id = C.category_id
+    '''
+
     def __init__(self):
         super().__init__()
+        self.walMode = True # see setWalMode
+        self.busyTimeout = 30.0 # seconds to wait for the write lock held by another upload
+        self.upsert = False # see setUpsert
+        self.lastLoadReport = {} # see getLastLoadReport
+
+    def getUpsert(self):
+        return self.upsert
+
+    def setUpsert(self, upsert):
+        """
+        Enables or disables the upsert mode. By default an upload only adds categories and areas to
+        the journals; in upsert mode the categories and areas of each journal of the file replace
+        the ones it had (e.g. a new Scimago year): the associations that are not in the file anymore
+        are deleted, and so are the categories and areas that no journal uses anymore.
+        """
+        self.upsert = upsert
+        return True
+
+    def getLastLoadReport(self):
+        """
+        Returns how many rows the last pushDataToDb inserted, deleted and left unchanged, e.g.
+        {"HasCategory": {"inserted": 10, "deleted": 2, "unchanged": 300}, "HasArea": {...},
+         "Category": {"inserted": 1, "deleted": 1}, "Area": {"inserted": 0, "deleted": 0}}
+        """
+        return self.lastLoadReport
+
+    def getWalMode(self):
+        return self.walMode
+
+    def setWalMode(self, walMode):
+        """
+        Enables (default) or disables the WAL journal mode of the database, that lets the query
+        handlers read the database while an upload is in progress.
+        """
+        self.walMode = walMode
+        return True
     
     def pushDataToDb(self, path):
         db_path = self.getDbPathOrUrl()
@@ -126,11 +181,28 @@ class CategoryUploadHandler(UploadHandler):
 
 # Database connection
     
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=self.busyTimeout)
         conn.execute("PRAGMA foreign_keys = ON;")
         cursor = conn.cursor()
         try:
 
+            # JSON LOADING
+
+            # File reading (before the transaction, so that the database is not locked while parsing):
+            
+            with open(path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+
+            # In WAL mode the readers keep reading the last committed data while this upload writes,
+            # instead of waiting for it or failing with "database is locked" (the mode is stored in the file).
+            if self.walMode:
+                cursor.execute("PRAGMA journal_mode = WAL")
+
+            # The whole upload (tables included) is a single transaction: the readers see either
+            # the dataset before it or the complete new one, never a half-loaded one.
+            # IMMEDIATE takes the write lock now, so two uploads at the same time wait for each other.
+            cursor.execute("BEGIN IMMEDIATE")
+
             # Table creation
             # -- Main Journal table
             cursor.execute('''CREATE TABLE IF NOT EXISTS Journal (
@@ -177,14 +249,40 @@ class CategoryUploadHandler(UploadHandler):
             FOREIGN KEY (area_id) REFERENCES Area(area_id)
             );''')
 
+            # -- Materialized summary: one row for each journal, with its identifiers, categories, quartiles
+            # and areas already aggregated (JSON lists), so that the query handler does not have to join the tables above.
+            # It is refreshed by refreshJournalSummary for the journals touched by each upload.
+            cursor.execute('''CREATE TABLE IF NOT EXISTS JournalSummary (
+            journal_id TEXT PRIMARY KEY,
+            identifier TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quartile TEXT NOT NULL,
+            area TEXT NOT NULL,
+            FOREIGN KEY (journal_id) REFERENCES Journal(internal_id)
+            );''')
 
-            # JSON LOADING
+            # -- Materialized category <-> area relation (by name): it is tiny and it changes only here,
+            # so it is rebuilt at the end of each upload (see CATEGORY_AREA_QUERY) instead of joining
+            # HasCategory and HasArea of every journal at each query.
+            cursor.execute('''CREATE TABLE IF NOT EXISTS CategoryArea (
+            category TEXT,
+            area TEXT
+            );''')
+
+            # -- Canonical identity index: the canonical form of each identifier (see IdentityIndex.canonicalIssn),
+            # so that "1234567x", "1234-567X" and " 1234-567X" are the same journal, found with one lookup of the primary key.
+            cursor.execute('''CREATE TABLE IF NOT EXISTS CanonicalIdentifier (
+            canonical TEXT NOT NULL,
+            journal_id TEXT NOT NULL,
+            PRIMARY KEY (canonical, journal_id),
+            FOREIGN KEY (journal_id) REFERENCES Journal(internal_id)
+            );''')
+
+            # databases created before this table: the identifiers already stored are indexed now
+            cursor.execute("SELECT journal_id, identifier FROM JournalIdentifier WHERE journal_id NOT IN (SELECT journal_id FROM CanonicalIdentifier)")
+            cursor.executemany("INSERT OR IGNORE INTO CanonicalIdentifier (canonical, journal_id) VALUES (?, ?)",
+                               [(IdentityIndex.canonicalIssn(identifier), journal_id) for journal_id, identifier in cursor.fetchall()])
 
-            # File reading:
-            
-            with open(path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-                    
 
             # --- Retrieving existing counters --- 
             # it is essential to retrieve the last existing ID in the database before starting to generate new IDs. 
@@ -200,6 +298,17 @@ class CategoryUploadHandler(UploadHandler):
             area_counter = cursor.fetchone()[0] + 1
             # ----------------------------------------
 
+            touched_journal_ids = set() # journals whose summary has to be refreshed at the end of the upload
+
+            # Categories and areas of each journal in the file (ids, in order of appearance): they are
+            # compared with the ones already in the database after reading the whole file.
+            file_categories = {}
+            file_areas = {}
+            report = {"HasCategory": {"inserted": 0, "deleted": 0, "unchanged": 0},
+                      "HasArea": {"inserted": 0, "deleted": 0, "unchanged": 0},
+                      "Category": {"inserted": 0, "deleted": 0},
+                      "Area": {"inserted": 0, "deleted": 0}}
+
             for journal_entry in json_data:
             # Checks whether the journal already exists based on one of its unique identifiers (e.g., ISSN/EISSN).
             # This is important to avoid duplicates:
@@ -214,9 +323,9 @@ class CategoryUploadHandler(UploadHandler):
                         cursor.execute('''
                             SELECT Journal.internal_id
                             FROM Journal
-                            JOIN JournalIdentifier ON Journal.internal_id = JournalIdentifier.journal_id
-                            WHERE JournalIdentifier.identifier = ?
-                        ''', (identifier_to_check,)) # This query looks for a journal with that identifier
+                            JOIN CanonicalIdentifier ON Journal.internal_id = CanonicalIdentifier.journal_id
+                            WHERE CanonicalIdentifier.canonical = ?
+                        ''', (IdentityIndex.canonicalIssn(identifier_to_check),)) # This query looks for a journal with that identifier (in canonical form, e.g. with or without hyphen)
                         result = cursor.fetchone() # Retrieves the first row of the query result. It will be `None` if no match is found, otherwise a tuple containing the journal's internal_id (e.g., ('journal-123',)).
                         if result: # If the query found a match (i.e., `result` is not `None`), a Journal with that id is found:
                             existing_journal_id = result[0] # Assign the internal_id of the found journal to a variable
@@ -241,8 +350,18 @@ class CategoryUploadHandler(UploadHandler):
 
                 # Once the code has determined the current_journal_id for the JSON entry being processed, it proceeds to associate to that journal_id (journal-number according to the counter) all identifiers (i.e., ISSN and EISSN) present in the journal_identifiers list in the JSON.
 
+                touched_journal_ids.add(current_journal_id)
+                journal_categories = file_categories.setdefault(current_journal_id, [])
+                journal_areas = file_areas.setdefault(current_journal_id, [])
+
                 # Inserting Identifiers
                 for identifier in journal_identifiers: # Iterates over each identifier of the current journal
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO CanonicalIdentifier (canonical, journal_id)
+                        VALUES (?, ?)
+                    ''', (IdentityIndex.canonicalIssn(identifier), current_journal_id)) # Inserts the canonical form of the identifier in the identity index.
+                    if cursor.rowcount == 0: # the journal already has this identifier, maybe written in another form (e.g. without hyphen): it is not stored twice
+                        continue
                     cursor.execute('''
                         INSERT OR IGNORE INTO JournalIdentifier (journal_id, identifier)
                         VALUES (?, ?)
@@ -270,15 +389,14 @@ class CategoryUploadHandler(UploadHandler):
                                 VALUES (?, ?, ?)
                             ''', (cat_id_to_use, category_name, quartile)) # Attempt to insert the new category
                             cat_counter += 1 # Increment the counter for the next new category
+                            report["Category"]["inserted"] += 1
 
                         except sqlite3.IntegrityError: # Catch the exception if an integrity error occurs
                             print(f"Warning: Category ID {cat_id_to_use} or category/quartile combination already exists (unexpected). Skipping association for this category.")
 
-                    # Inserting into HasCategory table to associate the journal with the category.
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO HasCategory (journal_id, category_id)
-                        VALUES (?, ?)
-                    ''', (current_journal_id, cat_id_to_use)) # `INSERT OR IGNORE` avoids duplicates if the association already exists.
+                    # The association of the journal with the category is written after the loop (see below).
+                    if cat_id_to_use not in journal_categories:
+                        journal_categories.append(cat_id_to_use)
                 
                 # Inserting Areas and HasArea association
                 for area_name_raw in journal_entry.get('areas', []): # Iterates over each item in the 'areas' list in the JSON.
@@ -307,19 +425,45 @@ class CategoryUploadHandler(UploadHandler):
                                 VALUES (?, ?)
                             ''', (area_id_to_use, safe_area_name)) # Attempt to insert the new area.
                             area_counter += 1 # Increment the counter for the next new area.
+                            report["Area"]["inserted"] += 1
 
                         except sqlite3.IntegrityError: # Catch the exception if an integrity error occurs.
                             print(f"Warning: Area ID '{area_id_to_use}' or area already exists (unexpected). Skipping association for this area.") # Print a warning.
                             continue # Skip association for this area and move to the next.
                     
-                    # Inserting into HasArea table to associate the journal with the area.
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO HasArea (journal_id, area_id)
-                        VALUES (?, ?)
-                    ''', (current_journal_id, area_id_to_use)) # `INSERT OR IGNORE` avoids duplicates if the association already exists.
+                    # The association of the journal with the area is written after the loop (see below).
+                    if area_id_to_use not in journal_areas:
+                        journal_areas.append(area_id_to_use)
                         
+            # Writing the HasCategory and HasArea associations as a delta from the ones already in the database:
+            # the new ones are inserted, and in upsert mode the ones that are not in the file anymore are deleted.
+            self.applyAssociations(cursor, "HasCategory", "category_id", file_categories, report["HasCategory"])
+            self.applyAssociations(cursor, "HasArea", "area_id", file_areas, report["HasArea"])
+
+            if self.upsert:
+                # Garbage collection of the categories and areas that no journal uses anymore
+                cursor.execute("DELETE FROM Category WHERE category_id NOT IN (SELECT category_id FROM HasCategory)")
+                report["Category"]["deleted"] = cursor.rowcount
+                cursor.execute("DELETE FROM Area WHERE area_id NOT IN (SELECT area_id FROM HasArea)")
+                report["Area"]["deleted"] = cursor.rowcount
+
+            # Refreshing the summary of the touched journals (and of the journals of older uploads that do not have one yet).
+            cursor.execute("SELECT internal_id FROM Journal WHERE internal_id NOT IN (SELECT journal_id FROM JournalSummary)")
+            touched_journal_ids.update(row[0] for row in cursor.fetchall())
+            self.refreshJournalSummary(cursor, touched_journal_ids)
+
+            # Rebuilding the category <-> area relation.
+            cursor.execute("DELETE FROM CategoryArea")
+            cursor.execute("INSERT INTO CategoryArea (category, area) " + self.CATEGORY_AREA_QUERY)
+
+            # The version of the dataset (PRAGMA user_version) is increased at every upload, so that the
+            # query side can know when its cached data is out of date (see CategoryQueryHandler.getDatasetVersion).
+            cursor.execute("PRAGMA user_version")
+            cursor.execute(f"PRAGMA user_version = {int(cursor.fetchone()[0]) + 1}")
+
             # Committing changes to the database.
             conn.commit()
+            self.lastLoadReport = report
             return True
             #print(f"Data successfully loaded from {path} into database {db_path}.")
 
@@ -332,6 +476,56 @@ class CategoryUploadHandler(UploadHandler):
             conn.close()
 
 
+    def applyAssociations(self, cursor, table, column, file_associations, report):
+        """
+        Writes the associations of the journals read from the file (journal_id -> list of ids) in the
+        HasCategory or HasArea table, as a set difference with the ones already stored: only the
+        missing rows are inserted and, in upsert mode, only the rows that are not in the file anymore
+        are deleted. The counts are added to report ("inserted", "deleted", "unchanged").
+        """
+        to_insert = []
+        to_delete = []
+        for journal_id, ids in file_associations.items():
+            cursor.execute(f"SELECT {column} FROM {table} WHERE journal_id = ?", (journal_id,))
+            existing = {row[0] for row in cursor.fetchall()}
+
+            to_insert.extend((journal_id, id) for id in ids if id not in existing)
+            report["unchanged"] += len(existing.intersection(ids))
+            if self.upsert:
+                to_delete.extend((journal_id, id) for id in existing.difference(ids))
+
+        cursor.executemany(f"DELETE FROM {table} WHERE journal_id = ? AND {column} = ?", to_delete)
+        cursor.executemany(f"INSERT INTO {table} (journal_id, {column}) VALUES (?, ?)", to_insert)
+        report["inserted"] += len(to_insert)
+        report["deleted"] += len(to_delete)
+
+
+    def refreshJournalSummary(self, cursor, journal_ids):
+        """
+        Recomputes the JournalSummary rows of the given journals from the Journal, JournalIdentifier,
+        HasCategory/Category and HasArea/Area tables. Categories and quartiles are aggregated by the
+        same subquery order, so that the two lists stay aligned.
+        """
+        cursor.execute('''
+            INSERT OR REPLACE INTO JournalSummary (journal_id, identifier, category, quartile, area)
+            SELECT
+                J.internal_id,
+                (SELECT IFNULL(GROUP_CONCAT(identifier, '; '), '') FROM
+                    (SELECT identifier FROM JournalIdentifier WHERE journal_id = J.internal_id ORDER BY rowid)),
+                (SELECT json_group_array(category) FROM
+                    (SELECT C.category FROM HasCategory HC JOIN Category C ON HC.category_id = C.category_id
+                     WHERE HC.journal_id = J.internal_id ORDER BY HC.rowid)),
+                (SELECT json_group_array(quartile) FROM
+                    (SELECT C.quartile FROM HasCategory HC JOIN Category C ON HC.category_id = C.category_id
+                     WHERE HC.journal_id = J.internal_id ORDER BY HC.rowid)),
+                (SELECT json_group_array(area) FROM
+                    (SELECT A.area FROM HasArea HA JOIN Area A ON HA.area_id = A.area_id
+                     WHERE HA.journal_id = J.internal_id ORDER BY HA.rowid))
+            FROM Journal J
+            WHERE J.internal_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(journal_ids)),))
+
+
 
 # ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
@@ -341,17 +535,441 @@ class CategoryUploadHandler(UploadHandler):
 
 
 import pandas as pd
+import hashlib
+import math
+import time
+import re
+import threading
+
+
+class BloomFilter:
+    """
+    Compact summary of a set of strings: mayContain answers False only for the strings that
+    are surely not in the set, and True for the ones that are in it (plus a few false positives,
+    about errorRate of the others). It uses about 10 bits for each string with errorRate 0.01.
+    """
+    def __init__(self, values, errorRate=0.01):
+        values = list(values)
+        count = max(len(values), 1)
+        self.size = max(int(-count * math.log(errorRate) / (math.log(2) ** 2)), 8) # number of bits
+        self.hashCount = max(int(round(self.size / count * math.log(2))), 1)
+        self.bits = bytearray(self.size // 8 + 1)
+        for value in values:
+            for position in self.positions(value):
+                self.bits[position >> 3] |= 1 << (position & 7)
+
+    def positions(self, value):
+        # double hashing: the k positions are h1 + i*h2, from one 128-bit digest
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashCount)]
+
+    def mayContain(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+
+class SingleFlight:
+    """
+    Coalesces identical calls made at the same time by different threads: the first caller of a
+    key runs the function, the callers that arrive while it is running wait for it and get the same
+    result (a copy, for a DataFrame) or the same error, instead of running it again.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {} # key -> running call: {"done": Event, "result": ..., "error": ...}
+        self.shared = 0 # number of calls answered with the result of another one
+
+    def do(self, key, function):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None: # first caller: it runs the function
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            result = call["result"]
+            return result.copy() if isinstance(result, pd.DataFrame) else result
+
+        try:
+            call["result"] = function()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key] # the calls that arrive from now on run the function again
+            call["done"].set()
+
+
+class IdentityIndex:
+    """
+    Identity resolution of the journals across the stores. Every identifier is first put in its
+    canonical form (see canonicalIssn), then the identifiers of the same journal (e.g. its print
+    ISSN and its online EISSN) are linked with a union-find structure, so that all the identifiers
+    of a journal, in any store, have the same key (the smallest canonical identifier of the group).
+    """
+    ISSN_PATTERN = re.compile(r"^([0-9]{4})([0-9]{3}[0-9X])$")
+
+    def __init__(self, groups=()):
+        self.parent = {} # canonical identifier -> parent in the union-find forest (itself for a root)
+        self.members = {} # root -> all the canonical identifiers of its group
+        for identifiers in groups:
+            self.addJournal(identifiers)
+
+    @staticmethod
+    def canonicalIssn(identifier):
+        """
+        Returns the canonical form of an identifier: an ISSN with a valid check digit is written as
+        "NNNN-NNNC" (hyphen added if missing, spaces removed, "x" check digit in upper case); any
+        other value (e.g. an ISSN with a wrong check digit) is only stripped and put in upper case,
+        so that it is never confused with a valid ISSN.
+        """
+        value = str(identifier).strip().upper()
+        match = IdentityIndex.ISSN_PATTERN.match(value.replace("-", "").replace(" ", ""))
+        if not match:
+            return value
+        digits = match.group(1) + match.group(2)
+        # check digit: weighted sum of the first 7 digits (weights 8..2), modulo 11; 10 is written X
+        remainder = (11 - sum(int(digit) * weight for digit, weight in zip(digits[:7], range(8, 1, -1))) % 11) % 11
+        if digits[7] != ("X" if remainder == 10 else str(remainder)):
+            return value
+        return f"{match.group(1)}-{match.group(2)}"
+
+    def find(self, identifier):
+        # root of the group of an identifier already in canonical form (path halving); None if unknown
+        if identifier not in self.parent:
+            return None
+        while self.parent[identifier] != identifier:
+            self.parent[identifier] = self.parent[self.parent[identifier]]
+            identifier = self.parent[identifier]
+        return identifier
+
+    def union(self, first, second):
+        # the root of the merged group is the smaller identifier, so the key does not depend on the order of the uploads
+        first_root, second_root = self.find(first), self.find(second)
+        if first_root != second_root:
+            first_root, second_root = sorted((first_root, second_root))
+            self.parent[second_root] = first_root
+            self.members[first_root].extend(self.members.pop(second_root))
+
+    def addJournal(self, identifiers):
+        """
+        Adds the identifiers of one journal (a list, or a string separated by ';'), linking them together.
+        """
+        if isinstance(identifiers, str):
+            identifiers = identifiers.split(";")
+        canonical = [self.canonicalIssn(identifier) for identifier in identifiers if str(identifier).strip()]
+        for identifier in canonical:
+            if identifier not in self.parent:
+                self.parent[identifier] = identifier
+                self.members[identifier] = [identifier]
+        for identifier in canonical[1:]:
+            self.union(canonical[0], identifier)
+
+    def getKey(self, identifier):
+        """
+        Returns the canonical key of the journal of an identifier: the same for all the identifiers
+        linked to it, in any store; an unknown identifier is its own key.
+        """
+        canonical = self.canonicalIssn(identifier)
+        return self.find(canonical) or canonical
+
+    def getIdentifiers(self, key):
+        # all the canonical identifiers linked to a key (the key alone if it is unknown)
+        return self.members.get(key, [key])
+
+    def getGroups(self) -> dict:
+        # key -> all the canonical identifiers of the journal
+        return dict(self.members)
 
 
 class QueryHandler(Handler):
     def __init__(self):
         super().__init__()
+        self.identifierFilter = None # BloomFilter of the identifiers of the database, see getIdentifierFilter
+        self.identifierFilterVersion = None # dataset version the filter was built from
+        self.identifierFilterChecked = 0.0 # time of the last check of the dataset version
+        self.identifierFilterInterval = 0.0 # seconds between two checks of the dataset version (see setIdentifierFilterInterval)
+        self.singleFlight = SingleFlight() # identical queries running at the same time are run once
+
+    def setDbPathOrUrl(self, pathOrUrl):
+        self.identifierFilter = None # the filter refers to the previous database
+        return super().setDbPathOrUrl(pathOrUrl)
        
     def getById(self, id):
         pass
 
+    def getIdentifierGroups(self):
+        # the identifiers of each journal of the database, one list for each journal (implemented by the subclasses)
+        return []
+
+    def getAllIdentifiers(self):
+        # the single identifiers of all the journals of the database
+        return [identifier for identifiers in self.getIdentifierGroups() for identifier in identifiers]
+
+    def getDatasetVersion(self):
+        return 0
+
+    def setIdentifierFilterInterval(self, seconds):
+        """
+        Sets how often (in seconds) getIdentifierFilter checks if the dataset has a new version:
+        0 means at every call; a longer interval saves the check, but the identifiers uploaded in
+        the meantime are not seen by the filter until the next check.
+        """
+        self.identifierFilterInterval = seconds
+        return True
+
+    def getIdentifierFilter(self):
+        """
+        Returns a BloomFilter of all the identifiers of the database (in canonical form, see
+        IdentityIndex.canonicalIssn), so that the engine can skip this handler for the identifiers
+        it surely does not have. It is built again when the dataset version changes (see getDatasetVersion).
+        """
+        now = time.monotonic()
+        if self.identifierFilter is None or now - self.identifierFilterChecked >= self.identifierFilterInterval:
+            version = self.getDatasetVersion()
+            if self.identifierFilter is None or version != self.identifierFilterVersion:
+                self.identifierFilter = BloomFilter({IdentityIndex.canonicalIssn(identifier) for identifier in self.getAllIdentifiers()})
+                self.identifierFilterVersion = version
+            self.identifierFilterChecked = now
+        return self.identifierFilter
+
+    def getCanonicalGroupsOf(self, identifiers):
+        """
+        Returns the canonical identifiers (see IdentityIndex.canonicalIssn) of each journal of the
+        database that has at least one of the given identifiers, one list for each journal: the engine
+        links them across the stores with an IdentityIndex (see BasicQueryEngine.getLinkedIdentities).
+        This version reads the identifiers of all the journals; the subclasses look up only the given ones.
+        """
+        wanted = {IdentityIndex.canonicalIssn(identifier) for identifier in identifiers}
+        groups = ([IdentityIndex.canonicalIssn(identifier) for identifier in group] for group in self.getIdentifierGroups())
+        return [group for group in groups if wanted.intersection(group)]
+
+    def mayContainIdentifier(self, identifier):
+        # False if the database surely does not have the identifier
+        return self.getIdentifierFilter().mayContain(IdentityIndex.canonicalIssn(identifier))
+
 
 class CategoryQueryHandler(QueryHandler):
+    # value column, tables and journal column of each attribute counted by getJournalCounts/getJournalValues
+    GROUP_COLUMNS = {
+        "area": ("A.area", "HasArea HA JOIN Area A ON HA.area_id = A.area_id", "HA.journal_id"),
+        "category": ("C.category", "HasCategory HC JOIN Category C ON HC.category_id = C.category_id", "HC.journal_id"),
+        "quartile": ("C.quartile", "HasCategory HC JOIN Category C ON HC.category_id = C.category_id", "HC.journal_id"),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.adjacency = None # category <-> area maps, built by getCategoryAreaAdjacency the first time they are needed
+        self.adjacencyVersion = None # dataset version the maps were built from
+
+        # read-only configuration (see setReadOnly)
+        self.readOnly = False
+        self.immutable = False
+        self.inMemory = False
+        self.mmapSize = 0
+        self.cacheSize = 0
+        self.memoryUri = None # URI of the shared in-memory copy of the database, when inMemory is True
+        self.memoryConnection = None # keeps the in-memory copy alive
+        self.memoryLock = threading.Lock() # only one thread loads (or closes) the in-memory copy
+        self.busyTimeout = 5.0 # seconds a query waits when the database is locked (see setBusyTimeout)
+
+    def setDbPathOrUrl(self, pathOrUrl):
+        self.adjacency = None # the maps refer to the previous database
+        self.closeInMemoryCopy()
+        return super().setDbPathOrUrl(pathOrUrl)
+
+    def setReadOnly(self, readOnly=True, immutable=False, inMemory=False, mmapSize=268435456, cacheSize=65536):
+        """
+        Configures the handler for query nodes that never write to the database.
+
+        Args:
+            readOnly (bool): Open the database file with mode=ro (False = default read/write mode)
+            immutable (bool): Also declare the file immutable (no locking and no change detection:
+                              only for a file that nobody writes while the handler is in use)
+            inMemory (bool): Copy the whole database, at the first query, into a shared in-memory
+                             database (SQLite backup API) that all the queries and threads read.
+                             The copy uses SQLite shared-cache mode (cache=shared): all the connections
+                             share one page cache and its lock, so concurrent readers are serialized.
+                             It saves the disk reads, not CPU time: with many threads a read-only
+                             file with mmapSize can be faster
+            mmapSize (int): Bytes of the file read with memory-mapped I/O
+            cacheSize (int): KiB of page cache of each connection
+        """
+        self.closeInMemoryCopy()
+        self.readOnly = readOnly
+        self.immutable = readOnly and immutable
+        self.inMemory = readOnly and inMemory
+        self.mmapSize = mmapSize if readOnly else 0
+        self.cacheSize = cacheSize if readOnly else 0
+        return True
+
+    def isReadOnly(self):
+        return self.readOnly
+
+    def setBusyTimeout(self, seconds):
+        # With an upload in WAL mode the queries are not blocked, except for short moments (e.g. a checkpoint)
+        self.busyTimeout = seconds
+        return True
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens a connection to the category database, according to the read-only configuration
+        (see setReadOnly). Every method of the handler opens its own connection with this method.
+        """
+        if not self.readOnly:
+            return sqlite3.connect(self.getDbPathOrUrl(), timeout=self.busyTimeout)
+
+        if self.inMemory:
+            # the check and the load are done by one thread at a time: the other threads wait for the
+            # copy instead of loading it again, or connecting to it while it is still empty
+            with self.memoryLock:
+                if self.memoryConnection is None:
+                    self.loadInMemoryCopy()
+                memory_uri = self.memoryUri
+            conn = sqlite3.connect(memory_uri, uri=True, timeout=self.busyTimeout)
+            conn.execute("PRAGMA query_only = ON")
+            return conn
+
+        conn = sqlite3.connect(self.getFileUri(), uri=True, timeout=self.busyTimeout)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmapSize)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cacheSize)}") # negative = KiB instead of pages
+        return conn
+
+    def getFileUri(self) -> str:
+        # URI of the database file in read-only mode, e.g. file:/data/relational.db?mode=ro&immutable=1
+        uri = "file:" + pathname2url(os.path.abspath(self.getDbPathOrUrl())) + "?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        return uri
+
+    def loadInMemoryCopy(self):
+        """
+        Copies the database file into a shared in-memory database with the SQLite backup API.
+        The copy lives as long as self.memoryConnection is open. Called by connect with memoryLock held.
+        """
+        self.memoryUri = f"file:flamess-categories-{id(self)}?mode=memory&cache=shared"
+        memory = sqlite3.connect(self.memoryUri, uri=True, check_same_thread=False)
+        try:
+            source = sqlite3.connect(self.getFileUri(), uri=True)
+            try:
+                source.backup(memory)
+            finally:
+                source.close()
+        except sqlite3.Error:
+            memory.close()
+            raise
+        self.memoryConnection = memory
+
+    def closeInMemoryCopy(self):
+        with self.memoryLock:
+            if self.memoryConnection is not None:
+                self.memoryConnection.close()
+            self.memoryConnection = None
+            self.memoryUri = None
+
+    def getDatasetVersion(self) -> int:
+        """
+        Returns the version of the dataset (PRAGMA user_version), increased by every
+        CategoryUploadHandler.pushDataToDb; 0 for an empty or older database.
+        """
+        conn = None
+        try:
+            conn = self.connect()
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Database error in getDatasetVersion: {e}")
+            return 0
+        finally:
+            if conn:
+                conn.close()
+
+
+    def getIdentifierGroups(self) -> list:
+        """
+        Returns the identifiers (ISSN/EISSN) of each journal of the database, one list for each journal
+        """
+        conn = None
+        try:
+            conn = self.connect()
+            groups = {}
+            for journal_id, identifier in conn.execute("SELECT journal_id, identifier FROM JournalIdentifier ORDER BY rowid"):
+                groups.setdefault(journal_id, []).append(identifier)
+            return list(groups.values())
+        except sqlite3.Error as e:
+            print(f"Database error in getIdentifierGroups: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+
+
+    def getCanonicalGroupsOf(self, identifiers) -> list:
+        """
+        Returns the canonical identifiers of each journal that has at least one of the given identifiers,
+        one list for each journal. They are looked up in the CanonicalIdentifier table, written by
+        CategoryUploadHandler, so only the requested journals are read.
+        """
+        canonical = sorted({IdentityIndex.canonicalIssn(identifier) for identifier in identifiers})
+        if not canonical:
+            return []
+
+        conn = None
+        try:
+            conn = self.connect()
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CanonicalIdentifier'").fetchone():
+                return super().getCanonicalGroupsOf(canonical) # database created before the identity index
+
+            groups = {}
+            for journal_id, identifier in conn.execute("""
+                    SELECT journal_id, canonical FROM CanonicalIdentifier
+                    WHERE journal_id IN (SELECT journal_id FROM CanonicalIdentifier WHERE canonical IN (SELECT value FROM json_each(?)))
+                    ORDER BY rowid
+                """, (json.dumps(canonical),)):
+                groups.setdefault(journal_id, []).append(identifier)
+            return list(groups.values())
+        except sqlite3.Error as e:
+            print(f"Database error in getCanonicalGroupsOf: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+
+
+    def readSqlQuery(self, query, params=(), key=None) -> pd.DataFrame:
+        """
+        Runs a SELECT query on the database and returns its result. The same query with the same
+        parameters running at the same time in another thread is run only once, and its result is
+        shared (see SingleFlight): only that first call connects to the database. The errors are raised.
+
+        Args:
+            query: The SQL query, or a function that receives the connection and returns the query and
+                   its parameters (when the query depends on the tables of the database, see journalFilter)
+            params: The parameters of the SQL query
+            key: With a function, the hashable description of the request (e.g. its arguments)
+        """
+        key = ("readSqlQuery", self.getDbPathOrUrl(), key if callable(query) else (query, tuple(params)))
+
+        def read():
+            conn = self.connect()
+            try:
+                sql, sql_params = query(conn) if callable(query) else (query, params)
+                return pd.read_sql_query(sql, conn, params=list(sql_params))
+            finally:
+                conn.close()
+
+        return self.singleFlight.do(key, read)
+
+
     def getById(self, identifier: str) -> pd.DataFrame:
         """
         Given an identifier (e.g., ISSN), returns a DataFrame containing
@@ -366,82 +984,15 @@ class CategoryQueryHandler(QueryHandler):
         Returns:
             pd.DataFrame: A DataFrame with a single row representing the journal.
         """
-        db_path = self.getDbPathOrUrl()
-        conn = None
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
-            # Find the internal_id of the journal associated with the identifier
-            cursor.execute('''
-                SELECT journal_id FROM JournalIdentifier WHERE identifier = ?
-            ''', (identifier,))
-            row = cursor.fetchone()
-            if not row:
-                return pd.DataFrame() # if no journal is found, return an empty DataFrame
-
-            journal_id = row[0] # we extract the journal_id from the fetched row
-
-            # Retrieve all identifiers for that journal, in insertion order
-            cursor.execute('''
-                SELECT identifier
-                FROM JournalIdentifier
-                WHERE journal_id = ?
-                ORDER BY rowid
-            ''', (journal_id,)) # we get all identifiers for the journal that was found
-            identifiers = [r[0] for r in cursor.fetchall()]
-            identifiers_str = '; '.join(identifiers)
-
-            # Query for category and area
-            query = '''
-            SELECT
-                J.internal_id,
-                C.category,
-                C.quartile,
-                A.area
-            FROM Journal AS J
-            LEFT JOIN HasCategory AS HC ON J.internal_id = HC.journal_id
-            LEFT JOIN Category AS C ON HC.category_id = C.category_id
-            LEFT JOIN HasArea AS HA ON J.internal_id = HA.journal_id
-            LEFT JOIN Area AS A ON HA.area_id = A.area_id
-            WHERE J.internal_id = ?
-            '''  # query to retrieve journal, category and area data
-            df = pd.read_sql_query(query, conn, params=(journal_id,))
-
-            if df.empty:
-                return pd.DataFrame({
-                    'internal_id': [journal_id],
-                    'identifier': [identifiers_str],
-                    'category': [[]],
-                    'quartile': [[]],
-                    'area': [[]]
-                }) #if no category/ area data exists, return a DataFrame with empty lists for those columns
-
-            # Create (category, quartile) pairs to maintain alignment
-            df['category_quartile'] = list(zip(df['category'], df['quartile']))
-
-            # Aggregation
-            aggregated = df.groupby('internal_id').agg({
-                'category_quartile': lambda x: list({(cat, q) for cat, q in x if cat is not None}),
-                'area': lambda x: list(x.dropna().unique())
-            }).reset_index() # we group data by journal ID and aggregate categories/quartiles and areas into unique lists
-
-            # Extract separate lists from category_quartile
-            aggregated['category'] = aggregated['category_quartile'].apply(lambda x: [cat for cat, _ in x]) # separation of categories from the combined tuples
-            aggregated['quartile'] = aggregated['category_quartile'].apply(lambda x: [q for _, q in x]) # separation of quartiles from the combined tuples
-
-            # Insert identifier and remove the temporary column
-            aggregated.insert(1, 'identifier', identifiers_str)
-            aggregated.drop(columns=['category_quartile'], inplace=True) # remove the temporary combined column
-
-            return aggregated
-
-        except sqlite3.Error as e:
-            print(f"Database error in getById: {e}")
+        if not identifier:
             return pd.DataFrame()
-        finally:
-            if conn:
-                conn.close()
+
+        # the journal is read from the precomputed JournalSummary table (one row, lists already aggregated)
+        df = self.getJournalSummaries({identifier})
+        if df.empty:
+            return pd.DataFrame() # if no journal is found, return an empty DataFrame
+
+        return df
 
 
     def getAllCategories(self) -> pd.DataFrame:
@@ -451,20 +1002,14 @@ class CategoryQueryHandler(QueryHandler):
         Returns:
             pd.DataFrame: A DataFrame with a 'category' column.
         """
-        db_path = self.getDbPathOrUrl()
-        conn = None
         try:
-            conn = sqlite3.connect(db_path)
             query = "SELECT DISTINCT category FROM Category"  # query to retrieve all unique category names
-            df = pd.read_sql_query(query, conn)
+            df = self.readSqlQuery(query)
             df = df.rename(columns={df.columns[0]: 'category'})
             return df[['category']]
         except sqlite3.Error as e:
             print(f"Database error in getAllCategories: {e}")
             return pd.DataFrame(columns=['category'])
-        finally:
-            if conn:
-                conn.close()
 
 
     def getAllAreas(self) -> pd.DataFrame:
@@ -474,20 +1019,14 @@ class CategoryQueryHandler(QueryHandler):
         Returns:
             pd.DataFrame: A DataFrame with an 'area' column.
         """
-        db_path = self.getDbPathOrUrl()
-        conn = None
         try:
-            conn = sqlite3.connect(db_path)
             query = "SELECT DISTINCT area FROM Area" # query to get all unique area names
-            df = pd.read_sql_query(query, conn)
+            df = self.readSqlQuery(query)
             df =df.rename(columns={df.columns[0]: 'area'})
             return df[['area']]
         except sqlite3.Error as e:
             print(f"Database error in getAllAreas: {e}")
             return pd.DataFrame(columns=['area'])
-        finally:
-            if conn:
-                conn.close()
 
 
     def getCategoriesWithQuartile(self, quartiles: set[str]) -> pd.DataFrame:
@@ -501,35 +1040,71 @@ class CategoryQueryHandler(QueryHandler):
         Returns:
             pd.DataFrame: A DataFrame with 'category' and 'quartile' columns.
         """
-        db_path = self.getDbPathOrUrl()
-        conn = None
         try:
-            conn = sqlite3.connect(db_path)
-
             base_query = "SELECT DISTINCT category, quartile FROM Category"  # query to select categories and quartiles
 
             if not quartiles:
-                df = pd.read_sql_query(base_query, conn)
+                df = self.readSqlQuery(base_query)
             else:
                 placeholders = ','.join('?' * len(quartiles)) # we create placeholders for the SQL IN clause
                 query = f"{base_query} WHERE quartile IN ({placeholders})" # we add a WHERE to filter by specified quartiles
-                df = pd.read_sql_query(query, conn, params=list(quartiles))
+                df = self.readSqlQuery(query, list(quartiles))
 
             df = df.drop_duplicates(subset=['category', 'quartile'])
             return df
         except sqlite3.Error as e:
             print(f"Database error in getCategoriesWithQuartile: {e}")
             return pd.DataFrame(columns=['category', 'quartile'])
+
+
+    def getCategoryAreaAdjacency(self) -> dict:
+        """
+        Returns the category <-> area relation as two dicts: {"categories": category -> set of
+        areas, "areas": area -> set of categories}. Two names are related when at least one journal
+        has both; every category and area assigned to some journal is a key (possibly with an
+        empty set). The maps are read once from the CategoryArea table written by the upload, and
+        read again only when the dataset version changes.
+        """
+        version = self.getDatasetVersion()
+        if self.adjacency is not None and self.adjacencyVersion == version:
+            return self.adjacency
+
+        conn = None
+        try:
+            conn = self.connect()
+            try:
+                rows = conn.execute("SELECT category, area FROM CategoryArea").fetchall()
+            except sqlite3.OperationalError: # database of an older upload, without the table
+                rows = conn.execute(CategoryUploadHandler.CATEGORY_AREA_QUERY).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error in getCategoryAreaAdjacency: {e}")
+            return {"categories": {}, "areas": {}}
         finally:
             if conn:
                 conn.close()
 
+        categories = {}
+        areas = {}
+        for category, area in rows:
+            if category is not None:
+                categories.setdefault(category, set())
+            if area is not None:
+                areas.setdefault(area, set())
+            if category is not None and area is not None:
+                categories[category].add(area)
+                areas[area].add(category)
+
+        self.adjacency = {"categories": categories, "areas": areas}
+        self.adjacencyVersion = version
+        return self.adjacency
+
 
     def getCategoriesAssignedToAreas(self, area_names: set[str]) -> pd.DataFrame:
         """
         Returns a DataFrame containing all categories assigned to particular areas
         specified by their names as input, with no repetitions. In case the input
         collection of area names is empty, it is like all areas are actually specified.
+        The answer is looked up in the category <-> area maps (see getCategoryAreaAdjacency).
 
         Args:
             area_names (set[str]): A collection of unique area names (e.g., 'Medicine',
@@ -541,64 +1116,17 @@ class CategoryQueryHandler(QueryHandler):
             pd.DataFrame: A DataFrame with a single column:
                           - 'category' (str): The name of the category.
         """
-        conn = None
-        try:
-            conn = sqlite3.connect(self.getDbPathOrUrl())
-            params = [] # Initialize parameters list
-
-            # Determine the area IDs based on the provided area names
-            if not area_names:
-                # If no area names are provided, we query for all distinct categories.
-                query = """
-                    SELECT DISTINCT C.category AS category
-                    FROM Category C
-                """
-
-                # Revised query for 'all areas specified' (i.e., all categories assigned to any journal)
-                query = """
-                    SELECT DISTINCT C.category AS category
-                    FROM HasCategory HC
-                    JOIN Category C ON HC.category_id = C.category_id
-
-                """ # query to get all distinct categories assigned to any journal 
-                params = []
-            else:
-                # Retrieve the actual area_ids from the Area table using the provided area_names
-                area_name_placeholders = ','.join(['?'] * len(area_names))
-                area_id_lookup_query = f"SELECT area_id FROM Area WHERE area IN ({area_name_placeholders})"  # query to get area IDs
-
-                cursor = conn.cursor()
-                cursor.execute(area_id_lookup_query, list(area_names))
-                fetched_area_ids = {row[0] for row in cursor.fetchall()}  # we store fetched area IDs in a set
-                cursor.close()
-
-                if not fetched_area_ids:
-                    return pd.DataFrame(columns=['category']) # if no valid area IDs are found, return with just 'category' column
-
-                # Construct the main query using the fetched area_ids
-                # We select DISTINCT category names from journals linked to these areas
-                main_query_placeholders = ','.join(['?'] * len(fetched_area_ids))
-                query = f"""
-                    SELECT DISTINCT C.category AS category
-                    FROM HasArea HA
-                    JOIN HasCategory HC ON HA.journal_id = HC.journal_id
-                    JOIN Category C ON HC.category_id = C.category_id
-                    WHERE HA.area_id IN ({main_query_placeholders})
-                """
-                params = list(fetched_area_ids)
-
-            # Execute the determined query
-            df = pd.read_sql_query(query, conn, params=params)
+        adjacency = self.getCategoryAreaAdjacency()
 
-            # The result is a DataFrame with distinct categories
-            return df
+        if not area_names:
+            # all the categories assigned to any journal
+            categories = set(adjacency["categories"])
+        else:
+            categories = set()
+            for area in area_names:
+                categories.update(adjacency["areas"].get(area, set()))
 
-        except sqlite3.Error as e:
-            print(f"Database error in getCategoriesAssignedToAreas: {e}")
-            return pd.DataFrame(columns=['category']) # Ensure correct column in case of error
-        finally:
-            if conn:
-                conn.close()
+        return pd.DataFrame({'category': sorted(categories)}, columns=['category'])
 
     def getAreasAssignedToCategories(self, category_names: set[str]) -> pd.DataFrame:
         """
@@ -606,6 +1134,7 @@ class CategoryQueryHandler(QueryHandler):
         to the particular categories specified by their names as input, with no repetitions.
         If the input collection of category names is empty, it's like all categories
         are actually specified (i.e., all areas from all journals in the database are returned).
+        The answer is looked up in the category <-> area maps (see getCategoryAreaAdjacency).
 
         Args:
             category_names (set[str]): A collection of unique category names (e.g., 'Medicine',
@@ -617,57 +1146,17 @@ class CategoryQueryHandler(QueryHandler):
             pd.DataFrame: A DataFrame with a single column:
                           - 'area' (str): The name of the area.
         """
-        conn = None
-        try:
-            conn = sqlite3.connect(self.getDbPathOrUrl())
-            params = [] # Initialize parameters list
-
-
-            if not category_names:
-                # If no category names are provided, query for all distinct areas linked to any journal
-                query = """
-                    SELECT DISTINCT A.area AS area
-                    FROM HasArea HA
-                    JOIN Area A ON HA.area_id = A.area_id
-                """
-                params = []
-            else:
-                # Get the actual category_ids from the Category table using the provided category_names
-                category_name_placeholders = ','.join(['?'] * len(category_names))
-                category_id_lookup_query = f"SELECT category_id FROM Category WHERE category IN ({category_name_placeholders})"  # query to get category IDs
-
-                cursor = conn.cursor()
-                cursor.execute(category_id_lookup_query, list(category_names))
-                fetched_category_ids = {row[0] for row in cursor.fetchall()}
-                cursor.close()
-
-                if not fetched_category_ids:
-                    return pd.DataFrame(columns=['area']) # Return with just 'area' column if no valid category IDs are found
-
-                # Construct the main query using the fetched category_ids
-                # Select DISTINCT area names from journals linked to these categories
-                main_query_placeholders = ','.join(['?'] * len(fetched_category_ids))
-                query = f"""
-                    SELECT DISTINCT A.area AS area
-                    FROM HasCategory HC
-                    JOIN HasArea HA ON HC.journal_id = HA.journal_id
-                    JOIN Area A ON HA.area_id = A.area_id
-                    WHERE HC.category_id IN ({main_query_placeholders})
-                """
-                params = list(fetched_category_ids)
-
-            # Execute the determined query
-            df = pd.read_sql_query(query, conn, params=params)
+        adjacency = self.getCategoryAreaAdjacency()
 
-            # The result is a DataFrame with distinct areas
-            return df
+        if not category_names:
+            # all the areas assigned to any journal
+            areas = set(adjacency["areas"])
+        else:
+            areas = set()
+            for category in category_names:
+                areas.update(adjacency["categories"].get(category, set()))
 
-        except sqlite3.Error as e:
-            print(f"Database error in getAreasAssignedToCategories: {e}")
-            return pd.DataFrame(columns=['area']) # Ensure correct column in case of error
-        finally:
-            if conn:
-                conn.close()
+        return pd.DataFrame({'area': sorted(areas)}, columns=['area'])
 
 
                 
@@ -682,11 +1171,7 @@ class CategoryQueryHandler(QueryHandler):
         Returns:
             pd.DataFrame: DataFrame with 'identifier' column containing combined ISSN/EISSN strings
         """
-        db_path = self.getDbPathOrUrl()
-        conn = None
         try:
-            conn = sqlite3.connect(db_path)
-            
             if not area_names:
                 # If no areas specified, get all journal identifiers
                 query = """
@@ -694,7 +1179,7 @@ class CategoryQueryHandler(QueryHandler):
                     FROM JournalIdentifier JI
                     GROUP BY JI.journal_id
                 """  # query to concatenate all identifiers for each journal
-                df = pd.read_sql_query(query, conn)
+                df = self.readSqlQuery(query)
 
             else:
                 # Get journals associated with the specified areas
@@ -707,40 +1192,314 @@ class CategoryQueryHandler(QueryHandler):
                     WHERE A.area IN ({placeholders})
                     GROUP BY JI.journal_id
                 """
-                df = pd.read_sql_query(query, conn, params=list(area_names))
+                df = self.readSqlQuery(query, list(area_names))
                 
             return df
             
         except sqlite3.Error as e:
             print(f"Database error in getJournalsByArea: {e}")
             return pd.DataFrame()
-        finally:
-            if conn:
-                conn.close()            
-    
 
-# ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
+    def identifierLookup(self, conn, identifiers):
+        """
+        Returns the SQL subquery (and its parameter) selecting the journal_id of the journals with at
+        least one of the identifiers. The identity index (CanonicalIdentifier table) is used when the
+        database has it, so that the identifiers are found in any form (see IdentityIndex.canonicalIssn).
 
-# SILVIA
+        Returns:
+            tuple: (subquery string, JSON parameter)
+        """
+        has_canonical = conn is not None and conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CanonicalIdentifier'").fetchone()
+        if has_canonical:
+            canonical = sorted({IdentityIndex.canonicalIssn(identifier) for identifier in identifiers})
+            return "SELECT journal_id FROM CanonicalIdentifier WHERE canonical IN (SELECT value FROM json_each(?))", json.dumps(canonical)
+        return "SELECT journal_id FROM JournalIdentifier WHERE identifier IN (SELECT value FROM json_each(?))", json.dumps(list(identifiers))
 
-# From csv file to Graph db
 
+    def journalFilter(self, area_names: set[str], category_names: set[str], quartiles: set[str], identifiers: set[str] = None, conn=None, requireCategory=False):
+        """
+        Builds the SQL subquery selecting the internal_id of the journals that satisfy the area,
+        category/quartile and identifier conditions (see getJournalsInAreasAndCategoriesWithQuartile).
+        The connection, if given, is used to choose how the identifiers are looked up (see identifierLookup).
+        With requireCategory the journal must have at least one category, even without category/quartile conditions.
 
-from rdflib import Graph, URIRef, Literal, RDF
-from rdflib.plugins.stores.sparqlstore import SPARQLUpdateStore
-from pandas import read_csv
+        Returns:
+            tuple: (subquery string, list of its parameters)
+        """
+        conditions = [] # one EXISTS condition for each filter that is actually specified
+        params = []
+
+        if area_names:
+            placeholders = ','.join(['?'] * len(area_names))
+            conditions.append(f"""
+                EXISTS (SELECT 1 FROM HasArea HA
+                        JOIN Area A ON HA.area_id = A.area_id
+                        WHERE HA.journal_id = J.internal_id AND A.area IN ({placeholders}))
+            """)
+            params.extend(area_names)
+
+        if category_names or quartiles or requireCategory:
+            # category and quartile must be satisfied by the same (category, quartile) pair
+            category_conditions = []
+            if category_names:
+                category_conditions.append(f"C.category IN ({','.join(['?'] * len(category_names))})")
+                params.extend(category_names)
+            if quartiles:
+                category_conditions.append(f"C.quartile IN ({','.join(['?'] * len(quartiles))})")
+                params.extend(quartiles)
+            conditions.append(f"""
+                EXISTS (SELECT 1 FROM HasCategory HC
+                        JOIN Category C ON HC.category_id = C.category_id
+                        WHERE {' AND '.join(['HC.journal_id = J.internal_id'] + category_conditions)})
+            """)
+
+        if identifiers:
+            # the whole collection is passed as one JSON parameter, so there is no limit on the number of identifiers
+            lookup, lookup_param = self.identifierLookup(conn, identifiers)
+            conditions.append(f"J.internal_id IN ({lookup})")
+            params.append(lookup_param)
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT J.internal_id FROM Journal J {where_clause}", params
+
+
+    def filterKey(self, area_names, category_names, quartiles, identifiers) -> tuple:
+        # hashable description of the conditions of journalFilter, used as the key of readSqlQuery
+        return tuple(None if values is None else frozenset(values) for values in (area_names, category_names, quartiles, identifiers))
+
+
+    def getJournalsInAreasAndCategoriesWithQuartile(self, area_names: set[str], category_names: set[str], quartiles: set[str], identifiers: set[str] = None, requireCategory: bool = False) -> pd.DataFrame:
+        """
+        Returns a DataFrame containing the identifiers (ISSN/EISSN) of the journals that:
+        - belong to at least one of the specified areas
+        - have at least one category in the specified categories with a quartile in the specified quartiles
+        Everything is resolved by a single SQL query. An empty set means that no filter is applied on that field.
 
+        Args:
+            area_names (set[str]): Set of area names to filter by.
+            category_names (set[str]): Set of category names to filter by.
+            quartiles (set[str]): Set of quartiles to filter by.
+            identifiers (set[str]): Optional set of ISSN/EISSN: only the journals with at least one of them are considered.
+            requireCategory (bool): If True, the journals without any category are excluded even when
+                                    category_names and quartiles are empty.
 
-class JournalUploadHandler(UploadHandler):
-    """
-    A handler class for uploading journal metadata to a graph database.
-    
-    Inherits from UploadHandler and implements the specific logic for processing journal data 
+        Returns:
+            pd.DataFrame: DataFrame with 'identifier' column containing combined ISSN/EISSN strings
+        """
+        def build(conn):
+            # the identifier lookup depends on the tables of the database (see identifierLookup)
+            journal_query, params = self.journalFilter(area_names, category_names, quartiles, identifiers, conn, requireCategory)
+            query = f"""
+                SELECT GROUP_CONCAT(JI.identifier, '; ') AS identifier
+                FROM JournalIdentifier JI
+                WHERE JI.journal_id IN ({journal_query})
+                GROUP BY JI.journal_id
+            """  # one row for each matching journal, with all its identifiers concatenated
+            return query, params
+
+        try:
+            key = ("getJournalsInAreasAndCategoriesWithQuartile",) + self.filterKey(area_names, category_names, quartiles, identifiers) + (requireCategory,)
+            df = self.readSqlQuery(build, key=key)
+
+            return df
+
+        except sqlite3.Error as e:
+            print(f"Database error in getJournalsInAreasAndCategoriesWithQuartile: {e}")
+            return pd.DataFrame(columns=['identifier'])
+
+
+
+    def getJournalSummaries(self, identifiers: set[str] = None) -> pd.DataFrame:
+        """
+        Bulk version of getById: returns a DataFrame with one row for each journal of the database
+        (or only for the journals having at least one of the given identifiers), read from the
+        JournalSummary table, with the columns:
+        - internal_id
+        - identifier (all IDs concatenated)
+        - category (list of categories)
+        - quartile (list of quartiles, aligned with the categories)
+        - area (list of areas)
+        The same request running at the same time in another thread is read only once (see SingleFlight).
+
+        Returns:
+            pd.DataFrame: A DataFrame with one row for each journal.
+        """
+        key = ("getJournalSummaries", self.getDbPathOrUrl(), None if identifiers is None else frozenset(identifiers))
+        return self.singleFlight.do(key, lambda: self.readJournalSummaries(identifiers))
+
+
+    def readJournalSummaries(self, identifiers: set[str] = None) -> pd.DataFrame:
+        # reads the summaries of getJournalSummaries from the database
+        columns = ['internal_id', 'identifier', 'category', 'quartile', 'area']
+        conn = None
+        try:
+            conn = self.connect()
+
+            journal_filter = ""
+            params = []
+            if identifiers is not None:
+                lookup, lookup_param = self.identifierLookup(conn, identifiers)
+                journal_filter = f"WHERE journal_id IN ({lookup})"
+                params = [lookup_param]
+
+            has_summary = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'JournalSummary'").fetchone()
+            if has_summary:
+                # materialized by CategoryUploadHandler: one row for each journal, nothing to join or to aggregate
+                summaries = pd.read_sql_query(f"""
+                    SELECT journal_id AS internal_id, identifier, category, quartile, area
+                    FROM JournalSummary {journal_filter}
+                """, conn, params=params)
+                for col in ['category', 'quartile', 'area']:
+                    summaries[col] = [json.loads(value) for value in summaries[col]]
+                return summaries[columns]
+
+            # Databases created before the JournalSummary table: the summaries are computed from the relations
+
+            # Categories and areas are read with two separate queries, so that they are not multiplied by each other
+            ids_df = pd.read_sql_query(f"""
+                SELECT journal_id AS internal_id, GROUP_CONCAT(identifier, '; ') AS identifier
+                FROM (SELECT journal_id, identifier FROM JournalIdentifier {journal_filter} ORDER BY rowid)
+                GROUP BY journal_id
+            """, conn, params=params)
+
+            cat_df = pd.read_sql_query(f"""
+                SELECT HC.journal_id AS internal_id, C.category, C.quartile
+                FROM HasCategory HC JOIN Category C ON HC.category_id = C.category_id
+                {journal_filter.replace('journal_id IN', 'HC.journal_id IN', 1)}
+            """, conn, params=params)
+
+            area_df = pd.read_sql_query(f"""
+                SELECT HA.journal_id AS internal_id, A.area
+                FROM HasArea HA JOIN Area A ON HA.area_id = A.area_id
+                {journal_filter.replace('journal_id IN', 'HA.journal_id IN', 1)}
+            """, conn, params=params)
+
+            categories = cat_df.groupby('internal_id').agg({'category': list, 'quartile': list})
+            areas = area_df.groupby('internal_id').agg({'area': list})
+
+            summaries = ids_df.set_index('internal_id').join(categories).join(areas).reset_index()
+            for col in ['category', 'quartile', 'area']: # journals without categories or areas get empty lists
+                summaries[col] = [value if isinstance(value, list) else [] for value in summaries[col]]
+
+            return summaries[columns]
+
+        except (sqlite3.Error, pd.errors.DatabaseError) as e: # pandas wraps the errors of read_sql_query
+            print(f"Database error in getJournalSummaries: {e}")
+            return pd.DataFrame(columns=columns)
+        finally:
+            if conn:
+                conn.close()
+
+
+
+    def getJournalCounts(self, by: str, area_names: set[str] = None, category_names: set[str] = None, quartiles: set[str] = None, identifiers: set[str] = None) -> pd.DataFrame:
+        """
+        Counts the journals for each area, category or quartile with a GROUP BY, considering only
+        the journals that satisfy the conditions (as in getJournalsInAreasAndCategoriesWithQuartile).
+        A journal is counted once for each of its distinct values.
+
+        Args:
+            by (str): "area", "category" or "quartile"
+            area_names, category_names, quartiles, identifiers: conditions on the journals (None = no condition)
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'by' column and a 'count' column, sorted by count
+        """
+        if by not in self.GROUP_COLUMNS:
+            return pd.DataFrame(columns=[by, 'count'])
+
+        column, tables, journal_column = self.GROUP_COLUMNS[by]
+
+        def build(conn):
+            journal_query, params = self.journalFilter(area_names, category_names, quartiles, identifiers, conn)
+            query = f"""
+                SELECT {column} AS {by}, COUNT(DISTINCT {journal_column}) AS count
+                FROM {tables}
+                WHERE {journal_column} IN ({journal_query})
+                GROUP BY {column}
+                ORDER BY count DESC, {column}
+            """
+            return query, params
+
+        try:
+            return self.readSqlQuery(build, key=("getJournalCounts", by) + self.filterKey(area_names, category_names, quartiles, identifiers))
+
+        except sqlite3.Error as e:
+            print(f"Database error in getJournalCounts: {e}")
+            return pd.DataFrame(columns=[by, 'count'])
+
+
+    def getJournalValues(self, by: str, area_names: set[str] = None, category_names: set[str] = None, quartiles: set[str] = None, identifiers: set[str] = None) -> pd.DataFrame:
+        """
+        Like getJournalCounts, but instead of the counts returns one row for each journal and each
+        of its distinct values, with the identifiers of the journal ("issn; eissn"), so that the
+        engine can count the journals of more databases without counting twice the same journal
+        (see JournalQuery.getCounts).
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'by' column and an 'identifier' column
+        """
+        if by not in self.GROUP_COLUMNS:
+            return pd.DataFrame(columns=[by, 'identifier'])
+
+        column, tables, journal_column = self.GROUP_COLUMNS[by]
+
+        def build(conn):
+            journal_query, params = self.journalFilter(area_names, category_names, quartiles, identifiers, conn)
+            query = f"""
+                SELECT DISTINCT {column} AS {by}, I.identifier
+                FROM {tables}
+                JOIN (SELECT journal_id, GROUP_CONCAT(identifier, '; ') AS identifier
+                      FROM (SELECT journal_id, identifier FROM JournalIdentifier ORDER BY rowid)
+                      GROUP BY journal_id) I ON I.journal_id = {journal_column}
+                WHERE {journal_column} IN ({journal_query})
+            """
+            return query, params
+
+        try:
+            return self.readSqlQuery(build, key=("getJournalValues", by) + self.filterKey(area_names, category_names, quartiles, identifiers))
+
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            print(f"Database error in getJournalValues: {e}")
+            return pd.DataFrame(columns=[by, 'identifier'])
+
+
+# ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+
+# SILVIA
+
+# From csv file to Graph db
+
+
+from rdflib import Graph, URIRef, Literal, RDF
+from rdflib.plugins.stores.sparqlstore import SPARQLUpdateStore
+from pandas import read_csv
+
+
+class JournalUploadHandler(UploadHandler):
+    """
+    A handler class for uploading journal metadata to a graph database.
+    
+    Inherits from UploadHandler and implements the specific logic for processing journal data 
     from CSV files and converting it into RDF triples for storage in a Blazegraph SPARQL endpoint.
     """
+    DATASET = "https://github.com/elenavalente31/data_flamess/dataset"
+    VERSION = "https://github.com/elenavalente31/data_flamess/version"
+    CURRENT_GRAPH = "https://github.com/elenavalente31/data_flamess/currentGraph" # named graph with the current journals
+    BATCH_SIZE = 5000 # triples sent in each update request
+
     def __init__(self):
         super().__init__()
+        self.textIndexPath = "" # optional SQLite file where the full-text index of titles and publishers is written
+
+    def getTextIndexPath(self):
+        return self.textIndexPath
+
+    def setTextIndexPath(self, path):
+        self.textIndexPath = path
+        return True
 
    
     def pushDataToDb(self, path):
@@ -775,11 +1534,15 @@ class JournalUploadHandler(UploadHandler):
         publisher = URIRef("https://schema.org/publisher")
         seal = URIRef("https://www.wikidata.org/wiki/Q73548471")
         license = URIRef("https://schema.org/license")
+        license_token = URIRef("https://github.com/elenavalente31/data_flamess/licenseToken") # one value for each license of the journal
+        canonical_issn = URIRef("https://github.com/elenavalente31/data_flamess/canonicalIssn") # one value for each identifier, see IdentityIndex
         apc = URIRef("https://www.wikidata.org/wiki/Q15291071") 
 
        
         base_url = "https://github.com/elenavalente31/data_flamess"
 
+        text_rows = [] # (identifier, title, publisher) of each journal, for the full-text index
+
         # Iterate over each row 
         for idx, row in file_csv.iterrows():
         
@@ -810,6 +1573,10 @@ class JournalUploadHandler(UploadHandler):
             if identifiers:
                 combined_identifier = "; ".join(identifiers) # from a list of strings to a unique string
                 graph.add((subj, identifier, Literal(combined_identifier.strip())))
+                # each identifier is also stored alone in canonical form, so that it can be looked up by equality
+                for issn in identifiers:
+                    graph.add((subj, canonical_issn, Literal(IdentityIndex.canonicalIssn(issn))))
+                text_rows.append((combined_identifier.strip(), row["Journal title"].strip(), row["Publisher"].strip()))
              
             # Add languages 
             if row["Languages in which the journal accepts manuscripts"]:
@@ -835,6 +1602,11 @@ class JournalUploadHandler(UploadHandler):
             if row["Journal license"]:
                 license_value = row["Journal license"].strip()
                 graph.add((subj, license, Literal(license_value)))
+                # the string (e.g. "CC BY, CC BY-SA") is also split into its licenses, stored in upper case
+                # as separate values, so that the licenses can be searched by equality
+                for token in license_value.split(","):
+                    if token.strip():
+                        graph.add((subj, license_token, Literal(token.strip().upper())))
             
             # Convert APC (Yes/No) to boolean and add to graph
             if row["APC"]:
@@ -847,20 +1619,83 @@ class JournalUploadHandler(UploadHandler):
         store = SPARQLUpdateStore()     # proxy
         endpoint = self.getDbPathOrUrl()
         
-        
+        # The triples are loaded into a new named graph, while the queries keep reading the current one
+        # (see JournalQueryHandler.runQuery); they switch to the new graph only when it is complete.
+        version = time.time_ns()
+        new_graph = Graph(identifier=URIRef(f"{self.DATASET}/graph-{version}"))
+        old_graphs = get(endpoint, f"SELECT ?graph WHERE {{ <{self.DATASET}> <{self.CURRENT_GRAPH}> ?graph . }}", True)
+
         store.open((endpoint, endpoint))
-        for triple in graph.triples((None, None, None)):   # we used triples method from Graph class
-            store.add(triple)
+        quads = [(s, p, o, new_graph) for s, p, o in graph.triples((None, None, None))]   # we used triples method from Graph class
+        for start in range(0, len(quads), self.BATCH_SIZE): # many triples in each request, instead of one request for each triple
+            store.addN(quads[start:start + self.BATCH_SIZE])
+
+        # The pointer to the current graph and the version of the dataset are replaced in a single
+        # update, so the queries see either the old journals or the new ones (see JournalQueryHandler.getDatasetVersion).
+        store.update(f"""
+            DELETE WHERE {{ <{self.DATASET}> <{self.CURRENT_GRAPH}> ?graph }} ;
+            DELETE WHERE {{ <{self.DATASET}> <{self.VERSION}> ?version }} ;
+            INSERT DATA {{
+                <{self.DATASET}> <{self.CURRENT_GRAPH}> <{new_graph.identifier}> .
+                <{self.DATASET}> <{self.VERSION}> "{version}" .
+            }}
+            """)
+
+        # The old graphs are not used anymore
+        for old_graph in old_graphs.get("graph", []):
+            store.update(f"DROP SILENT GRAPH <{old_graph}>")
         store.close()
 
+        if self.getTextIndexPath():
+            return self.pushTextIndex(text_rows, replace=True) # the journals of the dropped graphs are removed from the index too
+
         return True
 
+
+    def pushTextIndex(self, text_rows, replace=False):
+        """
+        Writes titles and publishers to a SQLite FTS5 table (trigram tokenizer), so that the
+        substring and prefix searches of JournalQueryHandler can be answered without scanning
+        the graph database. The journals already in the index are replaced.
+
+        Args:
+            text_rows (list[tuple]): (identifier, title, publisher) of each journal; the identifier
+                                     is the same "issn; eissn" string stored in the graph database.
+            replace (bool): If True, the rows are the whole new content of the index (a new graph has
+                            replaced the old one, see pushDataToDb): all the other journals are deleted.
+        """
+        conn = None
+        try:
+            conn = sqlite3.connect(self.getTextIndexPath())
+            conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS JournalText
+                            USING fts5(identifier UNINDEXED, title, publisher, tokenize='trigram')""")
+
+            if replace:
+                conn.execute("DELETE FROM JournalText") # the journals that are not in the new graph are not searched anymore
+            else:
+                conn.execute("DELETE FROM JournalText WHERE identifier IN (SELECT value FROM json_each(?))",
+                             (json.dumps([row[0] for row in text_rows]),)) # a journal uploaded again replaces its old entry
+            conn.executemany("INSERT INTO JournalText (identifier, title, publisher) VALUES (?, ?, ?)", text_rows)
+            conn.commit()
+            return True
+
+        except sqlite3.Error as e:
+            print(f"Database error during text index creation: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
 # ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 
 # ELENA
 
 from sparql_dataframe import get
+from collections import OrderedDict
+from io import BytesIO
 
 # Definition of the QueryHandler and JournalQueryHandler classes
 
@@ -871,11 +1706,11 @@ class JournalQueryHandler(QueryHandler):
         PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
         PREFIX schema: <https://schema.org/>
         PREFIX wiki: <https://www.wikidata.org/wiki/> 
+        PREFIX flames: <https://github.com/elenavalente31/data_flamess/>
         """
     
-    BASE_QUERY = """
-        SELECT ?journal ?title ?identifier (GROUP_CONCAT(DISTINCT ?lang; SEPARATOR=", ") AS ?languages) ?publisher ?seal ?license ?apc
-        WHERE {{
+    # Graph pattern of the journals, shared by BASE_QUERY and COUNT_QUERY (braces doubled for str.format)
+    JOURNAL_PATTERN = """
             ?journal rdf:type schema:Periodical ;
                     schema:name ?title ;
                     schema:identifier ?identifier ;
@@ -885,14 +1720,407 @@ class JournalQueryHandler(QueryHandler):
                     wiki:Q15291071 ?apc .
 
             OPTIONAL {{ ?journal schema:publisher ?publisher . }}
+        """
 
+    BASE_QUERY = """
+        SELECT ?journal ?title ?identifier (GROUP_CONCAT(DISTINCT ?lang; SEPARATOR=", ") AS ?languages) ?publisher ?seal ?license ?apc
+        WHERE {{""" + JOURNAL_PATTERN + """
             {filter}
         }}
         GROUP BY ?journal ?title ?identifier ?publisher ?seal ?license ?apc
         """
+
+    # Same journals of BASE_QUERY, but counted for each value of {variable}
+    COUNT_QUERY = """
+        SELECT {variable} (COUNT(DISTINCT ?journal) AS ?count)
+        WHERE {{""" + JOURNAL_PATTERN + """
+            {pattern}
+            {filter}
+        }}
+        GROUP BY {variable}
+        """
     
+    # Same journals of BASE_QUERY, one row for each journal and each of its values of {variable}
+    VALUE_QUERY = """
+        SELECT DISTINCT {variable} ?identifier
+        WHERE {{""" + JOURNAL_PATTERN + """
+            {pattern}
+            {filter}
+        }}
+        """
+
     def __init__(self):
         super().__init__()
+        self.textIndexPath = "" # optional full-text index written by JournalUploadHandler.pushTextIndex
+        self.identifierFilterInterval = 30.0 # the dataset version is a remote query: checked at most every 30 seconds
+        self.currentGraph = None # IRI of the current graph ("" = default graph), None until it is read, see getCurrentGraph
+        self.currentVersion = 0 # dataset version read together with the current graph
+        self.currentGraphChecked = 0.0 # time of the last read of the pointer
+        self.currentGraphInterval = 30.0 # seconds between two reads of the pointer (see setCurrentGraphInterval)
+        self.graphPredicates = {} # predicate -> True if the current graph uses it, see hasGraphPredicate
+        self.cacheMemorySize = 0 # results kept in memory (0 = no cache), see setCache
+        self.cacheDiskPath = "" # SQLite file of the results shared by the processes ("" = no file)
+        self.cacheDiskSize = 0 # maximum size of the results in the file, in bytes
+        self.cacheMemory = OrderedDict() # key -> DataFrame, from the least to the most recently used
+        self.cacheLock = threading.Lock()
+
+    def setDbPathOrUrl(self, pathOrUrl):
+        self.graphPredicates = {} # the checks refer to the previous database
+        self.currentGraph = None
+        with self.cacheLock:
+            self.cacheMemory.clear() # the results of the previous database (the file is keyed by database too)
+        return super().setDbPathOrUrl(pathOrUrl)
+
+    def setCache(self, memorySize=256, diskPath="", diskSize=268435456):
+        """
+        Enables the cache of the query results (see runQuery), in two tiers: the most recently used
+        results are kept in memory, and all of them are also written to a SQLite file, that survives
+        a restart and is shared by all the processes that use the same path. The results are
+        keyed by dataset version and query, so a new upload never returns old results.
+
+        Args:
+            memorySize (int): Results kept in memory (least recently used ones evicted); 0 disables the memory tier
+            diskPath (str): SQLite file of the second tier; "" disables it
+            diskSize (int): Maximum total size (bytes) of the results in the file (least recently used ones evicted)
+        """
+        if diskPath:
+            try:
+                import pyarrow # the results are written to the file in Parquet format (data only, see writeCache)
+            except ImportError:
+                print("pyarrow is needed for the file of the query cache: pip install pyarrow")
+                return False
+        self.cacheMemorySize = memorySize
+        self.cacheDiskPath = diskPath
+        self.cacheDiskSize = diskSize
+        with self.cacheLock:
+            while len(self.cacheMemory) > self.cacheMemorySize:
+                self.cacheMemory.popitem(last=False)
+        return True
+
+    def clearCache(self):
+        # removes all the results from both tiers (the file is emptied for all the processes)
+        with self.cacheLock:
+            self.cacheMemory.clear()
+        if self.cacheDiskPath:
+            conn = None
+            try:
+                conn = self.connectCache()
+                conn.execute("DELETE FROM QueryCache")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Database error in clearCache: {e}")
+            finally:
+                if conn:
+                    conn.close()
+        return True
+
+    def getTextIndexPath(self):
+        return self.textIndexPath
+
+    def setTextIndexPath(self, path):
+        self.textIndexPath = path
+        return True
+
+
+
+    def getDatasetVersion(self):
+        """
+        Returns the version of the dataset written by the last JournalUploadHandler.pushDataToDb
+        (an increasing number), or 0 if the data was uploaded without a version.
+        """
+        query = f"""
+            SELECT ?version
+            WHERE {{ <{JournalUploadHandler.DATASET}> <{JournalUploadHandler.VERSION}> ?version . }}
+            """
+        df = get(self.getDbPathOrUrl(), query, True)
+        if df.empty:
+            return 0
+        return int(df["version"].max())
+
+
+    def getIdentifierGroups(self):
+        """
+        Returns the identifiers (ISSN/EISSN) of each journal of the current graph, one list for each journal
+        """
+        query = self.PREFIXES + """
+            SELECT ?identifier
+            WHERE { ?journal schema:identifier ?identifier . }
+            """
+        df = self.runQuery(query)
+        if df.empty:
+            return []
+        return [[identifier.strip() for identifier in value.split(";") if identifier.strip()] for value in df["identifier"].dropna().astype(str).tolist()]
+
+
+    def getCanonicalGroupsOf(self, identifiers, batchSize=1000):
+        """
+        Returns the canonical identifiers of each journal of the current graph that has at least one of
+        the given identifiers, one list for each journal. The journals are looked up with
+        getJournalsWithFilters (the canonical ISSNs written by JournalUploadHandler), batchSize
+        identifiers at a time, so only the requested journals are read.
+        """
+        identifiers = sorted({IdentityIndex.canonicalIssn(identifier) for identifier in identifiers})
+        groups = []
+        for start in range(0, len(identifiers), batchSize):
+            df = self.getJournalsWithFilters(identifiers=set(identifiers[start:start + batchSize]))
+            if df is None or df.empty:
+                continue
+            for value in df["identifier"].dropna().astype(str).drop_duplicates():
+                groups.append([IdentityIndex.canonicalIssn(identifier) for identifier in value.split(";") if identifier.strip()])
+        return groups
+
+
+    def setCurrentGraphInterval(self, seconds):
+        """
+        Sets how often (in seconds) getCurrentGraph reads the pointer to the current graph from the
+        endpoint: 0 means at every query; a longer interval saves a round-trip for each query. The
+        queries always run on the current graph (see inCurrentGraph); a reload is seen by the keys of
+        the cache and by the checks of the predicates at the next read.
+        """
+        self.currentGraphInterval = seconds
+        return True
+
+
+    def getCurrentGraph(self):
+        """
+        Returns the IRI of the named graph that contains the current journals (the pointer written
+        by JournalUploadHandler.pushDataToDb), or "" if the data was uploaded in the default graph.
+        The pointer is kept in memory and read again at most every currentGraphInterval seconds.
+        """
+        if self.currentGraph is None or time.monotonic() - self.currentGraphChecked >= self.currentGraphInterval:
+            self.readCurrentGraph()
+        return self.currentGraph
+
+
+    def readCurrentGraph(self):
+        """
+        Reads from the endpoint, with one query, the pointer to the current graph and the dataset
+        version, and keeps them in memory (see getCurrentGraph).
+
+        Returns:
+            str: The IRI of the current graph, or "" for the default graph
+        """
+        query = f"""
+            SELECT ?graph ?version
+            WHERE {{
+                OPTIONAL {{ <{JournalUploadHandler.DATASET}> <{JournalUploadHandler.CURRENT_GRAPH}> ?graph . }}
+                OPTIONAL {{ <{JournalUploadHandler.DATASET}> <{JournalUploadHandler.VERSION}> ?version . }}
+            }}
+            """
+        df = get(self.getDbPathOrUrl(), query, True)
+
+        graphs = df["graph"].dropna() if "graph" in df.columns else []
+        versions = df["version"].dropna() if "version" in df.columns else []
+        graph = str(graphs.iloc[0]) if len(graphs) else ""
+        version = int(versions.max()) if len(versions) else 0
+        if (graph, version) != (self.currentGraph, self.currentVersion):
+            self.graphPredicates = {} # a reload: the checks of the old graph are not valid anymore
+        self.currentGraph, self.currentVersion = graph, version
+        self.currentGraphChecked = time.monotonic()
+        return self.currentGraph
+
+
+    def runQuery(self, query):
+        """
+        Runs a SELECT query of this handler (see executeQuery). If the same query is already running
+        in another thread (e.g. many requests for the same journal at the same moment), it is not
+        sent again: this call waits for it and gets the same result (see SingleFlight).
+
+        Returns:
+            pd.DataFrame: The result of the query
+        """
+        return self.singleFlight.do((self.getDbPathOrUrl(), query), lambda: self.executeQuery(query))
+
+
+    def executeQuery(self, query):
+        """
+        Runs a SELECT query of this handler on the current graph of the journals (see inCurrentGraph):
+        the pointer to the current graph is matched by the endpoint in the same request, so one round
+        trip is enough even when the pointer kept in memory is out of date (e.g. after a reload, which
+        drops the old graph). The pointer in memory is only used to know if the journals are in a named
+        graph and for the keys of the cache.
+
+        Returns:
+            pd.DataFrame: The result of the query
+        """
+        graph = self.getCurrentGraph()
+
+        caching = self.cacheMemorySize > 0 or self.cacheDiskPath
+        if caching:
+            key = self.cacheKey(graph, query)
+            df = self.readCache(key)
+            if df is not None:
+                return df
+
+        df = get(self.getDbPathOrUrl(), self.inCurrentGraph(query, graph), True)
+
+        if caching:
+            self.writeCache(key, df)
+        return df.copy() if caching else df
+
+
+    def cacheKey(self, graph, query):
+        """
+        Key of a result in the cache: hash of the endpoint, of the dataset version and of the query.
+        The current graph identifies the version (each upload writes a new one, see JournalUploadHandler);
+        for the data uploaded in the default graph the version number read with the pointer is used
+        (see readCurrentGraph), so computing a key never contacts the endpoint.
+        """
+        version = graph or f"version-{self.currentVersion}"
+        return hashlib.sha256(f"{self.getDbPathOrUrl()}\n{version}\n{query}".encode("utf-8")).hexdigest()
+
+
+    def connectCache(self) -> sqlite3.Connection:
+        # connection to the file of the second tier; WAL lets the processes read it while another one writes
+        conn = sqlite3.connect(self.cacheDiskPath, timeout=5.0)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS QueryCache (
+                        key TEXT PRIMARY KEY,
+                        data BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used REAL NOT NULL)""")
+        return conn
+
+
+    def readCache(self, key):
+        """
+        Returns a copy of the cached result of a key, from memory or else from the file (then it is
+        also kept in memory), or None if it is not cached.
+        """
+        with self.cacheLock:
+            if key in self.cacheMemory:
+                self.cacheMemory.move_to_end(key) # most recently used
+                return self.cacheMemory[key].copy()
+
+        if not self.cacheDiskPath:
+            return None
+
+        conn = None
+        try:
+            conn = self.connectCache()
+            row = conn.execute("SELECT data FROM QueryCache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE QueryCache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            df = pd.read_parquet(BytesIO(row[0])) # Parquet: only data is read, the file cannot run code
+        except (sqlite3.Error, ValueError, OSError, EOFError) as e:
+            print(f"Error reading the query cache: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+        self.keepInMemory(key, df)
+        return df.copy()
+
+
+    def writeCache(self, key, df):
+        # stores a result in both tiers; the least recently used results beyond the sizes are evicted
+        self.keepInMemory(key, df)
+
+        if not self.cacheDiskPath:
+            return
+        try:
+            buffer = BytesIO()
+            df.to_parquet(buffer, index=False)
+            data = buffer.getvalue()
+        except (ValueError, TypeError, NotImplementedError) as e: # e.g. a column with values of mixed types
+            print(f"Error writing the query cache: {e}")
+            return
+        if len(data) > self.cacheDiskSize:
+            return # larger than the whole cache
+
+        conn = None
+        try:
+            conn = self.connectCache()
+            conn.execute("INSERT OR REPLACE INTO QueryCache (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                         (key, data, len(data), time.time()))
+            # eviction: the sizes are summed from the most recently used result, and the results
+            # beyond diskSize (the least recently used ones) are deleted
+            conn.execute("""
+                DELETE FROM QueryCache WHERE key IN (
+                    SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total FROM QueryCache)
+                    WHERE total > ?)
+                """, (self.cacheDiskSize,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing the query cache: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+
+    def keepInMemory(self, key, df):
+        if self.cacheMemorySize <= 0:
+            return
+        with self.cacheLock:
+            self.cacheMemory[key] = df
+            self.cacheMemory.move_to_end(key)
+            while len(self.cacheMemory) > self.cacheMemorySize:
+                self.cacheMemory.popitem(last=False) # least recently used
+
+
+    def inCurrentGraph(self, query, graph):
+        """
+        Restricts a query to the current graph of the journals: the group of its first WHERE (any case),
+        or its first group if the WHERE keyword is omitted, is wrapped in GRAPH ?current_graph, and
+        ?current_graph is bound by the pointer written by JournalUploadHandler, matched in the same
+        request. The query is returned as it is if the journals are in the default graph (graph is "")
+        or if it has no group.
+        """
+        if not graph:
+            return query
+        match = re.search(r"\bWHERE\s*\{", query, re.IGNORECASE) or re.search(r"\{", query)
+        if match is None:
+            return query
+
+        # closing brace of the group: the braces inside the string literals (e.g. a searched title) are skipped
+        start = match.end()
+        depth, position = 1, start
+        while position < len(query):
+            char = query[position]
+            if char in "\"'":
+                position += 1
+                while position < len(query) and query[position] != char:
+                    position += 2 if query[position] == "\\" else 1
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            position += 1
+        if depth:
+            return query
+
+        pointer = f"<{JournalUploadHandler.DATASET}> <{JournalUploadHandler.CURRENT_GRAPH}> ?current_graph ."
+        return query[:start] + f"\n            {pointer}\n            GRAPH ?current_graph {{" + query[start:position] + "}\n        " + query[position:]
+
+
+
+    def hasGraphPredicate(self, predicate):
+        """
+        Returns True if at least one journal of the current graph has the predicate (e.g.
+        "flames:canonicalIssn"), False for the data uploaded before it existed. It is checked with
+        one query for each graph: the answers are kept together with the pointer to the current
+        graph, and forgotten when a reload changes it (see readCurrentGraph).
+        """
+        self.getCurrentGraph() # the pointer (and so the answers) are read again if they are out of date
+        predicates = self.graphPredicates
+        if predicate not in predicates:
+            query = self.PREFIXES + f"""
+                SELECT ?journal
+                WHERE {{ ?journal {predicate} ?value . }}
+                LIMIT 1
+                """
+            predicates[predicate] = not self.runQuery(query).empty
+        return predicates[predicate]
+
+
+    def hasCanonicalIssns(self):
+        # True if the journals also have their identifiers in canonical form (flames:canonicalIssn, see JournalUploadHandler)
+        return self.hasGraphPredicate("flames:canonicalIssn")
 
 
 
@@ -901,6 +2129,12 @@ class JournalQueryHandler(QueryHandler):
         if not id:
             return pd.DataFrame() # if there's no value specified as id, or if it's empty, returns an empty DataFrame
 
+        if self.hasCanonicalIssns():
+            # lookup by equality of the canonical form (e.g. "1234567x" finds "1234-567X"), no string function on the stored literals
+            canonical = self.quoteLiteral(IdentityIndex.canonicalIssn(id))
+            query = self.PREFIXES + self.BASE_QUERY.format(filter=f'?journal flames:canonicalIssn {canonical} .')
+            return self.runQuery(query)
+
         filter_id = f"""  
             FILTER(
                 STR(?identifier) = "{id}" ||          # Single ID
@@ -911,8 +2145,7 @@ class JournalQueryHandler(QueryHandler):
         
         query = self.PREFIXES + self.BASE_QUERY.format(filter=filter_id) # final query of the method, that contains prefixes, base query and the specific filter
 
-        endpoint = self.getDbPathOrUrl()
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
 
         return df
 
@@ -923,14 +2156,124 @@ class JournalQueryHandler(QueryHandler):
 
         query= self.PREFIXES + self.BASE_QUERY.format(filter="")
 
-        endpoint = self.getDbPathOrUrl()
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
             
         return df
 
     
     
-    def getJournalsWithTitle(self, partialTitle):
+    def getJournalsPage(self, offset: int, limit: int):
+        """
+        Returns one page of all the journals (the same rows of getAllJournals, in a stable order),
+        so that the whole graph database can be read in batches.
+
+        Args:
+            offset (int): Number of journals to skip
+            limit (int): Maximum number of journals of the page
+
+        Returns:
+            pd.DataFrame: The journals of the page (empty after the last page)
+        """
+        query = self.PREFIXES + self.BASE_QUERY.format(filter="") + f"ORDER BY ?journal LIMIT {int(limit)} OFFSET {int(offset)}"
+
+        df = self.runQuery(query)
+
+        return df
+
+
+
+    def searchTextIndex(self, text, field="title", prefix=False, limit=None):
+        """
+        Searches the full-text index (see setTextIndexPath) for the journals whose title or
+        publisher contains the text, without querying the graph database. The search is case
+        insensitive; the results are ranked with the prefix matches first, then by relevance (bm25).
+
+        Args:
+            text (str): Text to search
+            field (str): "title" or "publisher"
+            prefix (bool): If True, only the values starting with the text are returned
+            limit (int): Maximum number of results (None = all)
+
+        Returns:
+            pd.DataFrame: A DataFrame with 'identifier', 'title' and 'publisher' columns, in ranking order
+        """
+        if not text or field not in ("title", "publisher") or not self.getTextIndexPath():
+            return pd.DataFrame(columns=["identifier", "title", "publisher"])
+
+        like_text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") # LIKE wildcards are searched literally
+        conditions = []
+        params = []
+
+        if len(text) >= 3:
+            # the trigram tokenizer answers substring searches of at least 3 characters from the index
+            conditions.append("JournalText MATCH ?")
+            params.append(f'{field} : "{text.replace(chr(34), chr(34) * 2)}"')
+        else:
+            conditions.append(f"{field} LIKE ? ESCAPE '\\'")
+            params.append(f"%{like_text}%")
+
+        if prefix:
+            conditions.append(f"{field} LIKE ? ESCAPE '\\'")
+            params.append(f"{like_text}%")
+
+        order = f"CASE WHEN {field} LIKE ? ESCAPE '\\' THEN 0 ELSE 1 END, " + ("rank, " if len(text) >= 3 else "") + f"length({field})"
+        params.append(f"{like_text}%")
+
+        query = f"SELECT identifier, title, publisher FROM JournalText WHERE {' AND '.join(conditions)} ORDER BY {order}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        conn = None
+        try:
+            conn = sqlite3.connect(self.getTextIndexPath())
+            return pd.read_sql_query(query, conn, params=params)
+        except sqlite3.Error as e:
+            print(f"Database error in searchTextIndex: {e}")
+            return pd.DataFrame(columns=["identifier", "title", "publisher"])
+        finally:
+            if conn:
+                conn.close()
+
+
+
+    def getJournalsWithIdentifierStrings(self, identifier_strings, batchSize=1000):
+        """
+        Returns a DataFrame containing the journals whose identifier is exactly one of the given
+        strings (e.g. "1234-5678; 8765-4321", as stored in the graph database), in the same order.
+        The strings are sent batchSize at a time, so that a broad search of the text index does not
+        become one query with thousands of values.
+        """
+        identifier_strings = [id for id in dict.fromkeys(identifier_strings) if id]
+        if not identifier_strings:
+            return pd.DataFrame()
+
+        dfs = []
+        for start in range(0, len(identifier_strings), batchSize):
+            values = " ".join(self.quoteLiteral(id) for id in identifier_strings[start:start + batchSize])
+            filter_values = f"VALUES ?identifier {{ {values} }}" # lookup of the exact values, no string function on the stored literals
+
+            query = self.PREFIXES + self.BASE_QUERY.format(filter=filter_values)
+
+            df = self.runQuery(query)
+            if not df.empty:
+                dfs.append(df)
+
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, ignore_index=True)
+
+        order = {id: position for position, id in enumerate(identifier_strings)}
+        return df.sort_values("identifier", key=lambda column: column.map(order), kind="stable").reset_index(drop=True)
+
+
+
+    def getJournalsWithTitle(self, partialTitle, limit=None):
+
+        # if the full-text index is available, the matching journals are found there and only them are asked to the graph database
+        if partialTitle and self.getTextIndexPath():
+            found = self.searchTextIndex(partialTitle, "title", limit=limit)
+            return self.getJournalsWithIdentifierStrings(found["identifier"])
 
         # filter_title is the specific filter for this method. It basically assures that the partialTitle specified will match perfectly and/or partially
         
@@ -938,27 +2281,29 @@ class JournalQueryHandler(QueryHandler):
         
         query= self.PREFIXES + self.BASE_QUERY.format(filter= filter_title)  # the filter gets applied to the final query of the method
 
-        endpoint = self.getDbPathOrUrl()
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
 
         return df
 
     
 
-    def getJournalsPublishedBy(self, partialName):
+    def getJournalsPublishedBy(self, partialName, limit=None):
 
         if not partialName:
             
             return pd.DataFrame() #if there is not a value in input, or if there's an empty value, returns an empty DataFrame
 
+        if self.getTextIndexPath():
+            found = self.searchTextIndex(partialName, "publisher", limit=limit)
+            return self.getJournalsWithIdentifierStrings(found["identifier"])
+
         # filter_publisher is the specific filter for this method. It basically assures that the partialName specified will match perfectly and/or partially
         
         filter_publisher = f'FILTER(CONTAINS(LCASE(?publisher), LCASE("{partialName}")))'
 
         query= self.PREFIXES + self.BASE_QUERY.format(filter=filter_publisher)
 
-        endpoint = self.getDbPathOrUrl()
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
 
         return df
     
@@ -974,35 +2319,76 @@ class JournalQueryHandler(QueryHandler):
         if not licenses:
             return self.getAllJournals()
     
-        # Clean and prepare license strings
+        # Clean and prepare license strings (the licenses are stored one by one, in upper case, by JournalUploadHandler)
         cleaned_licenses = {license.strip().upper() for license in licenses if license.strip()}
+        if not cleaned_licenses:
+            return self.getAllJournals()
+
+        # Equality lookup of the license values, instead of string matching on the whole license string
+        filter_license = self.licenseFilter(cleaned_licenses)
+    
+        query = self.PREFIXES + self.BASE_QUERY.format(filter=filter_license)
     
-        # Build the license filter condition
+        df = self.runQuery(query)
+    
+        return df
+
+
+    def quoteLiteral(self, value):
+        # SPARQL string literal of the value: the backslashes are escaped first, then the double quotes
+        return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+    def licenseFilter(self, licenses):
+        # graph pattern matching the journals that have at least one of the licenses
+        cleaned_licenses = [license.strip().upper() for license in licenses if license.strip()]
+        if self.hasLicenseTokens():
+            values = " ".join(self.quoteLiteral(license) for license in cleaned_licenses)
+            return f"?journal flames:licenseToken ?license_token . VALUES ?license_token {{ {values} }}"
+
+        # graph uploaded before the license values: each license is searched in the license string,
+        # where it can be the whole string, or at the start, in the middle or at the end of the list
         license_conditions = []
         for license in cleaned_licenses:
-            # Each license can match in 4 possible ways in the string:
-            # 1. Exact match
-            # 2. At start of list
-            # 3. In middle of list
-            # 4. At end of list
             conditions = [
-                f'STR(?license) = "{license}"',
-                f'STRSTARTS(STR(?license), "{license}, ")',
-                f'CONTAINS(STR(?license), ", {license}, ")',
-                f'STRENDS(STR(?license), ", {license}")'
+                f'STR(?license) = {self.quoteLiteral(license)}',
+                f'STRSTARTS(STR(?license), {self.quoteLiteral(license + ", ")})',
+                f'CONTAINS(STR(?license), {self.quoteLiteral(", " + license + ", ")})',
+                f'STRENDS(STR(?license), {self.quoteLiteral(", " + license)})'
             ]
             license_conditions.append(f'({" || ".join(conditions)})')
-    
-        # Combine all license conditions with OR
-        filter_license = f'FILTER({" || ".join(license_conditions)})' if license_conditions else ""
-    
-        query = self.PREFIXES + self.BASE_QUERY.format(filter=filter_license)
-    
-        endpoint = self.getDbPathOrUrl()
-        df = get(endpoint, query, True)
-    
+        return f'FILTER({" || ".join(license_conditions)})'
+
+
+    def hasLicenseTokens(self):
+        # True if the journals also have their licenses stored one by one (flames:licenseToken, see JournalUploadHandler)
+        return self.hasGraphPredicate("flames:licenseToken")
+
+
+    def languageFilter(self, languages):
+        # graph pattern matching the journals that accept at least one of the languages: the
+        # schema:inLanguage values are looked up by equality, as separate triples
+        values = " ".join(self.quoteLiteral(language.strip()) for language in languages if language.strip())
+        return f"?journal schema:inLanguage ?filter_lang . VALUES ?filter_lang {{ {values} }}"
+
+
+    def getJournalsWithLanguage(self, languages: set[str]):
+        """
+        Returns a DataFrame containing all journals that accept at least one of the specified languages.
+        If the input set is empty, returns all journals.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing matching journals
+        """
+        if not languages or not {language.strip() for language in languages if language.strip()}:
+            return self.getAllJournals()
+
+        query = self.PREFIXES + self.BASE_QUERY.format(filter=self.languageFilter(languages))
+
+        df = self.runQuery(query)
+
         return df
-    
+
 
     def getJournalsWithAPC(self):
 
@@ -1010,9 +2396,7 @@ class JournalQueryHandler(QueryHandler):
         
         query= self.PREFIXES + self.BASE_QUERY.format(filter= filter_tapc) # applies it to the final query of the method
         
-        endpoint = self.getDbPathOrUrl()
-        
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
 
         return df
         
@@ -1024,9 +2408,7 @@ class JournalQueryHandler(QueryHandler):
        
         query= self.PREFIXES + self.BASE_QUERY.format(filter=filter_fapc)  # applies it to the final query of the method
         
-        endpoint = self.getDbPathOrUrl()
-        
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
 
         return df
     
@@ -1038,10 +2420,175 @@ class JournalQueryHandler(QueryHandler):
         
         query = self.PREFIXES+ self.BASE_QUERY.format(filter=filter_seal) # applies it to the final query of the method
 
-        endpoint = self.getDbPathOrUrl()
-        
-        df = get(endpoint, query, True)
+        df = self.runQuery(query)
+        return df
+
+
+
+    def getDiamondJournals(self):
+
+        # both conditions are checked by the triplestore, so that only the diamond journals (no APC and with the DOAJ Seal) are sent back
+
+        filter_diamond = f'FILTER(LCASE(STR(?apc)) = "false" && LCASE(STR(?seal)) = "true")'
+
+        query = self.PREFIXES + self.BASE_QUERY.format(filter=filter_diamond) # applies it to the final query of the method
+
+        df = self.runQuery(query)
+        return df
+
+
+
+    def getJournalsWithFilters(self, partialTitle=None, partialName=None, licenses=None, languages=None, apc=None, seal=None, identifiers=None):
+        """
+        Returns a DataFrame containing the journals that satisfy all the specified conditions at once.
+        The conditions that are None (or empty) are not applied (see filterClause for the arguments).
+
+        Returns:
+            pd.DataFrame: A DataFrame containing matching journals
+        """
+        filter_all = self.filterClause(partialTitle, partialName, licenses, languages, apc, seal, identifiers)
+
+        query = self.PREFIXES + self.BASE_QUERY.format(filter=filter_all)
+
+        df = self.runQuery(query)
+
+        return df
+
+
+
+    def getJournalCounts(self, by, partialTitle=None, partialName=None, licenses=None, languages=None, apc=None, seal=None, identifiers=None):
+        """
+        Counts the journals for each license, language, APC or DOAJ Seal value with a SPARQL
+        GROUP BY/COUNT, considering only the journals that satisfy the conditions (see filterClause).
+        A journal is counted once for each of its distinct values.
+
+        Args:
+            by (str): "license", "language", "apc" or "seal"
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'by' column and a 'count' column, sorted by count
+        """
+        group = self.groupPattern(by)
+        if group is None:
+            return pd.DataFrame(columns=[by, "count"])
+
+        variable, pattern = group
+        filter_all = self.filterClause(partialTitle, partialName, licenses, languages, apc, seal, identifiers)
+
+        query = self.PREFIXES + self.COUNT_QUERY.format(variable=variable, pattern=pattern, filter=filter_all)
+
+        df = self.runQuery(query)
+
+        if df.empty:
+            return pd.DataFrame(columns=[by, "count"])
+
+        df.columns = [by, "count"]
+        return df.sort_values(["count", by], ascending=[False, True]).reset_index(drop=True)
+
+
+
+    def getJournalValues(self, by, partialTitle=None, partialName=None, licenses=None, languages=None, apc=None, seal=None, identifiers=None):
+        """
+        Like getJournalCounts, but instead of the counts returns one row for each journal and each
+        of its distinct values, with the identifiers of the journal, so that the engine can count
+        the journals of more graph databases without counting twice the same journal (see JournalQuery.getCounts).
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'by' column and an 'identifier' column
+        """
+        group = self.groupPattern(by)
+        if group is None:
+            return pd.DataFrame(columns=[by, "identifier"])
+
+        variable, pattern = group
+        filter_all = self.filterClause(partialTitle, partialName, licenses, languages, apc, seal, identifiers)
+
+        query = self.PREFIXES + self.VALUE_QUERY.format(variable=variable, pattern=pattern, filter=filter_all)
+
+        df = self.runQuery(query)
+
+        if df.empty:
+            return pd.DataFrame(columns=[by, "identifier"])
+
+        df.columns = [by, "identifier"]
         return df
 
 
+
+    def groupPattern(self, by):
+        # variable and graph pattern of the values counted by getJournalCounts/getJournalValues (None for an unknown attribute)
+        group_patterns = {
+            "license": ("?license_value", "?journal flames:licenseToken ?license_value ."),
+            "language": ("?lang", ""),
+            "apc": ("?apc", ""),
+            "seal": ("?seal", ""),
+        }
+        if by not in group_patterns:
+            return None
+        if by == "license" and not self.hasLicenseTokens():
+            return "?license", "" # graph uploaded before the license values: counted by license string
+        return group_patterns[by]
+
+
+
+    def filterClause(self, partialTitle=None, partialName=None, licenses=None, languages=None, apc=None, seal=None, identifiers=None):
+        """
+        Builds the filter (graph patterns and FILTER) for BASE_QUERY/COUNT_QUERY that combines
+        all the specified conditions. The conditions that are None (or empty) are not applied.
+
+        Args:
+            partialTitle (str): Partial title, as in getJournalsWithTitle
+            partialName (str): Partial publisher name, as in getJournalsPublishedBy
+            licenses (set[str]): Licenses, as in getJournalsWithLicense
+            languages (set[str]): Languages: the journal must accept at least one of them
+            apc (bool): True for the journals with APC, False for the journals without APC
+            seal (bool): True for the journals with the DOAJ Seal, False for the ones without it
+            identifiers (set[str]): ISSN/EISSN: the journal must have at least one of them
+
+        Returns:
+            str: The filter to be inserted in the query
+        """
+        def quote(value):
+            return self.quoteLiteral(str(value).strip())
+
+        conditions = [] # every condition is combined with && in a single FILTER
+        patterns = []   # VALUES blocks and triple patterns added to the WHERE clause
+
+        if partialTitle:
+            conditions.append(f'CONTAINS(LCASE(?title), LCASE({quote(partialTitle)}))')
+
+        if partialName:
+            conditions.append(f'CONTAINS(LCASE(?publisher), LCASE({quote(partialName)}))')
+
+        if licenses and {license.strip() for license in licenses if license.strip()}:
+            patterns.append(self.licenseFilter({license for license in licenses if license.strip()}))
+
+        if languages and {language.strip() for language in languages if language.strip()}:
+            patterns.append(self.languageFilter(languages))
+
+        if apc is not None:
+            conditions.append(f'LCASE(STR(?apc)) = "{str(bool(apc)).lower()}"')
+
+        if seal is not None:
+            conditions.append(f'LCASE(STR(?seal)) = "{str(bool(seal)).lower()}"')
+
+        if identifiers and self.hasCanonicalIssns():
+            # lookup of the canonical forms of the identifiers (see IdentityIndex.canonicalIssn)
+            values = " ".join(quote(canonical) for canonical in dict.fromkeys(IdentityIndex.canonicalIssn(id) for id in identifiers))
+            patterns.append(f"VALUES ?canonical_issn {{ {values} }}")
+            patterns.append("?journal flames:canonicalIssn ?canonical_issn .")
+        elif identifiers:
+            # the identifiers are stored as "issn; eissn": both parts of the string are extracted and looked up in the set of ISSNs
+            id_list = ", ".join(quote(id) for id in identifiers)
+            patterns.append('BIND(STRBEFORE(CONCAT(STR(?identifier), "; "), "; ") AS ?first_issn)')
+            patterns.append('BIND(STRAFTER(STR(?identifier), "; ") AS ?second_issn)')
+            conditions.append(f'(?first_issn IN ({id_list}) || ?second_issn IN ({id_list}))')
+
+        filter_all = "\n".join(patterns)
+        if conditions:
+            filter_all += f'\nFILTER({" && ".join(conditions)})'
+
+        return filter_all
+
+
 # ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------
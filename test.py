@@ -14,7 +14,7 @@
 # SOFTWARE.
 import unittest
 from os import sep
-from pandas import DataFrame
+from pandas import DataFrame, Series
 from impl import JournalUploadHandler, CategoryUploadHandler
 from impl import JournalQueryHandler, CategoryQueryHandler
 from impl import *
@@ -156,3 +156,1070 @@ class TestProjectBasic(unittest.TestCase):
         self.assertIsInstance(r, list)
         for i in r:
             self.assertIsInstance(i, Journal) 
+
+
+# The following tests do not need Blazegraph: the handlers return in-memory DataFrames
+
+class StubJournalQueryHandler(JournalQueryHandler):
+    def __init__(self, df):
+        super().__init__()
+        self.df = df
+
+    def getAllJournals(self):
+        return self.df
+
+    def getJournalsWithLicense(self, licenses):
+        return self.df[self.df["license"].isin(licenses)]
+
+    def getDatasetVersion(self):
+        return 1
+
+    def getJournalsPage(self, offset, limit):
+        return self.df.iloc[offset:offset + limit]
+
+    def getIdentifierGroups(self):
+        return [[i.strip() for i in value.split(";")] for value in self.df["identifier"]]
+
+    def getJournalsWithFilters(self, identifiers=None, **filters):
+        self.calls = getattr(self, "calls", 0) + 1
+        self.lastIdentifiers = identifiers
+        if identifiers is None:
+            return self.df
+        return self.df[[bool({i.strip() for i in value.split(";")} & identifiers) for value in self.df["identifier"]]]
+
+
+class StubCategoryQueryHandler(CategoryQueryHandler):
+    def __init__(self, area_df):
+        super().__init__()
+        self.area_df = area_df
+
+    def getJournalsByArea(self, area_names):
+        return self.area_df
+
+    def getById(self, identifier):
+        return DataFrame()
+
+    def getIdentifierGroups(self):
+        return [[i.strip() for i in value.split(";")] for value in self.area_df["identifier"]]
+
+    def getJournalSummaries(self, identifiers=None):
+        return DataFrame()
+
+
+class LocalJournalQueryHandler(JournalQueryHandler):
+    # runs the SPARQL queries of the handler on an in-memory rdflib graph, built like JournalUploadHandler does
+    def __init__(self, rows, licenseTokens=True):
+        super().__init__()
+        from rdflib import Graph, URIRef, Literal, RDF
+        schema, wiki = "https://schema.org/", "https://www.wikidata.org/wiki/"
+        flames = "https://github.com/elenavalente31/data_flamess/"
+        self.graph = Graph()
+        for number, (title, identifier, languages, license, apc, seal) in enumerate(rows):
+            subj = URIRef(flames + "journal-" + str(number))
+            self.graph.add((subj, RDF.type, URIRef(schema + "Periodical")))
+            self.graph.add((subj, URIRef(schema + "name"), Literal(title)))
+            self.graph.add((subj, URIRef(schema + "identifier"), Literal(identifier)))
+            for issn in identifier.split("; "):
+                self.graph.add((subj, URIRef(flames + "canonicalIssn"), Literal(IdentityIndex.canonicalIssn(issn))))
+            for language in languages:
+                self.graph.add((subj, URIRef(schema + "inLanguage"), Literal(language)))
+            self.graph.add((subj, URIRef(schema + "publisher"), Literal("Publisher")))
+            self.graph.add((subj, URIRef(wiki + "Q73548471"), Literal(seal)))
+            self.graph.add((subj, URIRef(schema + "license"), Literal(license)))
+            if licenseTokens: # False: graph uploaded before the license values
+                for token in license.split(","):
+                    self.graph.add((subj, URIRef(flames + "licenseToken"), Literal(token.strip().upper())))
+            self.graph.add((subj, URIRef(wiki + "Q15291071"), Literal(apc)))
+        self.queries = []
+
+    def getCurrentGraph(self):
+        return ""
+
+    def getDatasetVersion(self):
+        return 1
+
+    def executeQuery(self, query):
+        from io import StringIO
+        from pandas import read_csv
+        self.queries.append(query)
+        result = self.graph.query(query).serialize(format="csv").decode("utf-8")
+        df = read_csv(StringIO(result), keep_default_na=False) if result.count("\n") > 1 else DataFrame()
+        # rdflib answers an aggregate with no matches with one empty row, Blazegraph with no rows
+        return df[(df != "").any(axis=1)].reset_index(drop=True) if not df.empty else df
+
+
+class InMemoryEndpoint:
+    # SPARQL endpoint on an rdflib Dataset: replaces the HTTP requests of impl (sparql_dataframe.get
+    # and SPARQLUpdateStore) inside a with block, so that uploads and queries run without Blazegraph
+    def __init__(self):
+        from rdflib import Dataset
+        self.dataset = Dataset(default_union=False)
+        self.queries = []
+
+    def get(self, endpoint, query, post=False):
+        from io import StringIO
+        from pandas import read_csv
+        self.queries.append(query)
+        try:
+            result = self.dataset.query(query).serialize(format="csv").decode("utf-8")
+        except Exception as e: # a FROM graph that does not exist: rdflib tries to download it, Blazegraph returns nothing
+            if "Could not load" not in str(e) and "HTTP" not in type(e).__name__ and "URLError" not in type(e).__name__:
+                raise
+            return DataFrame()
+        df = read_csv(StringIO(result), keep_default_na=False) if result.count("\n") > 1 else DataFrame()
+        return df[(df != "").any(axis=1)].reset_index(drop=True) if not df.empty else df
+
+    def store(self):
+        endpoint = self
+        class Store:
+            def open(self, *args, **kwargs): pass
+            def close(self, *args, **kwargs): pass
+            def addN(self, quads):
+                for s, p, o, g in quads:
+                    endpoint.dataset.graph(g.identifier).add((s, p, o))
+            def update(self, update, *args, **kwargs):
+                try:
+                    endpoint.dataset.update(update)
+                except ValueError: # rdflib cannot run INSERT DATA on the default graph of a Dataset
+                    endpoint.dataset.default_graph.update(update)
+        return Store()
+
+    def __enter__(self):
+        import impl
+        from unittest import mock
+        self.patches = [mock.patch.object(impl, "get", self.get), mock.patch.object(impl, "SPARQLUpdateStore", self.store)]
+        for patch in self.patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *args):
+        for patch in self.patches:
+            patch.stop()
+
+    def graphs(self):
+        # the named graphs that contain triples
+        return sorted(str(g.identifier) for g in self.dataset.graphs() if len(g) and str(g.identifier) != "urn:x-rdflib:default")
+
+
+class TestIdentifierJoin(unittest.TestCase):
+
+    size = 100000
+
+    def journals(self):
+        ids = [f"{i:04d}-{i % 10000:04d}; e{i}" for i in range(self.size)]
+        return DataFrame({
+            "journal": [f"j{i}" for i in range(self.size)],
+            "title": [f"Title {i}" for i in range(self.size)],
+            "identifier": ids,
+            "languages": ["English"] * self.size,
+            "publisher": ["Publisher"] * self.size,
+            "seal": [i % 2 == 0 for i in range(self.size)],
+            "license": ["CC BY" if i % 3 else "CC BY-SA" for i in range(self.size)],
+            "apc": [False] * self.size,
+        })
+
+    def test_01_hasMatchingIdentifier(self):
+        from time import perf_counter
+        df = self.journals()
+        valid = {f"e{i}" for i in range(0, self.size, 7)} | {"0003-0003"}
+        fq = FullQueryEngine()
+
+        # benchmark against the row-by-row check of the baseline (best of 3 runs of each)
+        row_time, vector_time = float("inf"), float("inf")
+        for _ in range(3):
+            start = perf_counter()
+            expected = df["identifier"].apply(fq.rowHasMatchingIdentifier, args=(valid,))
+            row_time = min(row_time, perf_counter() - start)
+
+            start = perf_counter()
+            mask = fq.hasMatchingIdentifier(df["identifier"], valid)
+            vector_time = min(vector_time, perf_counter() - start)
+
+        print(f"\nidentifier matching on {self.size} journals: apply {row_time:.3f}s, vectorized {vector_time:.3f}s")
+        self.assertEqual(mask.tolist(), expected.tolist())
+
+        # the vectorized check also matches the identifiers written in another form
+        canonical = fq.canonicalIdentifiers(Series(["03178471", " 2434561x", "0317-8472", "e1"]))
+        self.assertEqual(canonical.tolist(), ["0317-8471", "2434-561X", "0317-8472", "E1"])
+        self.assertEqual(fq.hasMatchingIdentifier(Series(["e1; 03178471", "2434561x", "x"]), {"0317-8471", "2434-561X"}).tolist(), [True, True, False])
+        self.assertEqual(fq.hasMatchingIdentifier(df["identifier"].astype(object), valid).tolist(), expected.tolist()) # strings not stored by pyarrow
+
+    def test_02_getJournalsInAreasWithLicense(self):
+        df = self.journals()
+        # the area side returns its identifiers in the opposite order, over many rows
+        area_df = DataFrame({"identifier": [f"e{i}; {i:04d}-{i % 10000:04d}" for i in range(0, self.size, 1000)]})
+
+        fq = FullQueryEngine()
+        fq.addJournalHandler(StubJournalQueryHandler(df))
+        fq.addCategoryHandler(StubCategoryQueryHandler(area_df))
+
+        r = fq.getJournalsInAreasWithLicense({"an area"}, {"CC BY-SA"})
+        self.assertEqual(sorted(j.getTitle() for j in r), sorted(f"Title {i}" for i in range(0, self.size, 3000)))
+
+        fq.cleanCategoryHandlers()
+        fq.addCategoryHandler(StubCategoryQueryHandler(DataFrame(columns=["identifier"])))
+        self.assertEqual(fq.getJournalsInAreasWithLicense({"an area"}, {"CC BY-SA"}), [])
+
+    def test_03_joinOnIdentifiers(self):
+        fq = FullQueryEngine()
+        graph_df = DataFrame({"identifier": ["1111-1111; 2222-2222", "3333-3333", "4444-4444"], "title": ["A", "B", "C"]})
+        relational_df = DataFrame({"identifier": ["2222-2222; 1111-1111", "4444-4444", "5555-5555"], "area": [["X"], ["Y"], ["Z"]]})
+
+        joined = fq.joinOnIdentifiers(graph_df, relational_df)
+        self.assertEqual(joined["title"].tolist(), ["A", "C"])
+        self.assertEqual(joined["area"].tolist(), [["X"], ["Y"]])
+
+        joined = fq.joinOnIdentifiers(graph_df, relational_df, how="left")
+        self.assertEqual(sorted(joined["title"].tolist()), ["A", "B", "C"])
+        self.assertEqual(len(joined), 3)
+
+    def test_04_mergeJournalFrames(self):
+        fq = FullQueryEngine()
+        first = DataFrame({"identifier": ["1111-111X; 2222-2222", "3333-3333"], "title": ["A", "B"], "area": [["X"], ["Y"]]})
+        replica = DataFrame({"identifier": ["2222-2222;1111-111x", "4444-4444"], "title": ["A (old)", "C"], "area": [["X", "Z"], ["W"]]})
+
+        merged = fq.mergeJournalFrames([first, replica])
+        self.assertEqual(merged["title"].tolist(), ["A", "B", "C"]) # same ISSN set: the first handler wins
+        self.assertEqual(merged["area"].tolist(), [["X"], ["Y"], ["W"]]) # list columns kept as lists
+        self.assertTrue(fq.mergeJournalFrames([DataFrame()]).empty)
+
+
+class TestTextIndex(unittest.TestCase):
+
+    def test_01_searchTextIndex(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as folder:
+            path = folder + sep + "text.db"
+            u = JournalUploadHandler()
+            self.assertTrue(u.setTextIndexPath(path))
+            self.assertTrue(u.pushTextIndex([
+                ("1111-1111", "Journal of Law", "Law Press"),
+                ("2222-2222; 3333-3333", "Lawrence Review", "Another Press"),
+                ("4444-4444", "Physics Letters", "Law Press"),
+            ]))
+            self.assertTrue(u.pushTextIndex([("1111-1111", "Journal of Law and Society", "Law Press")]))
+
+            q = JournalQueryHandler()
+            q.setTextIndexPath(path)
+            self.assertEqual(q.searchTextIndex("LAW")["title"].tolist(), ["Lawrence Review", "Journal of Law and Society"])
+            self.assertEqual(q.searchTextIndex("law", prefix=True)["identifier"].tolist(), ["2222-2222; 3333-3333"])
+            self.assertEqual(len(q.searchTextIndex("law", limit=1)), 1)
+            self.assertEqual(len(q.searchTextIndex("law", field="publisher")), 2)
+            self.assertEqual(len(q.searchTextIndex("ph")), 1)
+
+
+class TestGraphReload(unittest.TestCase):
+
+    header = "Journal title,Journal ISSN (print version),Journal EISSN (online version),Languages in which the journal accepts manuscripts,Publisher,DOAJ Seal,Journal license,APC\n"
+
+    def upload(self, folder, rows, text_index=""):
+        path = folder + sep + "doaj.csv"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.header + "".join(rows))
+        u = JournalUploadHandler()
+        u.setDbPathOrUrl("http://127.0.0.1:1/sparql")
+        if text_index:
+            self.assertTrue(u.setTextIndexPath(text_index))
+        self.assertTrue(u.pushDataToDb(path))
+
+    def test_01_reload(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as folder, InMemoryEndpoint() as endpoint:
+            self.upload(folder, ["Blood,1111-1111,,English,P,Yes,CC BY,No\n"])
+            first_graphs = endpoint.graphs()
+            self.assertEqual(len(first_graphs), 1) # loaded into a named graph
+
+            q = JournalQueryHandler()
+            q.setDbPathOrUrl("http://127.0.0.1:1/sparql")
+            self.assertEqual(q.getCurrentGraph(), first_graphs[0])
+            self.assertEqual(q.getAllJournals()["title"].tolist(), ["Blood"])
+
+            # the pointer is read once, not for each query
+            pointer_reads = len(endpoint.queries)
+            q.getJournalsWithTitle("blood")
+            q.getJournalsWithDOAJSeal()
+            self.assertEqual(len(endpoint.queries), pointer_reads + 2) # one round trip for each query
+            self.assertTrue(all("GRAPH ?current_graph" in query for query in endpoint.queries[-2:]))
+
+            self.upload(folder, ["Rings,3333-3333,,English,P,No,CC BY,Yes\n"])
+            second_graphs = endpoint.graphs()
+            self.assertEqual(len(second_graphs), 1) # the old graph is dropped
+            self.assertNotEqual(second_graphs, first_graphs)
+
+            # the pointer in memory is out of date, but the endpoint matches the current one in the same
+            # request: the query runs on the new graph with one round trip
+            self.assertEqual(q.getCurrentGraph(), first_graphs[0])
+            before = len(endpoint.queries)
+            self.assertEqual(q.getAllJournals()["title"].tolist(), ["Rings"])
+            self.assertEqual(len(endpoint.queries), before + 1)
+
+            # an empty result (e.g. an unknown identifier) costs one round trip too
+            self.assertEqual(q.getById("3333-3333")["title"].tolist(), ["Rings"]) # also checks flames:canonicalIssn once
+            before = len(endpoint.queries)
+            self.assertTrue(q.getJournalsWithTitle("nothing").empty)
+            self.assertTrue(q.getById("9999-9999").empty)
+            self.assertEqual(len(endpoint.queries), before + 2)
+
+            q.setCurrentGraphInterval(0) # the pointer in memory is read again at every query
+            self.assertTrue(q.getJournalsWithTitle("nothing").empty)
+            self.assertEqual(q.getCurrentGraph(), second_graphs[0])
+            self.assertEqual(q.currentVersion, q.getDatasetVersion())
+
+    def test_02_predicateChecks(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as folder, InMemoryEndpoint() as endpoint:
+            self.upload(folder, ["Blood,0317-8471,2049-3630,English,P,Yes,CC BY,No\n"])
+            q = JournalQueryHandler()
+            q.setDbPathOrUrl("http://127.0.0.1:1/sparql")
+            self.assertEqual(q.getById("20493630")["title"].tolist(), ["Blood"]) # canonical form
+            self.assertEqual(q.getJournalsWithLicense({"cc by"})["title"].tolist(), ["Blood"])
+
+            # the checks of the predicates are kept with the pointer: a lookup is now a single query
+            before = len(endpoint.queries)
+            self.assertEqual(q.getById("0317-8471")["title"].tolist(), ["Blood"])
+            self.assertEqual(q.getJournalsWithLicense({"cc by"})["title"].tolist(), ["Blood"])
+            self.assertEqual(len(endpoint.queries), before + 2)
+
+            # a reload forgets them: the new graph is checked again
+            self.upload(folder, ["Rings,3333-3333,,English,P,No,CC BY,Yes\n"])
+            self.assertEqual(q.readCurrentGraph(), endpoint.graphs()[0])
+            self.assertEqual(q.graphPredicates, {})
+            self.assertEqual(q.getById("3333-3333")["title"].tolist(), ["Rings"])
+            self.assertEqual(q.graphPredicates, {"flames:canonicalIssn": True})
+
+            # a cached result costs no round-trip at all
+            q.setCache(memorySize=8)
+            q.getAllJournals()
+            before = len(endpoint.queries)
+            self.assertEqual(q.getAllJournals()["title"].tolist(), ["Rings"])
+            self.assertEqual(len(endpoint.queries), before)
+
+    def test_03_inCurrentGraph(self):
+        q = JournalQueryHandler()
+        graph = "https://example.org/graph-1"
+        pointer = f"<{JournalUploadHandler.DATASET}> <{JournalUploadHandler.CURRENT_GRAPH}> ?current_graph ."
+        def wrapped(before, body, after):
+            return f"{before}\n            {pointer}\n            GRAPH ?current_graph {{{body}}}\n        {after}"
+        self.assertEqual(q.inCurrentGraph("SELECT ?s WHERE { ?s ?p ?o }", graph), wrapped("SELECT ?s WHERE {", " ?s ?p ?o ", "}"))
+        self.assertEqual(q.inCurrentGraph("select ?s where { ?s ?p ?o } LIMIT 1", graph), wrapped("select ?s where {", " ?s ?p ?o ", "} LIMIT 1"))
+        self.assertEqual(q.inCurrentGraph("SELECT ?s { ?s ?p ?o }", graph), wrapped("SELECT ?s {", " ?s ?p ?o ", "}"))
+        # nested groups and braces inside the literals
+        query = 'PREFIX ex: <https://example.org/somewhere/>\nSELECT ?s WHERE { ?s ?p "a}\\"{" . OPTIONAL { ?s ex:q ?o } } GROUP BY ?s'
+        self.assertEqual(q.inCurrentGraph(query, graph), wrapped('PREFIX ex: <https://example.org/somewhere/>\nSELECT ?s WHERE {', ' ?s ?p "a}\\"{" . OPTIONAL { ?s ex:q ?o } ', "} GROUP BY ?s"))
+        self.assertEqual(q.inCurrentGraph("SELECT ?s WHERE { ?s ?p ?o }", ""), "SELECT ?s WHERE { ?s ?p ?o }")
+        self.assertEqual(q.inCurrentGraph("ASK", graph), "ASK")
+        self.assertEqual(q.inCurrentGraph("SELECT ?s WHERE { ?s", graph), "SELECT ?s WHERE { ?s") # no closing brace
+
+    def test_04_textIndexReload(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as folder, InMemoryEndpoint() as endpoint:
+            text_index = folder + sep + "text.db"
+            self.upload(folder, ["Blood,0317-8471,,English,P,Yes,CC BY,No\n",
+                                 "Blood Reviews,2049-3630,,English,P,No,CC BY,No\n",
+                                 "Bloodlines,2434-561X,,English,P,No,CC BY,No\n"], text_index)
+            q = JournalQueryHandler()
+            q.setDbPathOrUrl("http://127.0.0.1:1/sparql")
+            q.setTextIndexPath(text_index)
+            self.assertEqual(sorted(q.getJournalsWithTitle("blood")["title"]), ["Blood", "Blood Reviews", "Bloodlines"])
+
+            # the hits of the text index are asked to the graph database a batch at a time
+            before = len(endpoint.queries)
+            df = q.getJournalsWithIdentifierStrings(["2434-561X", "0317-8471", "2049-3630"], batchSize=2)
+            self.assertEqual(df["title"].tolist(), ["Bloodlines", "Blood", "Blood Reviews"]) # same order as the strings
+            self.assertEqual(len(endpoint.queries), before + 2)
+            self.assertTrue(q.getJournalsWithIdentifierStrings([]).empty)
+
+            # a new upload replaces the graph: the journals that are not in it are not found in the index anymore
+            self.upload(folder, ["Blood,0317-8471,,English,P,Yes,CC BY,No\n"], text_index)
+            self.assertEqual(q.searchTextIndex("blood")["identifier"].tolist(), ["0317-8471"])
+            self.assertEqual(q.getJournalsWithTitle("blood")["title"].tolist(), ["Blood"])
+
+    def test_05_backslashLiterals(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as folder, InMemoryEndpoint():
+            self.upload(folder, ['Blood,0317-8471,,English,P,Yes,"CC BY\\, CC0",No\n',
+                                 "Rings,2049-3630,,English,P,No,CC BY,Yes\n"])
+            q = JournalQueryHandler()
+            q.setDbPathOrUrl("http://127.0.0.1:1/sparql")
+
+            # a value ending in a backslash must not escape the closing quote of its literal
+            self.assertEqual(q.quoteLiteral('a\\"b\\'), '"a\\\\\\"b\\\\"')
+            self.assertEqual(q.getJournalsWithLicense({"cc by\\"})["title"].tolist(), ["Blood"])
+            self.assertEqual(q.getJournalsWithLicense({"cc by"})["title"].tolist(), ["Rings"])
+            self.assertTrue(q.getJournalsWithLanguage({"English\\"}).empty)
+
+            # same for the string matching of the graphs uploaded before the license tokens
+            q.graphPredicates["flames:licenseToken"] = False
+            self.assertEqual(q.getJournalsWithLicense({"cc by\\"})["title"].tolist(), ["Blood"])
+            self.assertEqual(sorted(q.getJournalsWithLicense({"cc0", "cc by"})["title"]), ["Blood", "Rings"])
+
+
+def waitUntil(condition, timeout=5.0):
+    # waits (at most timeout seconds) until condition() is true, used to make threads overlap
+    from time import monotonic, sleep
+    deadline = monotonic() + timeout
+    while not condition() and monotonic() < deadline:
+        sleep(0.001)
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_01_twoTiers(self):
+        from tempfile import TemporaryDirectory
+        from io import BytesIO
+        import sqlite3
+
+        class OfflineHandler(JournalQueryHandler):
+            def getCurrentGraph(self):
+                return "https://example.org/graph-1"
+            def getDatasetVersion(self):
+                raise AssertionError("the cache keys must not contact the endpoint")
+
+        with TemporaryDirectory() as folder:
+            path = folder + sep + "cache.db"
+            first, second = OfflineHandler(), OfflineHandler()
+            for q in (first, second):
+                q.setDbPathOrUrl("http://127.0.0.1:1/sparql") # never contacted: all the results come from the cache
+                self.assertTrue(q.setCache(memorySize=2, diskPath=path, diskSize=10 ** 6))
+
+            df = DataFrame({"identifier": ["1111-1111"], "title": ["A"]})
+            first.writeCache(first.cacheKey(first.getCurrentGraph(), "SELECT 1"), df)
+            self.assertEqual(second.runQuery("SELECT 1").to_dict(), df.to_dict()) # shared through the file
+            self.assertEqual(len(second.cacheMemory), 1) # then kept in memory
+
+            for number in range(3):
+                first.writeCache(first.cacheKey("g", f"SELECT {number}"), df)
+            self.assertEqual(len(first.cacheMemory), 2) # least recently used evicted
+
+            self.assertNotEqual(first.cacheKey("", "SELECT 1"), first.cacheKey("", "SELECT 2")) # default graph: the version read with the pointer
+
+            buffer = BytesIO()
+            df.to_parquet(buffer, index=False)
+            size = len(buffer.getvalue())
+            first.setCache(memorySize=0, diskPath=path, diskSize=2 * size)
+            first.writeCache("newest", df)
+            conn = sqlite3.connect(path)
+            keys = [row[0] for row in conn.execute("SELECT key FROM QueryCache")]
+            conn.close()
+            self.assertEqual(len(keys), 2)
+            self.assertIn("newest", keys)
+
+            conn = sqlite3.connect(path)
+            keys = [row[0] for row in conn.execute("SELECT key FROM QueryCache ORDER BY last_used")]
+            conn.execute("UPDATE QueryCache SET data = ? WHERE key = ?", (b"not parquet", keys[0]))
+            conn.commit()
+            conn.close()
+            self.assertIsNone(second.readCache(keys[0])) # a damaged result is a cache miss
+
+            self.assertTrue(first.clearCache())
+            self.assertIsNone(second.readCache("newest"))
+
+    def test_02_singleFlight(self):
+        from threading import Thread, Event
+
+        release = Event() # the running queries wait for it, so that all the threads overlap
+
+        class SlowHandler(JournalQueryHandler):
+            executions = 0
+            def executeQuery(self, query):
+                self.executions += 1
+                release.wait(5)
+                if query == "broken":
+                    raise ValueError("endpoint error")
+                return DataFrame({"identifier": ["1111-1111"]})
+
+        q = SlowHandler()
+        results, errors = [], []
+        def ask(query):
+            try:
+                results.append(q.runQuery(query))
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [Thread(target=ask, args=("SELECT 1",)) for _ in range(8)] + [Thread(target=ask, args=("broken",)) for _ in range(3)]
+        for t in threads:
+            t.start()
+        waitUntil(lambda: q.singleFlight.shared == 7 + 2) # every thread but the two leaders is waiting
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(q.executions, 2) # one for each distinct query
+        self.assertEqual(len(results), 8)
+        self.assertEqual(len(errors), 3) # the error is shared too
+        self.assertTrue(all(r is not results[0] for r in results[1:])) # each waiter gets its own copy
+        self.assertEqual(q.runQuery("SELECT 1")["identifier"].tolist(), ["1111-1111"])
+        self.assertEqual(q.executions, 3) # finished queries are not reused (that is the cache)
+
+
+class TestCategoryDatabase(unittest.TestCase):
+
+    scimago = [
+        {"identifiers": ["1111-1111", "2222-2222"],
+         "categories": [{"id": "Oncology", "quartile": "Q1"}, {"id": "Hematology", "quartile": "Q2"}],
+         "areas": ["Medicine", "Biochemistry"]},
+        {"identifiers": ["3333-3333"],
+         "categories": [{"id": "Algebra", "quartile": "Q3"}],
+         "areas": ["Mathematics"]},
+    ]
+
+    # (title, identifier, languages, license, apc, seal) of the graph database, see LocalJournalQueryHandler
+    doaj = [
+        ("A", "1111-1111; 2222-2222", ["English"], "CC BY", False, True),
+        ("B", "3333-3333", ["English", "French"], "CC BY, CC BY-SA", True, False),
+        ("C", "4444-4444", ["French"], "CC BY-NC", False, False),
+    ]
+
+    def localEngine(self):
+        # engine on the graph database in memory and on the relational database of the test
+        fq = FullQueryEngine()
+        fq.addJournalHandler(LocalJournalQueryHandler(self.doaj))
+        fq.addCategoryHandler(self.q)
+        return fq
+
+    def setUp(self):
+        from tempfile import TemporaryDirectory
+        import json
+        self.folder = TemporaryDirectory()
+        self.relational = self.folder.name + sep + "relational.db"
+        self.category = self.folder.name + sep + "scimago.json"
+        with open(self.category, "w", encoding="utf-8") as f:
+            json.dump(self.scimago, f)
+
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        self.assertTrue(u.pushDataToDb(self.category))
+
+        self.q = CategoryQueryHandler()
+        self.q.setDbPathOrUrl(self.relational)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_01_getById(self):
+        df = self.q.getById("2222-2222")
+        self.assertEqual(len(df), 1) # one row, no categories x areas explosion
+        row = df.iloc[0]
+        self.assertEqual(row["identifier"], "1111-1111; 2222-2222")
+        self.assertEqual(sorted(zip(row["category"], row["quartile"])), [("Hematology", "Q2"), ("Oncology", "Q1")])
+        self.assertEqual(sorted(row["area"]), ["Biochemistry", "Medicine"])
+        self.assertTrue(self.q.getById("just_a_test").empty)
+
+    def test_02_getJournalSummaries(self):
+        df = self.q.getJournalSummaries()
+        self.assertEqual(sorted(df["identifier"]), ["1111-1111; 2222-2222", "3333-3333"])
+        self.assertEqual(self.q.getJournalSummaries({"3333-3333"})["area"].tolist(), [["Mathematics"]])
+
+    def test_03_snapshot(self):
+        self.assertEqual(self.q.getDatasetVersion(), 1)
+        journals = DataFrame({
+            "journal": ["j1", "j2"], "title": ["Blood", "Rings"], "identifier": ["1111-1111; 2222-2222", "3333-3333"],
+            "languages": ["English", "English"], "publisher": ["P", "P"], "seal": [True, False],
+            "license": ["CC BY", "CC BY"], "apc": [False, True]})
+        snapshot = self.folder.name + sep + "engine.snapshot"
+
+        fq = FullQueryEngine()
+        fq.addJournalHandler(StubJournalQueryHandler(journals))
+        fq.addCategoryHandler(self.q)
+        self.assertFalse(fq.warmStart(snapshot)) # no snapshot yet: built from the stores
+
+        fq2 = FullQueryEngine()
+        fq2.addJournalHandler(StubJournalQueryHandler(journals))
+        fq2.addCategoryHandler(self.q)
+        self.assertTrue(fq2.warmStart(snapshot))
+        self.assertEqual([j.getIds() for j in fq2.getJournalsWithBitmapIndex(areas={"Medicine"})], [["1111-1111", "2222-2222"]])
+        self.assertEqual([j.getTitle() for j in fq2.getJournalsWithBitmapIndex(seal=False, categories={"Algebra"}, quartiles={"Q3"})], ["Rings"])
+        self.assertEqual(fq2.getJournalsDataFrame()["area"].tolist(), fq2.bitmapIndex.df["area"].tolist())
+
+        # a truncated file is reported as an error, and the snapshot is not loaded
+        with open(snapshot, "rb") as f:
+            content = f.read()
+        with open(snapshot, "wb") as f:
+            f.write(content[:-1])
+        self.assertIsNone(fq2.loadSnapshot(snapshot))
+        with open(snapshot, "wb") as f:
+            f.write(content)
+
+        # new data in the relational database: the snapshot is out of date
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        self.assertTrue(u.pushDataToDb(self.category))
+        self.assertEqual(self.q.getDatasetVersion(), 2)
+        self.assertFalse(fq2.warmStart(snapshot))
+
+    def test_04_exportJournals(self):
+        import pyarrow.dataset as ds
+        journals = DataFrame({
+            "journal": ["j1", "j2", "j3"], "title": ["Blood", "Rings", "Other"],
+            "identifier": ["1111-1111; 2222-2222", "3333-3333", "4444-4444"],
+            "languages": ["English, French", "English", "Italian"], "publisher": ["P", "P", ""],
+            "seal": ["true", "false", "false"], "license": ["CC BY", "CC BY", "CC0"], "apc": ["false", "true", "false"]})
+        fq = FullQueryEngine()
+        fq.addJournalHandler(StubJournalQueryHandler(journals))
+        fq.addCategoryHandler(self.q)
+
+        folder = self.folder.name + sep + "export"
+        self.assertEqual(fq.exportJournals(folder, partitionBy="area", batchSize=2), 3)
+        df = ds.dataset(folder, partitioning="hive").to_table().to_pandas()
+        self.assertEqual(sorted(df["area"].dropna()), ["Biochemistry", "Mathematics", "Medicine"])
+        row = df[df["journal"] == "j1"].iloc[0]
+        self.assertEqual(list(row["languages"]), ["English", "French"])
+        self.assertEqual(list(row["identifiers"]), ["1111-1111", "2222-2222"])
+        self.assertIs(bool(row["seal"]), True)
+        self.assertEqual(df[df["journal"] == "j3"]["categories"].map(len).tolist(), [0])
+
+    def test_05_categoryAreaAdjacency(self):
+        self.assertEqual(self.q.getCategoriesAssignedToAreas({"Medicine"})["category"].tolist(), ["Hematology", "Oncology"])
+        self.assertEqual(self.q.getAreasAssignedToCategories({"Algebra", "x"})["area"].tolist(), ["Mathematics"])
+        self.assertEqual(len(self.q.getCategoriesAssignedToAreas(set())), 3)
+
+        # a new upload links Algebra to Medicine too: the cached maps are refreshed
+        import json
+        with open(self.category, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["5555-5555"], "categories": [{"id": "Algebra", "quartile": "Q1"}], "areas": ["Medicine"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        self.assertTrue(u.pushDataToDb(self.category))
+        self.assertEqual(self.q.getAreasAssignedToCategories({"Algebra"})["area"].tolist(), ["Mathematics", "Medicine"])
+
+    def test_06_readOnly(self):
+        import sqlite3
+        expected = self.q.getJournalSummaries()
+        for options in [{}, {"immutable": True}, {"inMemory": True}]:
+            q = CategoryQueryHandler()
+            q.setDbPathOrUrl(self.relational)
+            q.setReadOnly(**options)
+            self.assertTrue(q.isReadOnly())
+            self.assertTrue(q.getJournalSummaries().equals(expected))
+            conn = q.connect()
+            with self.assertRaises(sqlite3.Error):
+                conn.execute("DELETE FROM Journal")
+            conn.close()
+
+        # the first queries of many threads at the same moment load the in-memory copy only once
+        from threading import Barrier, Thread
+        class CountingHandler(CategoryQueryHandler):
+            loads = 0
+            def loadInMemoryCopy(self):
+                self.loads += 1
+                super().loadInMemoryCopy()
+        q = CountingHandler()
+        q.setDbPathOrUrl(self.relational)
+        q.setReadOnly(inMemory=True)
+        barrier, results = Barrier(8), []
+        def read():
+            barrier.wait()
+            results.append(len(q.readJournalSummaries())) # not coalesced: every thread connects
+        threads = [Thread(target=read) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(q.loads, 1)
+        self.assertEqual(results, [len(expected)] * 8)
+
+    def test_07_readDuringUpload(self):
+        import sqlite3
+        writer = sqlite3.connect(self.relational)
+        self.assertEqual(writer.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        writer.execute("BEGIN IMMEDIATE") # an upload in progress, not committed yet
+        writer.execute("DELETE FROM JournalSummary")
+
+        self.q.setBusyTimeout(0.1)
+        self.assertEqual(len(self.q.getJournalSummaries()), 2) # not locked, and the last committed data
+        writer.rollback()
+        writer.close()
+
+    def test_08_upsert(self):
+        import json
+        with open(self.category, "w", encoding="utf-8") as f: # next year: Oncology moves to Q2, no more Hematology
+            json.dump([{"identifiers": ["1111-1111"], "categories": [{"id": "Oncology", "quartile": "Q2"}], "areas": ["Medicine"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        u.setUpsert(True)
+        self.assertTrue(u.pushDataToDb(self.category))
+
+        report = u.getLastLoadReport()
+        self.assertEqual(report["HasCategory"], {"inserted": 1, "deleted": 2, "unchanged": 0})
+        self.assertEqual(report["HasArea"], {"inserted": 0, "deleted": 1, "unchanged": 1})
+        self.assertEqual(report["Category"]["deleted"], 2) # Oncology Q1 and Hematology Q2 are not used anymore
+        self.assertEqual(report["Area"]["deleted"], 1) # Biochemistry
+
+        row = self.q.getById("1111-1111").iloc[0]
+        self.assertEqual((row["category"], row["quartile"], row["area"]), (["Oncology"], ["Q2"], ["Medicine"]))
+        self.assertEqual(sorted(self.q.getAllAreas()["area"]), ["Mathematics", "Medicine"])
+
+    def test_09_buildJournals(self):
+        fq = FullQueryEngine()
+        fq.addCategoryHandler(self.q)
+        df = DataFrame({"identifier": ["2222-2222 ;1111-1111", "3333-3333", "1111-1111; 2222-2222"], "title": ["A", "B", "A"],
+                        "languages": ["French, English", "", "English"], "publisher": ["P", None, "P"],
+                        "seal": ["true", "False", "true"], "license": ["CC BY"] * 3, "apc": [False, True, False]})
+        journals = fq.buildJournals(df)
+        self.assertEqual([j.getIds() for j in journals], [["1111-1111", "2222-2222"], ["3333-3333"]]) # one per journal
+        self.assertEqual(journals[0].getLanguages(), ["English", "French"])
+        self.assertIs(journals[0].hasDOAJSeal(), True)
+        self.assertIs(journals[1].hasDOAJSeal(), False)
+        self.assertEqual(sorted((c.category, c.quartile) for c in journals[0].getCategories()), [("Hematology", "Q2"), ("Oncology", "Q1")])
+        self.assertEqual([a.getIds() for a in journals[1].getAreas()], [["Mathematics"]])
+        self.assertIsNone(journals[1].getPublisher())
+
+    def test_10_identifierRouting(self):
+        bloom = BloomFilter(["1111-1111", "2222-2222"])
+        self.assertTrue(bloom.mayContain("1111-1111"))
+        self.assertLess(sum(bloom.mayContain(f"{i:04d}-0000") for i in range(1000)), 50)
+
+        calls = []
+        class CountingHandler(CategoryQueryHandler):
+            def getById(self, identifier):
+                calls.append(identifier)
+                return super().getById(identifier)
+        q = CountingHandler()
+        q.setDbPathOrUrl(self.relational)
+        fq = FullQueryEngine()
+        fq.addCategoryHandler(q)
+
+        self.assertIsNone(fq.getEntityById("9999-9999"))
+        self.assertEqual(calls, []) # skipped: surely not in the database
+        category, area = fq.getEntityById("3333-3333")
+        self.assertEqual(calls, ["3333-3333"])
+        self.assertEqual(category.getIds(), ["3333-3333"]) # a list of identifiers, not the characters of the string
+        category, area = fq.getEntityById("2222-2222")
+        self.assertEqual(category.getIds(), ["1111-1111", "2222-2222"])
+
+        # the filter is built again after a new upload
+        import json
+        with open(self.category, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["9999-9999"], "categories": [], "areas": ["Physics"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        self.assertTrue(u.pushDataToDb(self.category))
+        self.assertIsNotNone(fq.getEntityById("9999-9999"))
+
+    def test_11_getEntitiesByIds(self):
+        jq = StubJournalQueryHandler(DataFrame({
+            "journal": ["j1"], "title": ["A"], "identifier": ["1111-1111; 2222-2222"], "languages": ["English"],
+            "publisher": ["P"], "seal": [True], "license": ["CC BY"], "apc": [False]}))
+        fq = FullQueryEngine()
+        fq.addJournalHandler(jq)
+        fq.addCategoryHandler(self.q)
+
+        entities = fq.getEntitiesByIds(["2222-2222", "3333-3333", "9999-9999", "1111-1111"])
+        self.assertEqual(jq.calls, 1) # one query for all the identifiers
+        self.assertIs(entities["1111-1111"], entities["2222-2222"])
+        self.assertEqual(entities["1111-1111"].getTitle(), "A")
+        self.assertEqual(sorted(c.category for c in entities["1111-1111"].getCategories()), ["Hematology", "Oncology"])
+        category, area = entities["3333-3333"] # only in the relational database
+        self.assertEqual((category.category, area.getIds()), (["Algebra"], ["Mathematics"]))
+        self.assertEqual(category.getIds(), ["3333-3333"])
+        self.assertIsNone(entities["9999-9999"])
+
+        # identifiers written in another form are matched on their canonical form, and returned as they were asked
+        import json
+        path = self.folder.name + sep + "other.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["0317-8471"], "categories": [{"id": "Physics", "quartile": "Q1"}], "areas": ["Physics"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.folder.name + sep + "other.db")
+        self.assertTrue(u.pushDataToDb(path))
+        other = CategoryQueryHandler()
+        other.setDbPathOrUrl(self.folder.name + sep + "other.db")
+        fq = FullQueryEngine()
+        fq.addJournalHandler(StubJournalQueryHandler(DataFrame({
+            "journal": ["j1"], "title": ["B"], "identifier": ["2434-561X; 2049-3630"], "languages": ["English"],
+            "publisher": ["P"], "seal": [True], "license": ["CC BY"], "apc": [False]})))
+        fq.addCategoryHandler(other)
+        entities = fq.getEntitiesByIds(["2434561x", "03178471", "2049-3630", "20493630"])
+        self.assertEqual(list(entities), ["2434561x", "03178471", "2049-3630", "20493630"])
+        self.assertEqual(entities["2434561x"].getTitle(), "B")
+        self.assertIs(entities["20493630"], entities["2049-3630"])
+        category, area = entities["03178471"]
+        self.assertEqual((category.getIds(), area.getIds()), (["0317-8471"], ["Physics"]))
+
+    def test_12_identityIndex(self):
+        self.assertEqual(IdentityIndex.canonicalIssn(" 2434561x"), "2434-561X")
+        self.assertEqual(IdentityIndex.canonicalIssn("0317-8472"), "0317-8472") # wrong check digit: not reformatted
+        index = IdentityIndex([["0317-8471", "2049-3630"], ["20493630", "2434-561X"]])
+        self.assertEqual(index.getKey("2434561X"), index.getKey("0317-8471")) # linked through 2049-3630
+
+        # the relational database finds the journal with the identifier written in another form
+        import json
+        with open(self.category, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["2049-3630"], "categories": [], "areas": ["Physics"]},
+                       {"identifiers": ["20493630", "0317-8471"], "categories": [], "areas": ["Chemistry"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        self.assertTrue(u.pushDataToDb(self.category))
+        row = self.q.getById("03178471").iloc[0]
+        self.assertEqual((row["identifier"], row["area"]), ("2049-3630; 0317-8471", ["Physics", "Chemistry"]))
+
+        # cross-store: the graph only knows the journal by an ISSN linked to the one of the relational database
+        jq = StubJournalQueryHandler(DataFrame({
+            "journal": ["j1"], "title": ["A"], "identifier": ["2434-561X; 2049-3630"], "languages": ["English"],
+            "publisher": ["P"], "seal": [True], "license": ["CC BY"], "apc": [False]}))
+        fq = FullQueryEngine()
+        fq.addJournalHandler(jq)
+        fq.addCategoryHandler(self.q)
+        journal = fq.buildJournals(jq.getAllJournals())[0]
+        self.assertEqual(sorted(a.getIds()[0] for a in journal.getAreas()), ["Chemistry", "Physics"])
+        joined = fq.joinOnIdentifiers(DataFrame({"identifier": ["0317-8471"]}), DataFrame({"identifier": ["2434561x"], "x": [1]}))
+        self.assertEqual(joined["x"].tolist(), [1])
+
+        # the identities are resolved with lookups of only the identifiers left without a match,
+        # never by reading the identifiers of all the journals
+        lookups = []
+        class CountingHandler(CategoryQueryHandler):
+            def getCanonicalGroupsOf(self, identifiers):
+                lookups.append(set(identifiers))
+                return super().getCanonicalGroupsOf(identifiers)
+            def getIdentifierGroups(self):
+                raise AssertionError("full scan of the identifiers")
+        q = CountingHandler()
+        q.setDbPathOrUrl(self.relational)
+        fq = FullQueryEngine()
+        fq.addJournalHandler(jq)
+        fq.addCategoryHandler(q)
+        self.assertEqual(fq.hasMatchingIdentifier(Series(["2434561x; 1111-1111", "2222-2222"]), {"2434-561X"}).tolist(), [True, False])
+        self.assertEqual(fq.joinOnIdentifiers(DataFrame({"identifier": ["2049-3630", "1111-1111"]}), DataFrame({"identifier": ["20493630", "1111-1111"], "x": [1, 2]}))["x"].tolist(), [1, 2])
+        self.assertEqual(len(fq.buildJournals(jq.getAllJournals())[0].getAreas()), 2)
+        self.assertEqual(lookups, []) # every row has a match: nothing to look up
+        joined = fq.joinOnIdentifiers(DataFrame({"identifier": ["0317-8471", "1111-1111"]}), DataFrame({"identifier": ["2434561x", "1111-1111"], "x": [1, 2]}))
+        self.assertEqual(joined["x"].tolist(), [2, 1])
+        # first the unmatched identifier of one side, then the ones linked to it, until nothing new is found
+        self.assertEqual(lookups, [{"0317-8471"}, {"2049-3630"}, {"2434-561X"}])
+        self.assertEqual([sorted(group) for group in q.getCanonicalGroupsOf({"20493630"})], [["0317-8471", "2049-3630"]])
+
+    def test_13_journalsInCategoriesWithQuartile(self):
+        import json
+        with open(self.category, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["9999-9999"], "categories": [], "areas": ["Physics"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.relational)
+        self.assertTrue(u.pushDataToDb(self.category))
+
+        jq = StubJournalQueryHandler(DataFrame({
+            "journal": ["j1", "j2", "j3"], "title": ["A", "B", "C"], "identifier": ["1111-1111; 2222-2222", "3333-3333", "9999-9999"],
+            "languages": ["English"] * 3, "publisher": ["P"] * 3, "seal": [True] * 3, "license": ["CC BY"] * 3, "apc": [False] * 3}))
+        fq = FullQueryEngine()
+        fq.addJournalHandler(jq)
+        fq.addCategoryHandler(self.q)
+        # no filter: all the journals with at least one category, not the ones without categories
+        self.assertEqual(sorted(j.getTitle() for j in fq.getJournalsInCategoriesWithQuartile(set(), set())), ["A", "B"])
+        self.assertEqual([j.getTitle() for j in fq.getJournalsInCategoriesWithQuartile(set(), {"Q3"})], ["B"])
+
+    def test_14_journalQuery(self):
+        jq = StubJournalQueryHandler(DataFrame({
+            "journal": ["j1", "j2", "j3"], "title": ["A", "B", "C"], "identifier": ["1111-1111; 2222-2222", "3333-3333", "4444-4444"],
+            "languages": ["English"] * 3, "publisher": ["P"] * 3, "seal": [True] * 3, "license": ["CC BY"] * 3, "apc": [False] * 3}))
+        fq = FullQueryEngine()
+        fq.addJournalHandler(jq)
+        fq.addCategoryHandler(self.q)
+
+        query = fq.query().license("CC BY").license({"CC BY-SA"}).category("Algebra")
+        self.assertEqual(query.conditions, {"license": {"CC BY", "CC BY-SA"}, "category": {"Algebra"}})
+
+        # the category is the most selective condition: the relational database runs first
+        # and its ISSNs restrict the graph query
+        self.assertEqual([(step["store"], step["restricted"]) for step in query.plan()], [("relational", False), ("graph", True)])
+        self.assertEqual([j.getTitle() for j in query.getJournals()], ["B"])
+        self.assertEqual(jq.lastIdentifiers, {"3333-3333"})
+
+        explanation = query.explain()
+        self.assertIsInstance(explanation, str)
+        self.assertIn("1. relational: category", explanation)
+        self.assertIn("Expected round-trips: 2", explanation)
+
+        # the DOAJ Seal is more selective than an area: the graph database runs first
+        query = fq.query().seal(True).area("Medicine")
+        self.assertEqual([step["store"] for step in query.plan()], ["graph", "relational"])
+        self.assertEqual([j.getTitle() for j in query.getJournals()], ["A"])
+
+        # only graph conditions: a single step
+        self.assertEqual([step["store"] for step in fq.query().apc(False).plan()], ["graph"])
+
+        # too many ISSNs: the second step is not restricted, the join is only local
+        query = fq.query().seal(True).area("Medicine")
+        query.MAX_PUSHDOWN_IDENTIFIERS = 1
+        self.assertEqual([j.getTitle() for j in query.getJournals()], ["A"])
+
+    def test_15_licenseFallback(self):
+        rows = [
+            ("A", "1111-1111", ["English"], "CC BY", False, True),
+            ("B", "2222-2222", ["English"], "CC BY, CC BY-SA", True, False),
+            ("C", "3333-3333", ["French"], "CC BY-NC", False, False),
+        ]
+        for licenseTokens in (True, False): # the old graphs, without flames:licenseToken, are searched in the license string
+            jq = LocalJournalQueryHandler(rows, licenseTokens)
+            self.assertEqual(jq.hasLicenseTokens(), licenseTokens)
+            self.assertEqual(sorted(jq.getJournalsWithLicense({"cc by-sa", "CC BY-NC"})["title"]), ["B", "C"])
+            self.assertEqual(sorted(jq.getJournalsWithFilters(licenses={"CC BY"}, apc=False)["title"]), ["A"])
+            self.assertTrue(jq.getJournalsWithLicense({"CC"}).empty)
+        self.assertEqual(sum("LIMIT 1" in query for query in jq.queries), 1) # checked once for the graph
+
+        counts = LocalJournalQueryHandler(rows).getJournalCounts("license")
+        self.assertEqual(dict(zip(counts["license"], counts["count"])), {"CC BY": 2, "CC BY-SA": 1, "CC BY-NC": 1})
+        counts = LocalJournalQueryHandler(rows, licenseTokens=False).getJournalCounts("license")
+        self.assertEqual(dict(zip(counts["license"], counts["count"])), {"CC BY": 1, "CC BY, CC BY-SA": 1, "CC BY-NC": 1})
+
+    def test_16_bitmapIndex(self):
+        fq = self.localEngine()
+        def titles(journals):
+            return sorted(j.getTitle() for j in journals)
+
+        # the same journals of the methods that query the stores
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(licenses={"cc by-sa"})), titles(fq.getJournalsWithLicense({"CC BY-SA"})))
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(seal=True)), titles(fq.getJournalsWithDOAJSeal()))
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(apc=True)), titles(fq.getJournalsWithAPC()))
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(languages={"French"})), titles(fq.getJournalsWithLanguage({"French"})))
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(areas={"Medicine", "Mathematics"}, licenses={"CC BY"})),
+                         titles(fq.getJournalsInAreasWithLicense({"Medicine", "Mathematics"}, {"CC BY"})))
+        for categories, quartiles in [({"Oncology"}, {"Q1"}), ({"Oncology"}, {"Q2"}), ({"Algebra"}, set()), (set(), {"Q2", "Q3"})]:
+            self.assertEqual(titles(fq.getJournalsWithBitmapIndex(categories=categories, quartiles=quartiles)),
+                             titles(fq.getJournalsInCategoriesWithQuartile(categories, quartiles)))
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(apc=False, seal=True, areas={"Medicine"}, categories={"Hematology"}, quartiles={"Q2"})),
+                         titles(fq.getDiamondJournalsInAreasAndCategoriesWithQuartile({"Medicine"}, {"Hematology"}, {"Q2"})))
+        self.assertEqual(titles(fq.getJournalsWithBitmapIndex(categories={"Hematology"}, quartiles={"Q1"})), []) # not the quartile of that category
+
+    def test_17_journalsWithLanguage(self):
+        fq = self.localEngine()
+        jq = fq.journalQuery[0]
+
+        self.assertEqual(sorted(jq.getJournalsWithLanguage({"French"})["title"]), ["B", "C"])
+        self.assertEqual(sorted(jq.getJournalsWithLanguage({"english", "Italian"})["title"]), []) # equality lookup, case sensitive
+        self.assertEqual(len(jq.getJournalsWithLanguage({" "})), 3) # no language: all the journals
+        self.assertEqual(sorted(jq.getJournalsWithFilters(languages={"English"}, seal=False)["title"]), ["B"])
+        self.assertIn("VALUES ?filter_lang", jq.queries[-1])
+
+        journals = fq.getJournalsWithLanguage({"French", "English"})
+        self.assertEqual(sorted(j.getTitle() for j in journals), ["A", "B", "C"])
+        languages = {j.getTitle(): j.getLanguages() for j in journals}
+        self.assertEqual(languages["B"], ["English", "French"]) # all the languages of the journal, not only the matching one
+
+        journal = Journal(["1111-1111"], "A", ["Spanish", "English", "French"], True, "CC BY", False)
+        self.assertEqual(journal.getLanguages(), ["English", "French", "Spanish"]) # sorted in the constructor
+        journal.getLanguages().append("Italian")
+        self.assertEqual(journal.getLanguages(), ["English", "French", "Spanish"]) # a copy is returned
+
+    def test_18_journalCounts(self):
+        fq = self.localEngine()
+        jq = fq.journalQuery[0]
+        def counts(df):
+            return dict(zip(df.iloc[:, 0].astype(str), df["count"]))
+
+        # counted by the relational database, restricted to the journals with the license
+        self.assertEqual(counts(fq.getJournalCounts("area", licenses={"CC BY"})), {"Biochemistry": 1, "Mathematics": 1, "Medicine": 1})
+        self.assertEqual(counts(fq.getJournalCounts("quartile", seal=True)), {"Q1": 1, "Q2": 1})
+        self.assertEqual(counts(self.q.getJournalCounts("category")), {"Algebra": 1, "Hematology": 1, "Oncology": 1})
+
+        # counted by the graph database, restricted to the ISSNs of the relational database
+        expected = {"CC BY": 2, "CC BY-SA": 1}
+        self.assertEqual(counts(fq.getJournalCounts("license", areas={"Medicine", "Mathematics"})), expected)
+        self.assertIn("VALUES ?canonical_issn", jq.queries[-1])
+
+        # too many ISSNs: the graph database is not restricted, the counts are computed locally
+        query = fq.query().area({"Medicine", "Mathematics"})
+        query.MAX_PUSHDOWN_IDENTIFIERS = 2
+        self.assertEqual(counts(query.getCounts("license")), expected)
+        self.assertNotIn("VALUES ?canonical_issn", jq.queries[-1])
+        self.assertEqual(counts(query.getCounts("language")), {"English": 2, "French": 1})
+
+        # more handlers with the same journals (replicated databases): each journal is still counted once
+        import json
+        replica = CategoryQueryHandler()
+        replica.setDbPathOrUrl(self.relational)
+        fq.addCategoryHandler(replica)
+        fq.addJournalHandler(LocalJournalQueryHandler(self.doaj))
+        self.assertEqual(counts(fq.getJournalCounts("area", licenses={"CC BY"})), {"Biochemistry": 1, "Mathematics": 1, "Medicine": 1})
+        self.assertEqual(counts(fq.getJournalCounts("license", areas={"Medicine", "Mathematics"})), expected)
+        self.assertEqual(counts(fq.getJournalCounts("language")), {"English": 2, "French": 2})
+        self.assertEqual(counts(fq.getJournalCounts("area")), counts(fq.getFacetedJournals(facets=("area",))["facets"]["area"]))
+
+        # a database that lists only one ISSN of journal A: it is linked to the same journal
+        path = self.folder.name + sep + "other.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["2222-2222"], "categories": [{"id": "Cardiology", "quartile": "Q4"}], "areas": ["Medicine", "Nursing"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.folder.name + sep + "other.db")
+        self.assertTrue(u.pushDataToDb(path))
+        other = CategoryQueryHandler()
+        other.setDbPathOrUrl(self.folder.name + sep + "other.db")
+        fq.addCategoryHandler(other)
+        self.assertEqual(counts(fq.getJournalCounts("area")), {"Biochemistry": 1, "Mathematics": 1, "Medicine": 1, "Nursing": 1})
+
+    def test_19_facetedJournals(self):
+        import json
+        # a second relational database has journal A too, under one of its ISSNs, with other categories
+        path = self.folder.name + sep + "other.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"identifiers": ["2222-2222"], "categories": [{"id": "Cardiology", "quartile": "Q4"}], "areas": ["Medicine", "Nursing"]}], f)
+        u = CategoryUploadHandler()
+        u.setDbPathOrUrl(self.folder.name + sep + "other.db")
+        self.assertTrue(u.pushDataToDb(path))
+        other = CategoryQueryHandler()
+        other.setDbPathOrUrl(self.folder.name + sep + "other.db")
+
+        fq = self.localEngine()
+        fq.addCategoryHandler(other)
+        def counts(df):
+            return dict(zip(df.iloc[:, 0].astype(str), df["count"]))
+
+        result = fq.getFacetedJournals(facets=("area", "category", "quartile", "license", "apc"), pageSize=2)
+        self.assertEqual(result["total"], 3)
+        self.assertEqual([j.getTitle() for j in result["journals"]], ["A", "B"])
+        # the rows of both databases are counted, each journal once for each value
+        self.assertEqual(counts(result["facets"]["area"]), {"Medicine": 1, "Biochemistry": 1, "Mathematics": 1, "Nursing": 1})
+        self.assertEqual(counts(result["facets"]["category"]), {"Algebra": 1, "Cardiology": 1, "Hematology": 1, "Oncology": 1})
+        self.assertEqual(counts(result["facets"]["quartile"]), {"Q1": 1, "Q2": 1, "Q3": 1, "Q4": 1})
+        self.assertEqual(counts(result["facets"]["license"]), {"CC BY": 2, "CC BY-NC": 1, "CC BY-SA": 1})
+        self.assertEqual(counts(result["facets"]["apc"]), {"False": 2, "True": 1})
+
+        result = fq.getFacetedJournals(fq.query().area("Medicine"), facets=("category",))
+        self.assertEqual([j.getTitle() for j in result["journals"]], ["A"])
+        self.assertEqual(len(result["journals"][0].getCategories()), 3) # the journal is built with the categories of both databases
+        self.assertEqual(len(result["facets"]["category"]), 3) # Oncology, Hematology and Cardiology
+
+        result = fq.getFacetedJournals(fq.query().category("Nonexistent"))
+        self.assertEqual((result["journals"], result["total"]), ([], 0))
+
+        df = DataFrame({"identifier": ["1111-1111", "1111-1111", "3333-3333"], "area": [["X"], ["Y"], None], "title": ["A", "A", "B"]})
+        self.assertEqual(fq.mergeSummaryRows(df)["area"].tolist(), [["X", "Y"], []])
+        self.assertEqual(counts(fq.getFacetCounts(fq.mergeSummaryRows(df), "area")), {"X": 1, "Y": 1})
+
+    def test_20_coalescedQueries(self):
+        import impl
+        from threading import Thread, Event
+        from unittest import mock
+        # the same query of many threads at the same moment is run only once on the database
+        release, executions = Event(), []
+        read_sql_query = impl.pd.read_sql_query
+        def slowRead(*args, **kwargs):
+            executions.append(args[0])
+            release.wait(5)
+            return read_sql_query(*args, **kwargs)
+
+        calls = [self.q.getAllCategories, self.q.getAllAreas, lambda: self.q.getJournalsByArea({"Medicine"}),
+                 lambda: self.q.getCategoriesWithQuartile({"Q1"}), lambda: self.q.getJournalCounts("area"),
+                 lambda: self.q.getJournalsInAreasAndCategoriesWithQuartile({"Medicine"}, set(), set(), {"11111111"})]
+        results = [[] for _ in calls]
+        def ask(i):
+            results[i].append(calls[i]())
+        threads = [Thread(target=ask, args=(i,)) for i in range(len(calls)) for _ in range(4)]
+        connect = self.q.connect
+        connections = []
+        def countingConnect():
+            connections.append(1)
+            return connect()
+        with mock.patch.object(impl.pd, "read_sql_query", slowRead), mock.patch.object(self.q, "connect", countingConnect):
+            for t in threads:
+                t.start()
+            waitUntil(lambda: self.q.singleFlight.shared == 3 * len(calls))
+            release.set()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(len(executions), len(calls)) # one for each distinct query
+        self.assertEqual(len(connections), len(calls)) # the threads that wait for another one do not connect
+        for i, call in enumerate(calls):
+            self.assertEqual(len(results[i]), 4)
+            self.assertTrue(all(r.equals(call()) for r in results[i]))
+        self.assertEqual(sorted(results[0][0]["category"]), ["Algebra", "Hematology", "Oncology"])